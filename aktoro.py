@@ -1,72 +1,332 @@
 #!/usr/bin/env python3
 import argparse
+import cProfile
+import glob
 import os.path
+import re
+import shlex
 import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from io import open
-from aktoro.compiler import compile_ak, AK_GRAMMAR
-from aktoro.parser import PipelineRewriter, VariantPatternRewriter
+import aktoro.bench
+import aktoro.compiler
+from aktoro.code_gen import snake_to_upper_camel
+from aktoro.compiler import PhaseTimings, compile_ak, compile_ak_file, load_grammar, pgo_profile_filename, run_phase
+from aktoro.optimizer import INLINE_BUDGET
 
 __path__ = os.path.dirname(__file__)
 
+# calls the main function of every file when building a multi file package
+PACKAGE_MAIN_FILENAME = "aktoro_main_generated.go"
+
 cli = argparse.ArgumentParser()
 subparsers = cli.add_subparsers(dest="subcommand")
 
 
+def argument(*name_or_flags, **kwargs):
+    return [*name_or_flags], kwargs
+
+
+COMMON_ARGS = [argument('--timings', action="store_true",
+                        help="report the grammar load time and the time, node count and peak memory of each "
+                             "compiler phase"),
+               argument('--cprofile', type=str, metavar="OUT.prof",
+                        help="profile the command with cProfile and write the stats to this file")]
+
+TYPED_ARG = argument('--typed', action="store_true",
+                     help="emit typed Go function signatures and monomorphize generic functions")
+
+OPT_ARG = argument('-O', dest="opt_level", type=int, choices=[0, 1], default=1,
+                   help="optimization level, -O0 disables inlining, constant folding and dead branch elimination")
+
+INLINE_ARG = argument('--inline-budget', type=int, default=INLINE_BUDGET,
+                      help="inline functions with bodies up to this many AST nodes, 0 disables inlining")
+
+
 def sub_command(args=None, parent=subparsers):
     if args is None:
         args = []
 
     def decorator(func):
         parser = parent.add_parser(func.__name__, description=func.__doc__)
-        for arg in args:
+        for arg in args + COMMON_ARGS:
             parser.add_argument(*arg[0], **arg[1])
         parser.set_defaults(func=func)
 
     return decorator
 
 
-def argument(*name_or_flags, **kwargs):
-    return [*name_or_flags], kwargs
+def report_timings(phase_timings):
+    timing = aktoro.compiler.grammar_timing
+    if timing is None:
+        pass
+    elif timing.cached:
+        saved = timing.build_time - timing.load_time
+        print(f"grammar: loaded from cache in {timing.load_time * 1000:.1f}ms "
+              f"(build takes {timing.build_time * 1000:.1f}ms, saved {saved * 1000:.1f}ms)", file=sys.stderr)
+    else:
+        print(f"grammar: built in {timing.build_time * 1000:.1f}ms (cache written)", file=sys.stderr)
+    phase_timings.report()
 
 
-@sub_command([argument('filename', type=str, help="filename"),
-              argument('-o', type=str, help="output")])
-def build(args):
-    input_filename = os.path.join(__path__, args.filename)
-    output_filename = os.path.join(__path__, args.o)
-    with open(input_filename) as ak:
-        program = ak.read()
+def build_inputs(filename):
+    """
+    Resolve the build argument, a .ak file, a directory or a glob, to the
+    .ak files of a single package.
+    """
+    path = os.path.join(__path__, filename)
+    if os.path.isdir(path):
+        input_filenames = glob.glob(os.path.join(path, "*.ak"))
+    elif glob.has_magic(path):
+        input_filenames = glob.glob(path)
+    else:
+        input_filenames = [path]
+    input_filenames = sorted(os.path.abspath(f) for f in input_filenames)
+    if not input_filenames:
+        raise SystemExit(f"no .ak files match {filename}")
+    if len(set(map(os.path.dirname, input_filenames))) > 1:
+        raise SystemExit(f"{filename} matches files in more than one directory")
+    return input_filenames
 
-    generated = compile_ak(program)
 
-    input_filename_no_extension = input_filename.split(".ak", 1)[0]
-    input_path = input_filename_no_extension.split("/")
-    input_path = "/".join(input_path[:len(input_path) - 1])
-    temp_go_filename = f"{input_filename_no_extension}_aktoro_generated.go"
-    with open(temp_go_filename, "w") as go_file:
-        go_file.write(generated)
+def main_func_name(input_filename):
+    stem = os.path.basename(input_filename).split(".ak", 1)[0]
+    return "main" + snake_to_upper_camel(re.sub(r"\W+", "_", stem).strip("_"))
+
+
+def package_jobs(input_filenames, **options):
+    """
+    Lay out the generated Go files of a package, removing generated files
+    left over from sources that no longer exist.  Returns the compile jobs
+    and the main functions the package main has to call, if any.
+    """
+    input_path = os.path.dirname(input_filenames[0])
+    # generated files are kept in place so go build can reuse its own cache
+    go_filenames = [f"{f.split('.ak', 1)[0]}_aktoro_generated.go" for f in input_filenames]
+    package_main_filename = os.path.join(input_path, PACKAGE_MAIN_FILENAME)
+
+    if len(input_filenames) == 1:
+        main_funcs = ["main"]
+    else:
+        main_funcs = [main_func_name(f) for f in input_filenames]
+    keep_filenames = go_filenames + ([package_main_filename] if len(main_funcs) > 1 else [])
+    stale_filenames = glob.glob(os.path.join(input_path, "*_aktoro_generated.go")) + [package_main_filename]
+    for stale_filename in stale_filenames:
+        if stale_filename not in keep_filenames and os.path.exists(stale_filename):
+            os.remove(stale_filename)
+
+    jobs = [(input_filename, go_filename, dict(options, main_func=main_func))
+            for input_filename, go_filename, main_func in zip(input_filenames, go_filenames, main_funcs)]
+    if len(main_funcs) > 1:
+        write_package_main(package_main_filename, main_funcs)
+    return jobs
+
+
+def write_package_main(package_main_filename, main_funcs):
+    source = "package main\n\nfunc main() {\n"
+    source += "".join(f"\t{main_func}()\n" for main_func in main_funcs)
+    source += "}\n"
+    # leave the file untouched when unchanged so go build can reuse its cache
+    if os.path.exists(package_main_filename):
+        with open(package_main_filename) as go_file:
+            if go_file.read() == source:
+                return
+    with open(package_main_filename, "w") as go_file:
+        go_file.write(source)
+
+
+def pgo_profile(go_filenames, input_path):
+    """
+    Profile for go build -pgo from the CPU profiles run --cpuprofile recorded
+    for the generated files of a package, merged when there are several.
+    Returns None when none was recorded.
+    """
+    profiles = [str(p) for p in map(pgo_profile_filename, go_filenames) if p.exists()]
+    if len(profiles) <= 1:
+        return profiles[0] if profiles else None
+    merged = pgo_profile_filename(input_path)
+    with open(merged, "wb") as f:
+        subprocess.run(["go", "tool", "pprof", "-proto", *profiles], stdout=f, check=True)
+    return str(merged)
+
+
+@sub_command([argument('filename', type=str, help="a .ak file, a package directory or a glob"),
+              argument('-o', type=str, help="output"),
+              argument('-j', '--jobs', type=int, default=None, help="number of compile workers"),
+              argument('--no-cache', action="store_true", help="regenerate Go code even if the source is unchanged"),
+              argument('--pgo', action="store_true",
+                       help="profile guided optimization with the CPU profiles recorded by run --cpuprofile"),
+              argument('--pgo-profile', type=str, metavar="PROFILE",
+                       help="profile guided optimization with this pprof CPU profile"),
+              TYPED_ARG, OPT_ARG, INLINE_ARG])
+def build(args):
+    input_filenames = build_inputs(args.filename)
+    input_path = os.path.dirname(input_filenames[0])
+    jobs = package_jobs(input_filenames, typed_signatures=args.typed, opt_level=args.opt_level,
+                        inline_budget=args.inline_budget, observer=args.observer)
+    if args.no_cache:
+        for input_filename, go_filename, options in jobs:
+            with open(input_filename) as ak, open(go_filename, "w") as go_file:
+                compile_ak(ak.read(), out=go_file, **options)
+        cached = []
+    elif len(jobs) == 1 or args.observer or args.cprofile:
+        # timings and profiles are only collected in this process, with
+        # timings every file is compiled instead of taken from the cache
+        cached = [compile_ak_file(input_filename, go_filename, **options)
+                  for input_filename, go_filename, options in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=load_grammar) as pool:
+            futures = [pool.submit(compile_ak_file, input_filename, go_filename, **options)
+                       for input_filename, go_filename, options in jobs]
+            cached = [future.result() for future in futures]
+    if args.timings and not args.no_cache:
+        print(f"generated code: cache bypassed to time every phase of {len(cached)} file(s)", file=sys.stderr)
+
     build_str = f"cd {input_path} && go build"
     if args.o:
-        build_str += f" -o {output_filename}"
+        build_str += f" -o {os.path.join(__path__, args.o)}"
+    profile = None
+    if args.pgo_profile:
+        profile = os.path.join(__path__, args.pgo_profile)
+    elif args.pgo:
+        profile = pgo_profile([go_filename for _, go_filename, _ in jobs], input_path)
+        if profile is None:
+            print("no CPU profile recorded by run --cpuprofile, building without PGO", file=sys.stderr)
+    if profile:
+        build_str += f" -pgo={shlex.quote(profile)}"
     subprocess.check_output(build_str, shell=True, )
-    os.remove(temp_go_filename)
 
 
-@sub_command([argument('filename', type=str, help="filename")])
+@sub_command([argument('filename', type=str, help="filename"),
+              argument('--cpuprofile', action="store_true",
+                       help="record a pprof CPU profile of the program, which build --pgo picks up"),
+              TYPED_ARG, OPT_ARG, INLINE_ARG])
 def run(args):
     input_filename = os.path.join(__path__, args.filename)
     with open(input_filename) as ak:
         program = ak.read()
 
-    generated = compile_ak(program)
     input_filename_no_extension = input_filename.split(".ak", 1)[0]
     temp_go_filename = f"{input_filename_no_extension}_aktoro_generated.go"
+    cpu_profile = None
+    if args.cpuprofile:
+        # keyed by the generated file, which build generates in the same place
+        cpu_profile = pgo_profile_filename(temp_go_filename)
+        cpu_profile.parent.mkdir(parents=True, exist_ok=True)
     with open(temp_go_filename, "w") as go_file:
-        go_file.write(generated)
+        compile_ak(program, out=go_file, typed_signatures=args.typed, opt_level=args.opt_level,
+                   inline_budget=args.inline_budget, observer=args.observer, cpu_profile=cpu_profile)
     output = subprocess.check_output(f"go run {temp_go_filename}", shell=True)
     output = output.decode("utf-8")
     os.remove(temp_go_filename)
     print(output)
+    if cpu_profile:
+        print(f"CPU profile written to {cpu_profile}", file=sys.stderr)
+
+
+def source_mtimes(filename):
+    try:
+        input_filenames = build_inputs(filename)
+    except SystemExit:
+        # editors may briefly remove a file while saving it
+        return {}
+    mtimes = {}
+    for input_filename in input_filenames:
+        try:
+            mtimes[input_filename] = os.stat(input_filename).st_mtime_ns
+        except OSError:
+            pass
+    return mtimes
+
+
+def recompile(jobs):
+    """
+    Compile the given jobs in this process, reporting errors instead of
+    raising them.  Returns the input files that failed to compile.
+    """
+    failed = set()
+    for input_filename, go_filename, options in jobs:
+        try:
+            compile_ak_file(input_filename, go_filename, **options)
+        except Exception as e:
+            print(f"{os.path.basename(input_filename)}: {type(e).__name__}: {e}", file=sys.stderr)
+            failed.add(input_filename)
+    return failed
+
+
+def stop(process, timeout=2.0):
+    """
+    Terminate a program started by watch, killing it if it does not exit
+    within timeout seconds.
+    """
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def relink_and_run(input_path, binary, recompiled, timings):
+    """
+    Relink the binary and start it without waiting for it, so long running
+    programs like servers keep watch polling for changes.  Returns the
+    started process, or None if go build failed.
+    """
+    start = time.perf_counter()
+    go_build = subprocess.run(["go", "build", "-o", binary], cwd=input_path,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if go_build.returncode != 0:
+        print(go_build.stdout.decode("utf-8"), end="", file=sys.stderr)
+        return None
+    if timings:
+        print(f"recompiled {recompiled} file(s), built in {(time.perf_counter() - start) * 1000:.1f}ms",
+              file=sys.stderr)
+    print(f"--- {time.strftime('%H:%M:%S')} ---", file=sys.stderr)
+    return subprocess.Popen([binary])
+
+
+@sub_command([argument('filename', type=str, help="a .ak file, a package directory or a glob"),
+              argument('-o', type=str, help="keep the built binary at this path"),
+              argument('--interval', type=float, default=0.2, help="seconds between checks for changes"),
+              TYPED_ARG, OPT_ARG, INLINE_ARG])
+def watch(args):
+    """
+    Rebuild and rerun the program whenever one of its .ak files changes.
+    The compiler stays loaded between runs and only changed files are
+    recompiled, the binary is relinked by go build.  A program still running
+    when a file changes is terminated before the rebuild.
+    """
+    build_inputs(args.filename)
+    load_grammar()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        binary = os.path.join(__path__, args.o) if args.o else os.path.join(temp_dir, "aktoro_watch")
+        seen, failed = {}, set()
+        process = None
+        try:
+            while True:
+                mtimes = source_mtimes(args.filename)
+                if mtimes and mtimes != seen:
+                    layout_changed = mtimes.keys() != seen.keys()
+                    jobs = package_jobs(sorted(mtimes), typed_signatures=args.typed, opt_level=args.opt_level,
+                                        inline_budget=args.inline_budget, observer=args.observer)
+                    changed = [job for job in jobs
+                               if layout_changed or job[0] in failed or seen.get(job[0]) != mtimes[job[0]]]
+                    seen = mtimes
+                    failed = recompile(changed)
+                    if not failed:
+                        stop(process)
+                        process = relink_and_run(os.path.dirname(jobs[0][0]), binary, len(changed), args.timings)
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop(process)
 
 
 @sub_command([argument('filename', type=str, help="filename")])
@@ -75,20 +335,47 @@ def parse(args):
     with open(input_filename) as ak:
         program = ak.read()
 
-    parse_tree = AK_GRAMMAR.parse(program)
-    parse_tree = PipelineRewriter().visit(parse_tree)
-    parse_tree = VariantPatternRewriter().visit(parse_tree)
+    parse_tree = run_phase(args.observer, "parse", load_grammar().parse, program)
     print(parse_tree.pretty())
 
 
-@sub_command([argument('filename', type=str, help="filename")])
+@sub_command([argument('filename', type=str, help="filename"), TYPED_ARG, OPT_ARG, INLINE_ARG])
 def generate(args):
     input_filename = os.path.join(__path__, args.filename)
     with open(input_filename) as ak:
         program = ak.read()
 
-    generated = compile_ak(program)
-    print(generated)
+    compile_ak(program, out=sys.stdout, typed_signatures=args.typed, opt_level=args.opt_level,
+               inline_budget=args.inline_budget, observer=args.observer)
+
+
+@sub_command([argument('programs', nargs="*", help=".ak programs to benchmark, by default the bench/corpus programs"),
+              argument('-o', type=str, help="write the results as JSON to this file"),
+              argument('--baseline', type=str, help="JSON results to compare against, flagging regressions"),
+              argument('--results', type=str,
+                       help="compare these stored JSON results against the baseline instead of running"),
+              argument('--threshold', type=float, default=0.1,
+                       help="fraction a metric may get worse by before it is a regression"),
+              argument('--repeat', type=int, default=5, help="take the best of this many compiles, builds and runs"),
+              argument('--benchtime', type=str, default="1s", help="go test -benchtime for the generated code")])
+def bench(args):
+    """
+    Time the compiler phases, go build and the generated code of each
+    program.  Exits with status 1 if any metric regressed against the
+    baseline.
+    """
+    if args.results:
+        results = aktoro.bench.load_results(args.results)
+    else:
+        programs = [os.path.join(__path__, p) for p in args.programs] or aktoro.bench.corpus_programs()
+        results = aktoro.bench.run_benchmarks(programs, repeat=args.repeat, benchtime=args.benchtime)
+    aktoro.bench.print_results(results)
+    if args.o:
+        aktoro.bench.save_results(results, os.path.join(__path__, args.o))
+    if args.baseline:
+        baseline = aktoro.bench.load_results(os.path.join(__path__, args.baseline))
+        if aktoro.bench.compare(baseline, results, args.threshold):
+            sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -96,4 +383,15 @@ if __name__ == "__main__":
     if args.subcommand is None:
         cli.print_help()
     else:
-        args.func(args)
+        args.observer = PhaseTimings() if args.timings else None
+        profiler = cProfile.Profile() if args.cprofile else None
+        try:
+            if profiler:
+                profiler.runcall(args.func, args)
+            else:
+                args.func(args)
+        finally:
+            if profiler:
+                profiler.dump_stats(os.path.join(__path__, args.cprofile))
+            if args.timings:
+                report_timings(args.observer)
@@ -95,14 +95,14 @@ OR.2: "or"
 list_literal: "[" _NEWLINE? list_elems _NEWLINE? "]" (":" _type_usage)?
 list_elems: (expr ("," _NEWLINE? expr)*)?
 
-list_cons: "[" _NEWLINE? cons_args "|" expr _NEWLINE? "]"
+list_cons: "[" _NEWLINE? cons_args SINGLE_PIPE expr _NEWLINE? "]"
 cons_args: expr ("," _NEWLINE? expr)*
 
 dict_literal: "%{" _NEWLINE? kv_pair_list _NEWLINE? "}" (":" _type_usage)?
 kv_pair_list:  (kv_pair ("," _NEWLINE? kv_pair)*)?
 kv_pair: expr "=>" expr
 
-dict_update: "%{" expr "|" kv_pair ("," _NEWLINE? kv_pair)* "}"
+dict_update: "%{" expr SINGLE_PIPE kv_pair ("," _NEWLINE? kv_pair)* "}"
 
 index_expr: ( var_usage
             | list_literal
@@ -151,7 +151,7 @@ record_literal: "{" _NEWLINE? field_assignment ("," _NEWLINE? field_assignment)*
 field_assignment: field_name ":" expr
 field_name: VAR_NAME
 
-record_update: "{" expr "|" field_assignment ("," _NEWLINE? field_assignment)* "}"
+record_update: "{" expr SINGLE_PIPE field_assignment ("," _NEWLINE? field_assignment)* "}"
 
 func_def: func_header "->" func_body
 func_header: func_signature _NEWLINE VAR_NAME params
@@ -185,7 +185,9 @@ func_call: var_usage "(" _expr_list? ")"
 
 LIST.2: "list"
 DICT.2: "dict"
-?builtin_module_name: LIST | DICT
+STREAM.2: /stream\b/
+ACTOR.2: /actor\b/
+?builtin_module_name: LIST | DICT | STREAM | ACTOR
 builtin_func_call: builtin_module_name "." VAR_NAME "(" _expr_list? ")"
 
 PRINT: "print"
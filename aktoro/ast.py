@@ -1,142 +1,154 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, is_dataclass
 import aktoro.types as types
 from abc import ABC
 
 
 class Expr(ABC):
+    __slots__ = ()
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class Program:
     statements: list
 
 
-@dataclass
+@dataclass(slots=True)
 class VarDecl(Expr):
     name: str
     expr: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class VariantParamDecl(Expr):
     name: str
     index: int
+    field_type: types.AkType
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class VarIfAssign(Expr):
     name: str
     expr: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class VarMatchAssign(Expr):
     name: str
     expr: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class VarAssignMut:
     name: str
     expr: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class RecordDecl:
     name: str
     type_params: list
     fields: dict
 
 
-@dataclass
+@dataclass(slots=True)
 class VariantDecl:
     name: str
     type_params: list
     constructors: list
 
 
-@dataclass
+@dataclass(slots=True)
 class VarUsage(Expr):
     name: str
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class FieldAccess(Expr):
     record_name: str
     field_name: str
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
+class VariantFieldAccess(Expr):
+    # field P{index} of a matched constructor, field_type is its declared
+    # type and ak_type the type bound by the matched value
+    var: Expr
+    index: int
+    field_type: types.AkType
+    ak_type: types.AkType
+
+
+@dataclass(slots=True)
 class PrimitiveLiteral(Expr):
     value: str
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class ListLiteral(Expr):
     values: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class DictLiteral(Expr):
     key_values: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class KeyValue:
     key: Expr
     value: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class DictUpdate(Expr):
     var: Expr
     updates: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class RecordLiteral(Expr):
     fields: dict
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class VariantLiteral(Expr):
     constructor: types.VariantConstructor
     values: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class VariantPattern(Expr):
     constructor: str
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class VariantTestExpr(Expr):
     name: str
     expr: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class RecordUpdate(Expr):
     var: Expr
     updates: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class EqualityExpr(Expr):
     left: Expr
     op: str
@@ -144,51 +156,51 @@ class EqualityExpr(Expr):
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class AddExpr(Expr):
     exprs: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class MultExpr(Expr):
     exprs: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class ParenExpr(Expr):
     expr: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class NotExpr(Expr):
     expr: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class LogicalExpr(Expr):
     exprs: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class ParamDecl:
     index: int
     name: str
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class RecordDestructParam:
     index: int
     params: list
     parent_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class FuncDef(Expr):
     name: str
     params: list
@@ -197,90 +209,90 @@ class FuncDef(Expr):
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class FuncCall(Expr):
     func_name: str
     args: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class PrintFunc(Expr):
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class PackageVarUsage(Expr):
     package_name: str
     func_name: str
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class ReturnStmt(Expr):
     expr: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class ReturnNil:
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class PrintStmt:
     args: list
 
 
-@dataclass
+@dataclass(slots=True)
 class ListIndexExpr(Expr):
     var: Expr
     index_expr: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class ListRangeIndexExpr(Expr):
     var: Expr
     index_expr: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class StringIndexExpr(Expr):
     var: Expr
     index_expr: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class StringRangeIndexExpr(Expr):
     var: Expr
     index_expr: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class DictIndexExpr(Expr):
     var: Expr
     index_expr: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class ListConsExpr(Expr):
     var: Expr
     cons_args: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class RangeIndex:
     low: Expr
     high: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class IfExpr(Expr):
     test_expr: Expr
     if_body: list
@@ -288,41 +300,75 @@ class IfExpr(Expr):
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class MatchExpr(Expr):
     test_expr: Expr
     patterns: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class Pattern(Expr):
     test_expr: Expr
     body: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class DefaultPattern(Expr):
     body: list
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class StringConcat(Expr):
     left: Expr
     right: Expr
     ak_type: types.AkType
 
 
-@dataclass
+@dataclass(slots=True)
 class RecordDestructDecl:
     root_var: RecordDecl
     var_decls: dict
 
 
-@dataclass
+@dataclass(slots=True)
 class ListDestructDecl:
     root_var: Expr
     var_decls: list
     rest_decl: Expr
+
+
+@dataclass(slots=True)
+class Block:
+    statements: list
+
+
+@dataclass(slots=True)
+class BlankAssign:
+    names: list
+
+
+@dataclass(slots=True)
+class ListPipeline(Expr):
+    source: Expr
+    stages: list
+    ak_type: types.AkType
+
+
+@dataclass(slots=True)
+class LetExpr(Expr):
+    # declarations evaluated in order before expr, local to the expression
+    bindings: list
+    expr: Expr
+    ak_type: types.AkType
+
+
+@dataclass(slots=True)
+class PipelineStage:
+    op: str
+    args: list
+
+
+NODE_CLASSES = tuple(cls for cls in list(globals().values()) if isinstance(cls, type) and is_dataclass(cls))
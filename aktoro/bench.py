@@ -0,0 +1,212 @@
+"""
+Benchmarks of the compiler and of the Go code it generates, run by
+aktoro.py bench.
+
+Every program is compiled phase by phase and built with go build, then the
+binary is timed and the program is run as a Go benchmark for its ns/op,
+bytes/op and allocs/op.  Results are plain JSON so they can be stored as a
+baseline and compared against later runs.
+"""
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from aktoro.compiler import PHASES, PhaseTimings, compile_ak, load_grammar
+
+BENCH_DIR = Path(__file__).resolve().parent.parent / "bench"
+CORPUS_DIR = BENCH_DIR / "corpus"
+
+RESULTS_VERSION = 1
+
+# all metrics are lower is better, times are in seconds
+METRICS = PHASES + ("go_build", "run", "ns_per_op", "bytes_per_op", "allocs_per_op")
+
+# differences below these are noise rather than regressions, whatever the
+# ratio, e.g. a phase going from 0.2ms to 0.3ms
+NOISE_FLOORS = {"ns_per_op": 1000, "bytes_per_op": 64, "allocs_per_op": 1}
+TIME_NOISE_FLOOR = 0.002
+
+# runs main in a loop with the program's output discarded
+GO_BENCHMARK = """\
+package main
+
+import (
+	"os"
+	"testing"
+)
+
+func BenchmarkProgram(b *testing.B) {
+	stdout := os.Stdout
+	devnull, err := os.OpenFile(os.DevNull, os.O_WRONLY, 0)
+	if err != nil {
+		b.Fatal(err)
+	}
+	os.Stdout = devnull
+	defer func() {
+		os.Stdout = stdout
+		devnull.Close()
+	}()
+	b.ReportAllocs()
+	for i := 0; i < b.N; i++ {
+		main()
+	}
+}
+"""
+
+BENCHMARK_LINE = re.compile(r"^BenchmarkProgram\S*\s+\d+\s+([\d.]+) ns/op\s+(\d+) B/op\s+(\d+) allocs/op")
+
+
+def corpus_programs():
+    return sorted(CORPUS_DIR.glob("*.ak"))
+
+
+def compile_phases(ak_source):
+    """
+    Compile ak_source, returning the Go code and the time each phase took.
+    """
+    timings = PhaseTimings()
+    go_code = compile_ak(ak_source, observer=timings)
+    return go_code, {record.phase: record.end - record.start for record in timings.records}
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_checked(args, cwd):
+    result = subprocess.run(args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stdout.decode('utf-8')}")
+    return result.stdout.decode("utf-8")
+
+
+def bench_program(ak_filename, repeat=5, benchtime="1s"):
+    with open(ak_filename) as ak:
+        ak_source = ak.read()
+    load_grammar()
+    results = {phase: None for phase in PHASES}
+    for _ in range(repeat):
+        go_code, times = compile_phases(ak_source)
+        for phase, elapsed in times.items():
+            results[phase] = elapsed if results[phase] is None else min(results[phase], elapsed)
+
+    # the package lives next to the corpus, so go resolves the runtime like it
+    # does for the other programs in the repo, in a directory of its own so
+    # that concurrent runs cannot collide
+    with tempfile.TemporaryDirectory(prefix="_bench_", dir=BENCH_DIR) as package_dir:
+        stem = Path(ak_filename).stem
+        with open(os.path.join(package_dir, f"{stem}_aktoro_generated.go"), "w") as go_file:
+            go_file.write(go_code)
+        with open(os.path.join(package_dir, f"{stem}_bench_test.go"), "w") as go_file:
+            go_file.write(GO_BENCHMARK)
+        binary = os.path.join(package_dir, stem)
+
+        # the first build compiles the runtime packages into go's cache
+        run_checked(["go", "build", "-o", binary, "."], package_dir)
+        results["go_build"] = best_time(lambda: run_checked(["go", "build", "-o", binary, "."], package_dir), repeat)
+        results["run"] = best_time(lambda: run_checked([binary], package_dir), repeat)
+
+        output = run_checked(["go", "test", "-run", "^$", "-bench", "^BenchmarkProgram$", "-benchtime", benchtime],
+                             package_dir)
+        match = next(filter(None, map(BENCHMARK_LINE.match, output.splitlines())), None)
+        if match is None:
+            raise RuntimeError(f"no benchmark result in go test output:\n{output}")
+        results["ns_per_op"] = float(match.group(1))
+        results["bytes_per_op"] = int(match.group(2))
+        results["allocs_per_op"] = int(match.group(3))
+    return results
+
+
+def go_version():
+    try:
+        return run_checked(["go", "version"], None).strip()
+    except (OSError, RuntimeError):
+        return None
+
+
+def run_benchmarks(ak_filenames, repeat=5, benchtime="1s", out=sys.stderr):
+    programs = {}
+    for ak_filename in ak_filenames:
+        name = Path(ak_filename).stem
+        print(f"{name}...", file=out)
+        programs[name] = bench_program(ak_filename, repeat, benchtime)
+    return {
+        "version": RESULTS_VERSION,
+        "go": go_version(),
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "programs": programs,
+    }
+
+
+def format_metric(metric, value):
+    if value is None:
+        return "-"
+    if metric in PHASES or metric in ("go_build", "run"):
+        return f"{value * 1000:.1f}ms"
+    return f"{value:,.0f}"
+
+
+def print_results(results, out=sys.stdout):
+    names = sorted(results["programs"])
+    width = max([len("program")] + [len(name) for name in names])
+    print(f"{'program':<{width}}" + "".join(f"{metric:>14}" for metric in METRICS), file=out)
+    for name in names:
+        program = results["programs"][name]
+        print(f"{name:<{width}}" + "".join(f"{format_metric(m, program.get(m)):>14}" for m in METRICS), file=out)
+
+
+def is_regression(metric, old, new, threshold):
+    if old is None or new is None:
+        return False
+    floor = NOISE_FLOORS.get(metric, TIME_NOISE_FLOOR)
+    return new - old > floor and new > old * (1 + threshold)
+
+
+def compare(baseline, results, threshold=0.1, out=sys.stdout):
+    """
+    Print every metric that got worse than the baseline by more than
+    threshold, a fraction, and return the number of regressions.
+    """
+    regressions = 0
+    for name, program in sorted(results["programs"].items()):
+        old_program = baseline["programs"].get(name)
+        if old_program is None:
+            print(f"{name}: not in the baseline", file=out)
+            continue
+        for metric in METRICS:
+            old, new = old_program.get(metric), program.get(metric)
+            if is_regression(metric, old, new, threshold):
+                regressions += 1
+                # a metric that was zero has no relative change, only the values are printed
+                change = f" (+{new / old - 1:.0%})" if old else ""
+                print(f"REGRESSION {name} {metric}: {format_metric(metric, old)} -> {format_metric(metric, new)}"
+                      f"{change}", file=out)
+    if not regressions:
+        print(f"no regressions over {threshold:.0%} against the baseline", file=out)
+    return regressions
+
+
+def load_results(filename):
+    with open(filename) as f:
+        results = json.load(f)
+    if results.get("version") != RESULTS_VERSION:
+        raise SystemExit(f"{filename}: unsupported benchmark results version {results.get('version')}")
+    return results
+
+
+def save_results(results, filename):
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
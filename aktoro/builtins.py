@@ -3,6 +3,18 @@ from collections import namedtuple
 
 BuiltInFunc = namedtuple("BuiltInFunc", ["ak_type"])
 
+OptionType = types.VariantType("types.AkOption", [types.TypeParameter("t")], [])
+OptionType.constructors.extend([
+    types.VariantConstructor("types.Some", [types.TypeParameter("t")], OptionType),
+    types.VariantConstructor("types.None", [], OptionType)
+])
+
+ResultType = types.VariantType("types.AkResult", [types.TypeParameter("t")], [])
+ResultType.constructors.extend([
+    types.VariantConstructor("types.Ok", [types.TypeParameter("t")], ResultType),
+    types.VariantConstructor("types.Err", [types.PrimitiveType("String")], ResultType)
+])
+
 BUILTIN_PACKAGES = {
     "list": {
         "map": BuiltInFunc(ak_type=types.FuncType([types.ListType(types.TypeParameter("a")),
@@ -92,20 +104,140 @@ BUILTIN_PACKAGES = {
         "rest": BuiltInFunc(ak_type=types.FuncType([types.ListType(types.TypeParameter("a"))],
                                                    types.ListType(types.TypeParameter("a")))),
         "empty": BuiltInFunc(ak_type=types.FuncType([types.ListType(types.TypeParameter("a"))],
-                                                    types.PrimitiveType("Bool")))
-
+                                                    types.PrimitiveType("Bool"))),
+        # parallel variants, the trailing chunk size and worker count are
+        # optional and default to one chunk per worker and GOMAXPROCS workers
+        "pmap": BuiltInFunc(ak_type=types.FuncType([types.ListType(types.TypeParameter("a")),
+                                                    types.FuncType(
+                                                        [types.TypeParameter("a")],
+                                                        types.TypeParameter("b")),
+                                                    types.PrimitiveType("Int"),
+                                                    types.PrimitiveType("Int")],
+                                                   types.ListType(types.TypeParameter("b")))),
+        "pfilter": BuiltInFunc(ak_type=types.FuncType([types.ListType(types.TypeParameter("a")),
+                                                       types.FuncType(
+                                                           [types.TypeParameter("a")],
+                                                           types.PrimitiveType("Bool")),
+                                                       types.PrimitiveType("Int"),
+                                                       types.PrimitiveType("Int")],
+                                                      types.ListType(types.TypeParameter("a")))),
+        "preduce": BuiltInFunc(ak_type=types.FuncType([types.ListType(types.TypeParameter("a")),
+                                                       types.TypeParameter("a"),
+                                                       types.FuncType(
+                                                           [types.TypeParameter("a"),
+                                                            types.TypeParameter("a")],
+                                                           types.TypeParameter("a")),
+                                                       types.PrimitiveType("Int"),
+                                                       types.PrimitiveType("Int")],
+                                                      types.TypeParameter("a"))),
+        "peach": BuiltInFunc(ak_type=types.FuncType([types.ListType(types.TypeParameter("a")),
+                                                     types.FuncType(
+                                                         [types.TypeParameter("a")],
+                                                         types.EmptyTuple()),
+                                                     types.PrimitiveType("Int"),
+                                                     types.PrimitiveType("Int")],
+                                                    types.EmptyTuple()))
+    },
+    "stream": {
+        "range": BuiltInFunc(ak_type=types.FuncType([types.PrimitiveType("Int"),
+                                                     types.PrimitiveType("Int")],
+                                                    types.StreamType(types.PrimitiveType("Int")))),
+        "iterate": BuiltInFunc(ak_type=types.FuncType([types.TypeParameter("a"),
+                                                       types.FuncType(
+                                                           [types.TypeParameter("a")],
+                                                           types.TypeParameter("a"))],
+                                                      types.StreamType(types.TypeParameter("a")))),
+        "lines": BuiltInFunc(ak_type=types.FuncType([types.PrimitiveType("String")],
+                                                    types.StreamType(types.PrimitiveType("String")))),
+        "from_list": BuiltInFunc(ak_type=types.FuncType([types.ListType(types.TypeParameter("a"))],
+                                                        types.StreamType(types.TypeParameter("a")))),
+        "map": BuiltInFunc(ak_type=types.FuncType([types.StreamType(types.TypeParameter("a")),
+                                                   types.FuncType(
+                                                       [types.TypeParameter("a")],
+                                                       types.TypeParameter("b"))],
+                                                  types.StreamType(types.TypeParameter("b")))),
+        "filter": BuiltInFunc(ak_type=types.FuncType([types.StreamType(types.TypeParameter("a")),
+                                                      types.FuncType(
+                                                          [types.TypeParameter("a")],
+                                                          types.PrimitiveType("Bool"))],
+                                                     types.StreamType(types.TypeParameter("a")))),
+        "take": BuiltInFunc(ak_type=types.FuncType([types.StreamType(types.TypeParameter("a")),
+                                                    types.PrimitiveType("Int")],
+                                                   types.StreamType(types.TypeParameter("a")))),
+        "take_while": BuiltInFunc(ak_type=types.FuncType([types.StreamType(types.TypeParameter("a")),
+                                                          types.FuncType(
+                                                              [types.TypeParameter("a")],
+                                                              types.PrimitiveType("Bool"))],
+                                                         types.StreamType(types.TypeParameter("a")))),
+        "drop": BuiltInFunc(ak_type=types.FuncType([types.StreamType(types.TypeParameter("a")),
+                                                    types.PrimitiveType("Int")],
+                                                   types.StreamType(types.TypeParameter("a")))),
+        "reduce": BuiltInFunc(ak_type=types.FuncType([types.StreamType(types.TypeParameter("a")),
+                                                      types.TypeParameter("b"),
+                                                      types.FuncType(
+                                                          [types.TypeParameter("b"),
+                                                           types.TypeParameter("a")],
+                                                          types.TypeParameter("b"))],
+                                                     types.TypeParameter("b"))),
+        "each": BuiltInFunc(ak_type=types.FuncType([types.StreamType(types.TypeParameter("a")),
+                                                    types.FuncType(
+                                                        [types.TypeParameter("a")],
+                                                        types.EmptyTuple())],
+                                                   types.EmptyTuple())),
+        "to_list": BuiltInFunc(ak_type=types.FuncType([types.StreamType(types.TypeParameter("a"))],
+                                                      types.ListType(types.TypeParameter("a"))))
+    },
+    # the trailing mailbox capacity and policy of start and the timeout in
+    # milliseconds of ask are optional
+    "actor": {
+        "start": BuiltInFunc(ak_type=types.FuncType([types.TypeParameter("s"),
+                                                     types.FuncType(
+                                                         [types.TypeParameter("s"),
+                                                          types.TypeParameter("m"),
+                                                          types.SenderType()],
+                                                         types.TypeParameter("s")),
+                                                     types.PrimitiveType("Int"),
+                                                     types.PrimitiveType("String")],
+                                                    types.ActorType(types.TypeParameter("m")))),
+        # like start, with a reducer handling up to the optional batch size
+        # of queued messages and their senders at once
+        "start_batch": BuiltInFunc(ak_type=types.FuncType([types.TypeParameter("s"),
+                                                           types.FuncType(
+                                                               [types.TypeParameter("s"),
+                                                                types.ListType(types.TypeParameter("m")),
+                                                                types.ListType(types.SenderType())],
+                                                               types.TypeParameter("s")),
+                                                           types.PrimitiveType("Int"),
+                                                           types.PrimitiveType("Int"),
+                                                           types.PrimitiveType("String")],
+                                                          types.ActorType(types.TypeParameter("m")))),
+        "send": BuiltInFunc(ak_type=types.FuncType([types.ActorType(types.TypeParameter("m")),
+                                                    types.TypeParameter("m")],
+                                                   types.EmptyTuple())),
+        "ask": BuiltInFunc(ak_type=types.FuncType([types.ActorType(types.TypeParameter("m")),
+                                                   types.TypeParameter("m"),
+                                                   types.PrimitiveType("Int")],
+                                                  ResultType)),
+        "reply": BuiltInFunc(ak_type=types.FuncType([types.SenderType(),
+                                                     types.TypeParameter("a")],
+                                                    types.EmptyTuple())),
+        # throughput counters, messages handled, dropped by the mailbox
+        # policy and waiting in the mailbox, the number of runs of queued
+        # messages the actor handled and its handled messages per second
+        "processed": BuiltInFunc(ak_type=types.FuncType([types.ActorType(types.TypeParameter("m"))],
+                                                        types.PrimitiveType("Int"))),
+        "dropped": BuiltInFunc(ak_type=types.FuncType([types.ActorType(types.TypeParameter("m"))],
+                                                      types.PrimitiveType("Int"))),
+        "queued": BuiltInFunc(ak_type=types.FuncType([types.ActorType(types.TypeParameter("m"))],
+                                                     types.PrimitiveType("Int"))),
+        "batches": BuiltInFunc(ak_type=types.FuncType([types.ActorType(types.TypeParameter("m"))],
+                                                      types.PrimitiveType("Int"))),
+        "throughput": BuiltInFunc(ak_type=types.FuncType([types.ActorType(types.TypeParameter("m"))],
+                                                         types.PrimitiveType("Float")))
     }
 }
-OptionType = types.VariantType("types.AkOption", [types.TypeParameter("t")], [])
-OptionType.constructors.extend([
-    types.VariantConstructor("types.Some", [types.TypeParameter("t")], OptionType),
-    types.VariantConstructor("types.None", [], OptionType)
-])
-
-ResultType = types.VariantType("types.AkResult", [types.TypeParameter("t")], [])
-ResultType.constructors.extend([
-    types.VariantConstructor("types.Ok", [types.TypeParameter("t")], ResultType),
-    types.VariantConstructor("types.Err", [types.PrimitiveType("String")], ResultType)
-])
-
 
+# list builtins that are fused into a single loop when chained, stages pass
+# elements on to the next stage and terminal operations consume them
+PIPELINE_STAGE_OPS = ("map", "filter", "take", "take_while", "drop", "drop_while")
+PIPELINE_TERMINAL_OPS = ("reduce", "any", "all", "find", "each")
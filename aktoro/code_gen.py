@@ -1,6 +1,445 @@
-import textwrap
+import json
+import re
+from contextlib import contextmanager
+from dataclasses import fields, is_dataclass
 from aktoro.ast import *
 import aktoro.types as types
+from aktoro.emitter import Emitter
+from aktoro.builtins import PIPELINE_STAGE_OPS
+from aktoro.visitor import NodeVisitor
+from aktoro.type_resolver import TypeMapperVisitor
+
+# generic functions are instantiated at most this many times before falling
+# back to a single instance with interface{} type parameters, which keeps
+# polymorphic recursion from generating instances forever
+MAX_FUNC_INSTANCES = 16
+
+# expressions that are generated with native Go operands, see operand_tree()
+OPERAND_TREE_NODES = (AddExpr, MultExpr, EqualityExpr, LogicalExpr, NotExpr, ParenExpr, PrimitiveLiteral)
+
+PRIMITIVE_GO_TYPES = {"Int": "types.AkInt", "Float": "types.AkFloat", "Bool": "types.AkBool", "bool": "types.AkBool"}
+
+# Go type of a stream, a pull based iterator returning the next element and
+# whether there was one
+STREAM_NEXT = "func() (interface{}, bool)"
+STREAM_FUNC = "func(interface{}) interface{}"
+
+# stream builtins are generated inline as function literals that are called
+# with the builtin's arguments, each entry holds the literal's parameters,
+# result type and body.  Streams are lazy, sources only produce and stages
+# only pull elements when the stream is consumed.
+STREAM_BUILTINS = {
+    "range": ("lo types.AkInt, hi types.AkInt", STREAM_NEXT, """\
+return func() (interface{}, bool) {
+	if lo >= hi {
+		return nil, false
+	}
+	lo++
+	return lo - 1, true
+}"""),
+    "iterate": (f"x interface{{}}, f {STREAM_FUNC}", STREAM_NEXT, """\
+started := false
+return func() (interface{}, bool) {
+	if started {
+		x = f(x)
+	}
+	started = true
+	return x, true
+}"""),
+    "lines": ("filename types.AkString", STREAM_NEXT, """\
+var file *os.File
+var scanner *bufio.Scanner
+done := false
+return func() (interface{}, bool) {
+	if done {
+		return nil, false
+	}
+	if file == nil {
+		var err error
+		if file, err = os.Open(string(filename)); err != nil {
+			panic(err)
+		}
+		scanner = bufio.NewScanner(file)
+		scanner.Buffer(make([]byte, 64*1024), 1<<30)
+	}
+	if scanner.Scan() {
+		return types.AkString(scanner.Text()), true
+	}
+	done = true
+	file.Close()
+	if err := scanner.Err(); err != nil {
+		panic(err)
+	}
+	return nil, false
+}"""),
+    "from_list": ("xs *list.List", STREAM_NEXT, """\
+return func() (interface{}, bool) {
+	if bool(list.Empty(xs).(types.AkBool)) {
+		return nil, false
+	}
+	x := list.First(xs)
+	xs = list.Rest(xs).(*list.List)
+	return x, true
+}"""),
+    "map": (f"next {STREAM_NEXT}, f {STREAM_FUNC}", STREAM_NEXT, """\
+return func() (interface{}, bool) {
+	x, ok := next()
+	if !ok {
+		return nil, false
+	}
+	return f(x), true
+}"""),
+    "filter": (f"next {STREAM_NEXT}, f {STREAM_FUNC}", STREAM_NEXT, """\
+return func() (interface{}, bool) {
+	for x, ok := next(); ok; x, ok = next() {
+		if bool(f(x).(types.AkBool)) {
+			return x, true
+		}
+	}
+	return nil, false
+}"""),
+    "take": (f"next {STREAM_NEXT}, n types.AkInt", STREAM_NEXT, """\
+return func() (interface{}, bool) {
+	if n <= 0 {
+		return nil, false
+	}
+	n--
+	return next()
+}"""),
+    "take_while": (f"next {STREAM_NEXT}, f {STREAM_FUNC}", STREAM_NEXT, """\
+done := false
+return func() (interface{}, bool) {
+	if done {
+		return nil, false
+	}
+	x, ok := next()
+	if !ok || !bool(f(x).(types.AkBool)) {
+		done = true
+		return nil, false
+	}
+	return x, true
+}"""),
+    "drop": (f"next {STREAM_NEXT}, n types.AkInt", STREAM_NEXT, """\
+return func() (interface{}, bool) {
+	for ; n > 0; n-- {
+		if _, ok := next(); !ok {
+			return nil, false
+		}
+	}
+	return next()
+}"""),
+    "reduce": (f"next {STREAM_NEXT}, acc interface{{}}, f func(interface{{}}, interface{{}}) interface{{}}",
+               "interface{}", """\
+for x, ok := next(); ok; x, ok = next() {
+	acc = f(acc, x)
+}
+return acc"""),
+    "each": (f"next {STREAM_NEXT}, f {STREAM_FUNC}", "", """\
+for x, ok := next(); ok; x, ok = next() {
+	f(x)
+}"""),
+    "to_list": (f"next {STREAM_NEXT}", "interface{}", """\
+xs := []interface{}{}
+for x, ok := next(); ok; x, ok = next() {
+	xs = append(xs, x)
+}
+return list.New(xs...)"""),
+}
+
+STREAM_IMPORTS = {
+    "lines": ['"bufio"', '"os"'],
+    "from_list": ['"github.com/aktoro-lang/container/list"'],
+    "to_list": ['"github.com/aktoro-lang/container/list"'],
+}
+
+# prologue of the parallel list builtins, copies the list into a slice and
+# fills in the default worker count and chunk size
+PARALLEL_PROLOGUE = """\
+elems := []interface{}{}
+for ; !bool(list.Empty(xs).(types.AkBool)); xs = list.Rest(xs).(*list.List) {
+	elems = append(elems, list.First(xs))
+}
+n := len(elems)
+if workers <= 0 {
+	workers = types.AkInt(runtime.GOMAXPROCS(0))
+}
+if chunk <= 0 {
+	chunk = types.AkInt((n + int(workers) - 1) / int(workers))
+}
+if chunk <= 0 {
+	chunk = 1
+}
+"""
+
+# a fixed pool of worker goroutines pulling chunk start indices from a
+# channel, the work runs once per chunk on the elements elems[lo:hi]
+PARALLEL_POOL = """\
+chunks := make(chan int)
+var wg sync.WaitGroup
+for w := 0; w < int(workers); w++ {{
+	wg.Add(1)
+	go func() {{
+		defer wg.Done()
+		for lo := range chunks {{
+			hi := lo + int(chunk)
+			if hi > n {{
+				hi = n
+			}}
+			{work}
+		}}
+	}}()
+}}
+for lo := 0; lo < n; lo += int(chunk) {{
+	chunks <- lo
+}}
+close(chunks)
+wg.Wait()
+"""
+
+
+def parallel_body(setup, work, result):
+    """
+    Body of a parallel list builtin: setup runs before the workers start,
+    work runs per chunk and result runs after all chunks are done.  Work
+    only writes to slots indexed by its own elements or chunk, so results
+    are combined in list order regardless of scheduling.
+    """
+    work = "\n\t\t\t".join(work.split("\n"))
+    return PARALLEL_PROLOGUE + setup + PARALLEL_POOL.format(work=work) + result
+
+
+PARALLEL_CHUNK_PARAMS = "chunk types.AkInt, workers types.AkInt"
+
+PARALLEL_BUILTINS = {
+    "pmap": (f"xs *list.List, f {STREAM_FUNC}, {PARALLEL_CHUNK_PARAMS}", "interface{}", parallel_body(
+        "out := make([]interface{}, n)\n",
+        """\
+for i := lo; i < hi; i++ {
+	out[i] = f(elems[i])
+}""",
+        "return list.New(out...)")),
+    "pfilter": (f"xs *list.List, f {STREAM_FUNC}, {PARALLEL_CHUNK_PARAMS}", "interface{}", parallel_body(
+        "keep := make([]bool, n)\n",
+        """\
+for i := lo; i < hi; i++ {
+	keep[i] = bool(f(elems[i]).(types.AkBool))
+}""",
+        """\
+out := []interface{}{}
+for i, x := range elems {
+	if keep[i] {
+		out = append(out, x)
+	}
+}
+return list.New(out...)""")),
+    "preduce": (f"xs *list.List, acc interface{{}}, f func(interface{{}}, interface{{}}) interface{{}}, "
+                f"{PARALLEL_CHUNK_PARAMS}", "interface{}", parallel_body(
+        "partials := make([]interface{}, (n+int(chunk)-1)/int(chunk))\n",
+        """\
+partial := elems[lo]
+for i := lo + 1; i < hi; i++ {
+	partial = f(partial, elems[i])
+}
+partials[lo/int(chunk)] = partial""",
+        """\
+for _, partial := range partials {
+	acc = f(acc, partial)
+}
+return acc""")),
+    "peach": (f"xs *list.List, f {STREAM_FUNC}, {PARALLEL_CHUNK_PARAMS}", "", parallel_body(
+        "",
+        """\
+for i := lo; i < hi; i++ {
+	f(elems[i])
+}""",
+        "")),
+}
+
+PARALLEL_IMPORTS = ['"runtime"', '"sync"', '"github.com/aktoro-lang/container/list"']
+
+ACTOR_ENVELOPE = types.ACTOR_ENVELOPE_GO_TYPE
+ACTOR_REDUCER = "func(interface{}, interface{}, interface{}) interface{}"
+ACTOR_DEFAULT_CAPACITY = 16
+ACTOR_DEFAULT_ASK_TIMEOUT_MS = 5000
+ACTOR_DEFAULT_BATCH_SIZE = 64
+
+# puts the envelope m into the mailbox of actor a according to its policy,
+# "block" waits for room so a full mailbox pushes back on the sender while
+# the drop policies never block and count the messages they drop
+ACTOR_DELIVER = """\
+delivered := true
+switch a.policy {
+case "drop_newest":
+	select {
+	case a.mailbox <- m:
+	default:
+		delivered = false
+		atomic.AddInt64(&a.dropped, 1)
+	}
+case "drop_oldest":
+	for sent := false; !sent; {
+		select {
+		case a.mailbox <- m:
+			sent = true
+		default:
+			select {
+			case <-a.mailbox:
+				atomic.AddInt64(&a.dropped, 1)
+			default:
+			}
+		}
+	}
+default:
+	a.mailbox <- m
+}
+"""
+
+
+def actor_start_body(setup, loop):
+    """
+    Body of the actor start builtins: setup checks the extra arguments and
+    loop is the actor goroutine.  The loops take every message already
+    queued before going back to waiting on the mailbox and only update the
+    throughput counters once per run.
+    """
+    loop = "\n\t".join(loop.split("\n"))
+    return f"""\
+{setup}if capacity <= 0 {{
+	capacity = {ACTOR_DEFAULT_CAPACITY}
+}}
+switch policy {{
+case "", "block", "drop_newest", "drop_oldest":
+default:
+	panic("actor: unknown mailbox policy " + string(policy))
+}}
+a := &{types.ACTOR_GO_TYPE[1:]}{{mailbox: make(chan {ACTOR_ENVELOPE}, capacity), policy: string(policy)}}
+a.started = time.Now().UnixNano()
+go func() {{
+	{loop}
+}}()
+return a"""
+
+
+def actor_counter(field):
+    return f"return types.AkInt(atomic.LoadInt64(&a.{field}))"
+
+
+ACTOR_BUILTINS = {
+    "start": (f"state interface{{}}, reducer {ACTOR_REDUCER}, capacity types.AkInt, policy types.AkString",
+              types.ACTOR_GO_TYPE, actor_start_body("", """\
+for m := range a.mailbox {
+	state = reducer(state, m.msg, m.reply)
+	n := 1
+drain:
+	for ; n < cap(a.mailbox); n++ {
+		select {
+		case m = <-a.mailbox:
+			state = reducer(state, m.msg, m.reply)
+		default:
+			break drain
+		}
+	}
+	atomic.AddInt64(&a.processed, int64(n))
+	atomic.AddInt64(&a.batches, 1)
+}""")),
+    "start_batch": (f"state interface{{}}, reducer {ACTOR_REDUCER}, batchSize types.AkInt, capacity types.AkInt, "
+                    "policy types.AkString", types.ACTOR_GO_TYPE, actor_start_body(f"""\
+if batchSize <= 0 {{
+	batchSize = {ACTOR_DEFAULT_BATCH_SIZE}
+}}
+""", """\
+for m := range a.mailbox {
+	msgs := []interface{}{m.msg}
+	senders := []interface{}{m.reply}
+drain:
+	for len(msgs) < int(batchSize) {
+		select {
+		case m = <-a.mailbox:
+			msgs = append(msgs, m.msg)
+			senders = append(senders, m.reply)
+		default:
+			break drain
+		}
+	}
+	state = reducer(state, list.New(msgs...), list.New(senders...))
+	atomic.AddInt64(&a.processed, int64(len(msgs)))
+	atomic.AddInt64(&a.batches, 1)
+}""")),
+    "send": (f"a {types.ACTOR_GO_TYPE}, msg interface{{}}", "", f"""\
+m := {ACTOR_ENVELOPE}{{msg: msg}}
+{ACTOR_DELIVER}_ = delivered"""),
+    "ask": (f"a {types.ACTOR_GO_TYPE}, msg interface{{}}, timeout types.AkInt", "interface{}", f"""\
+reply := make(chan interface{{}}, 1)
+m := {ACTOR_ENVELOPE}{{msg: msg, reply: reply}}
+{ACTOR_DELIVER}if !delivered {{
+	return types.Err{{P0: types.AkString("mailbox full")}}
+}}
+if timeout <= 0 {{
+	timeout = {ACTOR_DEFAULT_ASK_TIMEOUT_MS}
+}}
+timer := time.NewTimer(time.Duration(timeout) * time.Millisecond)
+defer timer.Stop()
+select {{
+case v := <-reply:
+	return types.Ok{{P0: v}}
+case <-timer.C:
+	return types.Err{{P0: types.AkString("timeout")}}
+}}"""),
+    "reply": ("sender chan interface{}, value interface{}", "", """\
+if sender != nil {
+	select {
+	case sender <- value:
+	default:
+	}
+}"""),
+    "processed": (f"a {types.ACTOR_GO_TYPE}", "types.AkInt", actor_counter("processed")),
+    "dropped": (f"a {types.ACTOR_GO_TYPE}", "types.AkInt", actor_counter("dropped")),
+    "batches": (f"a {types.ACTOR_GO_TYPE}", "types.AkInt", actor_counter("batches")),
+    "queued": (f"a {types.ACTOR_GO_TYPE}", "types.AkInt", "return types.AkInt(len(a.mailbox))"),
+    "throughput": (f"a {types.ACTOR_GO_TYPE}", "types.AkFloat", """\
+elapsed := time.Since(time.Unix(0, a.started)).Seconds()
+return types.AkFloat(float64(atomic.LoadInt64(&a.processed)) / elapsed)"""),
+}
+
+ACTOR_IMPORTS = {
+    "start": ['"sync/atomic"', '"time"'],
+    "start_batch": ['"sync/atomic"', '"time"', '"github.com/aktoro-lang/container/list"'],
+    "send": ['"sync/atomic"'],
+    "ask": ['"sync/atomic"', '"time"'],
+    "processed": ['"sync/atomic"'],
+    "dropped": ['"sync/atomic"'],
+    "batches": ['"sync/atomic"'],
+    "throughput": ['"sync/atomic"', '"time"'],
+}
+
+# builtins generated inline by visit_InlineBuiltinCall, by package, with the
+# imports each one needs
+INLINE_BUILTINS = {
+    "stream": (STREAM_BUILTINS, STREAM_IMPORTS),
+    "actor": (ACTOR_BUILTINS, ACTOR_IMPORTS),
+    "list": (PARALLEL_BUILTINS, dict.fromkeys(PARALLEL_BUILTINS, PARALLEL_IMPORTS)),
+}
+
+# prologue of main when the program records a CPU profile, which is written
+# when main returns.  The names end in __, which no Aktoro name generates,
+# so they cannot clash with the program's top level variables.
+CPU_PROFILE_PROLOGUE = """\
+profile__, profileErr__ := os.Create({filename})
+if profileErr__ != nil {{
+	panic(profileErr__)
+}}
+if profileErr__ = pprof.StartCPUProfile(profile__); profileErr__ != nil {{
+	panic(profileErr__)
+}}
+defer func() {{
+	pprof.StopCPUProfile()
+	profile__.Close()
+}}()
+"""
+
+# dicts with keys of these types are built and indexed through the dict
+# functions specialized for them, which hash and compare the native value
+SPECIALIZED_DICT_KEYS = ("Int", "String", "Bool")
 
 
 def snake_to_camel(name):
@@ -22,25 +461,187 @@ def snake_to_upper_camel(name):
     return camel_name
 
 
-class CodeGenVisitor():
+def go_string(value):
+    """
+    Go string literal of value, JSON string escapes are valid in Go.
+    """
+    return json.dumps(value, ensure_ascii=False)
+
+
+def type_hash_seed(name):
+    """
+    32 bit FNV-1a hash of a record or variant constructor name, the initial
+    AkHash of its values so that constructors with equal fields differ.
+    """
+    h = 2166136261
+    for byte in name.encode():
+        h = ((h ^ byte) * 16777619) & 0xffffffff
+    return h
+
+
+def is_untyped_go_expr(node):
+    """
+    Whether the native Go code of an operand tree is an untyped constant or
+    comparison, which needs a conversion to get its Ak type.
+    """
+    if isinstance(node, PrimitiveLiteral):
+        return node.ak_type.name in PRIMITIVE_GO_TYPES
+    if isinstance(node, EqualityExpr):
+        return True
+    if isinstance(node, (ParenExpr, NotExpr)):
+        return is_untyped_go_expr(node.expr)
+    if isinstance(node, (AddExpr, MultExpr, LogicalExpr)):
+        return all(is_untyped_go_expr(e) for e in node.exprs if not isinstance(e, str))
+    return False
 
-    def __init__(self):
+
+def type_param_names(ak_type, names=None):
+    """
+    Collect the names of all type parameters referenced by ak_type.
+    """
+    if names is None:
+        names = set()
+    if isinstance(ak_type, types.TypeParameter):
+        names.add(ak_type.param)
+    elif isinstance(ak_type, types.ListType):
+        type_param_names(ak_type.elem_type, names)
+    elif isinstance(ak_type, types.DictType):
+        type_param_names(ak_type.key_type, names)
+        type_param_names(ak_type.val_type, names)
+    elif isinstance(ak_type, types.FuncType):
+        for param_type in ak_type.param_types:
+            type_param_names(param_type, names)
+        type_param_names(ak_type.return_type, names)
+    elif isinstance(ak_type, types.ParameterizedType):
+        for type_param in ak_type.type_params:
+            type_param_names(type_param, names)
+    return names
+
+
+def variant_field_type_params(node, names=None):
+    """
+    Collect the names of the type parameters referenced by the types of the
+    variant fields destructured in node.
+    """
+    if names is None:
+        names = set()
+    if isinstance(node, VariantFieldAccess):
+        type_param_names(node.ak_type, names)
+    elif is_dataclass(node):
+        for field in fields(node):
+            variant_field_type_params(getattr(node, field.name), names)
+    elif isinstance(node, (list, tuple)):
+        for value in node:
+            variant_field_type_params(value, names)
+    elif isinstance(node, dict):
+        for value in node.values():
+            variant_field_type_params(value, names)
+    return names
+
+
+class CodeGenVisitor(NodeVisitor):
+    # patterns, range indexes and pipeline stages are generated by their
+    # parent expression and variant param decls are rewritten into VarDecls
+    # by the parser
+    node_classes = tuple(cls for cls in NODE_CLASSES
+                         if cls not in (Pattern, DefaultPattern, RangeIndex, VariantParamDecl, PipelineStage))
+
+    def __init__(self, sink=None, typed_signatures=False, main_func="main", package_name="main", cpu_profile=None):
+        # Go code is written to the emitter as nodes are visited, statements
+        # and expressions are not returned as strings
+        self.emitter = Emitter(sink)
         self.imports = set()
+        # name of the Go function holding the top level statements, files
+        # of a multi file package each get their own
+        self.main_func = main_func
+        # programs are generated as package main, unless they are linked into
+        # another binary as a package of their own
+        self.package_name = package_name
+        # when set, the main function writes a pprof CPU profile of the
+        # program to this file
+        self.cpu_profile = cpu_profile
+        # when set, functions get concrete Go signatures and generic
+        # functions are monomorphized per instantiation
+        self.typed_signatures = typed_signatures
+        self.func_defs = {}
+        # maps type parameter names to Go types inside a function instance
+        self.type_env = {}
+        self.instances = {}
+        self.instance_counts = {}
+        self.pending_instances = []
+        # type parameters of the destructured variant fields of each function
+        self.variant_field_params = {}
+        # set while generating the operands of an arithmetic, comparison or
+        # logical expression tree
+        self.native_operands = False
+        # names of records and variants used as dict keys, which get an
+        # AkHash method
+        self.hashed_types = set()
 
-    def visit(self, node):
-        '''
-        Execute a method of the form visit_NodeName(node) where
-        NodeName is the name of the class of a particular node.
-        '''
+    def go_type(self, ak_type):
+        """
+        Go type of ak_type, with type parameters bound by the function
+        instance currently being generated.
+        """
+        if isinstance(ak_type, types.TypeParameter):
+            go_type = self.type_env.get(ak_type.param, ak_type.go_code())
+        else:
+            go_type = ak_type.go_code()
+        if "types." in go_type:
+            self.imports.add('"github.com/aktoro-lang/types"')
+        return go_type
+
+    def visit_lines(self, lines):
+        for line in lines:
+            if line is not None:
+                self.visit(line)
+                self.emitter.newline()
+
+    def visit_separated(self, nodes, separator=", "):
+        for i, node in enumerate(nodes):
+            if i:
+                self.emitter.write(separator)
+            self.visit(node)
+
+    def visit_or_default(self, node, default):
         if node:
-            method = 'visit_' + node.__class__.__name__
-            visitor = getattr(self, method)
-            return visitor(node)
+            self.visit(node)
         else:
-            return None
+            self.emitter.write(default)
 
-    def visit_Program(self, node):
+    def visit_operand(self, node):
+        """
+        Visit an operand of an expression tree.  Operands that are trees
+        themselves are generated natively, anything else is a boundary and
+        gets its Ak type as usual.
+        """
+        outer_native_operands = self.native_operands
+        self.native_operands = isinstance(node, OPERAND_TREE_NODES)
+        try:
+            self.visit(node)
+        finally:
+            self.native_operands = outer_native_operands
 
+    @contextmanager
+    def operand_tree(self, node):
+        """
+        Arithmetic, comparison and logical expressions compile to native Go
+        operators on the underlying int64, float64 and bool values: literals
+        are untyped constants and comparisons are not wrapped in AkBool.
+        Only the root of the tree is converted to its Ak type, and only when
+        Go would otherwise infer an untyped constant or bool.
+        """
+        go_type = None
+        if not self.native_operands and is_untyped_go_expr(node):
+            go_type = PRIMITIVE_GO_TYPES.get(node.ak_type.name)
+        if go_type:
+            self.imports.add('"github.com/aktoro-lang/types"')
+            self.emitter.write(f"{go_type}(")
+        yield
+        if go_type:
+            self.emitter.write(")")
+
+    def visit_Program(self, node):
         record_decls = []
         func_defs = []
         main_statements = []
@@ -51,354 +652,795 @@ class CodeGenVisitor():
                 func_defs.append(line)
             elif line is not None:
                 main_statements.append(line)
-        main_go_code = "\n".join([self.visit(s) for s in main_statements])
-        record_decl_go_code = "\n".join([self.visit(r) for r in record_decls])
-        func_def_go_code = "\n".join([self.visit(f) for f in func_defs])
-        imports_go_code = "\n".join(list(self.imports))
-
-        go_body = textwrap.dedent("""
-                    package main
-                    import (
-                    {imports}
-                    )
-                    {record_decls}
-                    {func_defs}
-                    func main() {{
-                    {main_code}
-                    }}
-
-                    """)
-        return go_body.format(main_code=textwrap.indent(main_go_code, "\t"),
-                              record_decls=record_decl_go_code,
-                              func_defs=func_def_go_code,
-                              imports=imports_go_code)
+        self.func_defs = {f.name: f for f in func_defs}
+        if self.typed_signatures:
+            # generic functions are only generated once their instantiations are known
+            func_defs = [f for f in func_defs if not type_param_names(f.ak_type)]
+
+        # imports are only known once everything has been visited, so the
+        # sections are buffered and written after the import block
+        main_go_code, record_decl_go_code, func_def_go_code, hash_method_go_code = [], [], [], []
+        emitter = self.emitter
+        with emitter.redirect(main_go_code), emitter.indented():
+            self.visit_lines(main_statements)
+        with emitter.redirect(record_decl_go_code):
+            for record_decl in record_decls:
+                self.visit(record_decl)
+        with emitter.redirect(func_def_go_code):
+            for func_def in func_defs:
+                self.visit(func_def)
+            while self.pending_instances:
+                func_def, instance_name, type_env = self.pending_instances.pop(0)
+                self.visit_TypedFuncDef(func_def, instance_name, type_env)
+        with emitter.redirect(hash_method_go_code):
+            self.emit_hash_methods(record_decls)
+        if self.cpu_profile:
+            self.imports.update(['"os"', '"runtime/pprof"'])
+
+        emitter.line(f"package {self.package_name}")
+        emitter.newline()
+        emitter.line("import (")
+        with emitter.indented():
+            for go_import in sorted(self.imports):
+                emitter.line(go_import)
+        emitter.line(")")
+        emitter.newline()
+        emitter.write_chunks(record_decl_go_code)
+        emitter.write_chunks(hash_method_go_code)
+        emitter.write_chunks(func_def_go_code)
+        emitter.line(f"func {self.main_func}() {{")
+        if self.cpu_profile:
+            prologue = CPU_PROFILE_PROLOGUE.format(filename=go_string(str(self.cpu_profile)))
+            with emitter.indented():
+                for line in prologue.rstrip("\n").split("\n"):
+                    emitter.line(line)
+        emitter.write_chunks(main_go_code)
+        emitter.line("}")
 
     def visit_VarDecl(self, node):
         node_name = snake_to_camel(node.name)
-        return f"{node_name} := {self.visit(node.expr)}"
+        self.emitter.write(f"{node_name} := ")
+        self.visit(node.expr)
 
     def visit_VarIfAssign(self, node):
-        var_decl = self.visit_VarDeclNoInit(node)
-
-        return var_decl + "\n" + self.visit(node.expr)
+        self.visit_VarDeclNoInit(node)
+        self.emitter.newline()
+        self.visit(node.expr)
 
     def visit_VarMatchAssign(self, node):
-        var_decl = self.visit_VarDeclNoInit(node)
-
-        return var_decl + "\n" + self.visit(node.expr)
+        self.visit_VarDeclNoInit(node)
+        self.emitter.newline()
+        self.visit(node.expr)
 
     def visit_VarDeclNoInit(self, node):
         node_name = snake_to_camel(node.name)
-        return f"var {node_name} {node.ak_type.go_code()}"
+        self.emitter.write(f"var {node_name} {self.go_type(node.ak_type)}")
 
     def visit_VarAssignMut(self, node):
         node_name = snake_to_camel(node.name)
-        expr = self.visit(node.expr)
-        return f"{node_name} = {expr}"
+        self.emitter.write(f"{node_name} = ")
+        self.visit(node.expr)
 
     def visit_RecordDecl(self, node):
-        fields = "\n".join(
-            [f"{snake_to_upper_camel(name)} {ak_type.go_code()}" for name, ak_type in node.fields.items()])
-        fields = textwrap.indent(fields, "\t")
-        go_code = textwrap.dedent(f"""
-        type {node.name} struct {{
-        {fields}
-        }}
-        """)
-        return go_code
+        emitter = self.emitter
+        emitter.line(f"type {node.name} struct {{")
+        with emitter.indented():
+            for name, ak_type in node.fields.items():
+                emitter.line(f"{snake_to_upper_camel(name)} {ak_type.go_code()}")
+        emitter.line("}")
+        emitter.newline()
 
     def visit_VariantDecl(self, node):
-        variant_go_code = textwrap.dedent(f""" 
-        type {node.name} interface {{ 
-            {node.name}()
-        }}
-        """)
+        emitter = self.emitter
+        emitter.line(f"type {node.name} interface {{")
+        with emitter.indented():
+            emitter.line(f"{node.name}()")
+        emitter.line("}")
+        emitter.newline()
 
-        constructor_go_code = []
         for constructor in node.constructors:
-            constructor_params = "; ".join([
-                f"P{i} {param.go_code()}"
-                for i, param in enumerate(constructor.params)
-            ])
-            constructor_params = textwrap.indent(constructor_params, "\t")
-            constructor_go_code.append(textwrap.dedent(f"""
-            type {constructor.name} struct {{ 
-            {constructor_params}
-            }}
-            
-            func ({constructor.name}) {node.name}() {{}}
-            
-            func ({constructor.name}) AkVariantConstructor() {{}}
-            """))
-        return variant_go_code + "\n".join(constructor_go_code)
+            emitter.line(f"type {constructor.name} struct {{")
+            with emitter.indented():
+                for i, param in enumerate(constructor.params):
+                    emitter.line(f"P{i} {param.go_code()}")
+            emitter.line("}")
+            emitter.newline()
+            emitter.line(f"func ({constructor.name}) {node.name}() {{}}")
+            emitter.newline()
+            emitter.line(f"func ({constructor.name}) AkVariantConstructor() {{}}")
+            emitter.newline()
+
+    def emit_hash_methods(self, type_decls):
+        """
+        Give the records and variants used as dict keys, and the ones in
+        their fields, an AkHash method combining the hashes of the fields,
+        so dicts hash them structurally instead of by their printed form.
+        """
+        decls = {decl.name: decl for decl in type_decls}
+        pending = sorted(name for name in self.hashed_types if name in decls)
+        done = set(pending)
+        while pending:
+            decl = decls[pending.pop(0)]
+            if isinstance(decl, RecordDecl):
+                structs = [(decl.name, [(snake_to_upper_camel(name), ak_type)
+                                        for name, ak_type in decl.fields.items()])]
+            else:
+                structs = [(constructor.name, [(f"P{i}", ak_type) for i, ak_type in enumerate(constructor.params)])
+                           for constructor in decl.constructors]
+            for name, fields in structs:
+                self.emit_hash_method(name, fields)
+                for _, ak_type in fields:
+                    if isinstance(ak_type, (types.RecordType, types.VariantType)) and ak_type.name not in done:
+                        done.add(ak_type.name)
+                        pending.append(ak_type.name)
+
+    def emit_hash_method(self, struct_name, fields):
+        emitter = self.emitter
+        self.imports.add('"github.com/aktoro-lang/container/dict"')
+        emitter.line(f"func (r {struct_name}) AkHash() uint32 {{")
+        with emitter.indented():
+            if not fields:
+                emitter.line(f"return {type_hash_seed(struct_name)}")
+            else:
+                emitter.line(f"h := uint32({type_hash_seed(struct_name)})")
+                for go_name, ak_type in fields:
+                    if isinstance(ak_type, types.PrimitiveType) and ak_type.name in SPECIALIZED_DICT_KEYS:
+                        field_hash = f"dict.Hash{ak_type.name}(r.{go_name})"
+                    else:
+                        field_hash = f"dict.Hash(r.{go_name})"
+                    emitter.line(f"h = dict.HashCombine(h, {field_hash})")
+                emitter.line("return h")
+        emitter.line("}")
+        emitter.newline()
 
     def visit_VariantLiteral(self, node):
-        vals = [self.visit(val) for val in node.values]
-        vals = ",\n".join([textwrap.indent(f, "\t") for f in vals])
-        go_code = f"{node.ak_type.go_code()}({node.constructor}{{\n" + textwrap.indent(vals, "\t") + textwrap.dedent(
-            "})")
-        return go_code
+        emitter = self.emitter
+        emitter.write(f"{node.ak_type.go_code()}({node.constructor}{{")
+        if node.values:
+            emitter.newline()
+            with emitter.indented():
+                for val in node.values:
+                    self.visit(val)
+                    emitter.line(",")
+        emitter.write("})")
 
     def visit_VariantPattern(self, node):
-        return node.constructor
+        self.emitter.write(node.constructor)
 
     def visit_VarUsage(self, node):
-        return snake_to_camel(node.name)
+        if self.typed_signatures and node.name in self.func_defs:
+            self.emitter.write(self.func_value_adapter(self.func_defs[node.name]))
+        else:
+            self.emitter.write(snake_to_camel(node.name))
 
     def visit_VariantTestExpr(self, node):
-        return f"{node.name} := {self.visit(node.expr)}.(type)"
+        self.emitter.write(f"{node.name} := ")
+        self.visit(node.expr)
+        self.emitter.write(".(type)")
 
     def visit_PackageVarUsage(self, node):
         name = snake_to_camel(node.func_name)
         name = name[:1].upper() + name[1:]
-        return f"{node.package_name}.{name}"
+        self.emitter.write(f"{node.package_name}.{name}")
 
     def visit_FieldAccess(self, node):
-        return f"{self.visit(node.record_name)}.{snake_to_upper_camel(node.field_name)}"
+        self.visit(node.record_name)
+        self.emitter.write(f".{snake_to_upper_camel(node.field_name)}")
+
+    def visit_VariantFieldAccess(self, node):
+        self.visit(node.var)
+        self.emitter.write(f".P{node.index}")
+        # generic fields are interface{} in the constructor struct
+        go_type = self.go_type(node.ak_type)
+        if node.field_type.go_code() == "interface{}" and go_type != "interface{}":
+            self.emitter.write(f".({go_type})")
 
     def visit_PrimitiveLiteral(self, node):
-        self.imports.add('"github.com/aktoro-lang/types"')
         literal_type = node.ak_type.name
+        if self.native_operands and literal_type in PRIMITIVE_GO_TYPES:
+            self.emitter.write(node.value)
+            return
+        self.imports.add('"github.com/aktoro-lang/types"')
         if literal_type == "String":
-            return f"types.AkString({node.value})"
+            self.emitter.write(f"types.AkString({node.value})")
         elif literal_type == "Int":
-            return f"types.AkInt({node.value})"
+            self.emitter.write(f"types.AkInt({node.value})")
         elif literal_type == "Float":
-            return f"types.AkFloat({node.value})"
+            self.emitter.write(f"types.AkFloat({node.value})")
         elif literal_type == "Bool":
-            return f"types.AkBool({node.value})"
+            self.emitter.write(f"types.AkBool({node.value})")
         else:
             raise TypeError("unhandled primitive type")
 
     def visit_ListLiteral(self, node):
         self.imports.add('"github.com/aktoro-lang/container/list"')
-        elems = [self.visit(elem) for elem in node.values]
-        elem_go_code = ", ".join(elems)
-        return f"list.New({elem_go_code})"
+        self.emitter.write("list.New(")
+        self.visit_separated(node.values)
+        self.emitter.write(")")
+
+    def dict_key_kind(self, dict_type):
+        """
+        Name of the specialized dict functions for the keys of dict_type, or
+        None for keys that go through the generic ones.  Records and variants
+        used as keys are recorded to get a structural AkHash method.
+        """
+        key_type = dict_type.key_type
+        if isinstance(key_type, (types.RecordType, types.VariantType)):
+            self.hashed_types.add(key_type.name)
+        if isinstance(key_type, types.PrimitiveType) and key_type.name in SPECIALIZED_DICT_KEYS:
+            return key_type.name
+        return None
+
+    def visit_key_values(self, key_values, dict_type):
+        key_kind = self.dict_key_kind(dict_type)
+        if not key_kind:
+            self.visit_separated(key_values)
+            return
+        for i, key_value in enumerate(key_values):
+            if i:
+                self.emitter.write(", ")
+            self.emitter.write(f"dict.New{key_kind}KeyValue(")
+            self.visit(key_value.key)
+            self.emitter.write(", ")
+            self.visit(key_value.value)
+            self.emitter.write(")")
 
     def visit_DictLiteral(self, node):
         self.imports.add('"github.com/aktoro-lang/container/dict"')
-        kv_pairs = [self.visit(kv) for kv in node.key_values]
-        kv_pairs_go_code = ",\n".join(kv_pairs)
-        return f"dict.New({kv_pairs_go_code})"
+        self.emitter.write("dict.New(")
+        self.visit_key_values(node.key_values, node.ak_type)
+        self.emitter.write(")")
 
     def visit_KeyValue(self, node):
-        return f"dict.NewKeyValue({self.visit(node.key)},{self.visit(node.value)})"
+        self.emitter.write("dict.NewKeyValue(")
+        self.visit(node.key)
+        self.emitter.write(", ")
+        self.visit(node.value)
+        self.emitter.write(")")
 
     def visit_DictUpdate(self, node):
-        updates_go_code = ",".join([self.visit(update) for update in node.updates])
-        return f"dict.Put({self.visit(node.var)}, {updates_go_code})"
+        self.emitter.write("dict.Put(")
+        self.visit(node.var)
+        self.emitter.write(", ")
+        self.visit_key_values(node.updates, node.ak_type)
+        self.emitter.write(")")
 
     def visit_RecordLiteral(self, node):
-        fields = [f"{snake_to_upper_camel(name)}: {self.visit(expr)}" for name, expr in node.fields.items()]
-        fields = ",\n".join([textwrap.indent(f, "\t") for f in fields])
-        record_type = node.ak_type.go_code()
-        go_code = f"{record_type}{{\n" + textwrap.indent(fields, "\t") + textwrap.dedent("}")
-        return go_code
+        emitter = self.emitter
+        emitter.write(f"{node.ak_type.go_code()}{{")
+        emitter.newline()
+        with emitter.indented():
+            for name, expr in node.fields.items():
+                emitter.write(f"{snake_to_upper_camel(name)}: ")
+                self.visit(expr)
+                emitter.line(",")
+        emitter.write("}")
 
     def visit_RecordUpdate(self, node):
-        record_type = node.ak_type.go_code()
+        emitter = self.emitter
         updated_fields = set([field for field, value in node.updates])
-        all_fields = set(node.ak_type.fields.keys())
-        unchanged_fields = all_fields - updated_fields
-        unchanged_go_code = []
-        for name in unchanged_fields:
-            name = snake_to_upper_camel(name)
-            unchanged_go_code.append(f"{name}: {self.visit(node.var)}.{name}")
-        updated_go_code = [f"{snake_to_upper_camel(name)}: {self.visit(expr)}" for name, expr in node.updates]
-        all_fields = unchanged_go_code + updated_go_code
-        fields_go_code = ",\n".join([textwrap.indent(f, "\t") for f in all_fields])
-        go_code = f"{record_type}{{\n" + textwrap.indent(fields_go_code, "\t") + textwrap.dedent("}")
-        return go_code
+        emitter.write(f"{node.ak_type.go_code()}{{")
+        emitter.newline()
+        with emitter.indented():
+            for name in node.ak_type.fields.keys():
+                if name in updated_fields:
+                    continue
+                name = snake_to_upper_camel(name)
+                emitter.write(f"{name}: ")
+                self.visit(node.var)
+                emitter.line(f".{name},")
+            for name, expr in node.updates:
+                emitter.write(f"{snake_to_upper_camel(name)}: ")
+                self.visit(expr)
+                emitter.line(",")
+        emitter.write("}")
 
     def visit_EqualityExpr(self, node):
-        return f"types.AkBool({self.visit(node.left)} {node.op} {self.visit(node.right)})"
+        with self.operand_tree(node):
+            self.visit_operand(node.left)
+            self.emitter.write(f" {node.op} ")
+            self.visit_operand(node.right)
+
+    def visit_operator_chain(self, node, operators):
+        with self.operand_tree(node):
+            for i, e in enumerate(node.exprs):
+                if i:
+                    self.emitter.write(" ")
+                if isinstance(e, str):
+                    self.emitter.write(operators[e])
+                else:
+                    self.visit_operand(e)
 
     def visit_AddExpr(self, node):
-        exprs = []
-        for e in node.exprs:
-            if e in ["+", "-"]:
-                exprs.append(e)
-            else:
-                exprs.append(self.visit(e))
-        return " ".join(exprs)
+        self.visit_operator_chain(node, {"+": "+", "-": "-"})
 
     def visit_MultExpr(self, node):
-        exprs = []
-        for e in node.exprs:
-            if e in ["*", "/", "%"]:
-                exprs.append(e)
-            else:
-                exprs.append(self.visit(e))
-        return " ".join(exprs)
+        self.visit_operator_chain(node, {"*": "*", "/": "/", "%": "%"})
 
     def visit_LogicalExpr(self, node):
-        operators = {
-            "and": "&&",
-            "or": "||"
-        }
-        exprs = []
-        for e in node.exprs:
-            if e in operators.keys():
-                exprs.append(operators[e])
-            else:
-                exprs.append(self.visit(e))
-        return " ".join(exprs)
+        self.visit_operator_chain(node, {"and": "&&", "or": "||"})
 
     def visit_NotExpr(self, node):
-        return f"types.AkBool(!{self.visit(node.expr)})"
+        with self.operand_tree(node):
+            self.emitter.write("!")
+            self.visit_operand(node.expr)
 
     def visit_ParenExpr(self, node):
-        return f"({self.visit(node.expr)})"
+        with self.operand_tree(node):
+            self.emitter.write("(")
+            self.visit_operand(node.expr)
+            self.emitter.write(")")
 
     def visit_ParamDecl(self, node):
-        return f"{node.name} := p{node.index}.({node.ak_type.go_code()})"
+        self.emitter.write(f"{node.name} := p{node.index}.({self.go_type(node.ak_type)})")
 
     def visit_RecordDestructParam(self, node):
-        go_code = []
-        for param in node.params:
-            go_code.append(
-                f"{param.name} := p{node.index}.({node.parent_type.go_code()}).{snake_to_upper_camel(param.name)}")
-        return "\n".join(go_code)
+        record = f"p{node.index}"
+        if not self.typed_signatures:
+            record += f".({self.go_type(node.parent_type)})"
+        for i, param in enumerate(node.params):
+            if i:
+                self.emitter.newline()
+            self.emitter.write(f"{param.name} := {record}.{snake_to_upper_camel(param.name)}")
 
     def visit_FuncDef(self, node):
+        if self.typed_signatures:
+            self.visit_TypedFuncDef(node, snake_to_camel(node.name), {})
+            return
+        emitter = self.emitter
         param_interfaces = ", ".join([f"p{i} interface{{}}" for i in range(len(node.params))])
-        # params = []
-        # for i, param in enumerate(node.params):
-        #     params.append(f"{param.name} := p{i}.({param.ak_type.go_code()})")
-        params = [self.visit(param) for param in node.params]
-        params = "\n".join(params)
-        return_type = "interface{}"
         func_name = snake_to_camel(node.name)
-        func_body = "\n".join([self.visit(line) for line in node.body])
-        go_code = f"""func {func_name}({param_interfaces}) {return_type} {{
-        {params}
-        {func_body}
-        }}
+        emitter.line(f"func {func_name}({param_interfaces}) interface{{}} {{")
+        with emitter.indented():
+            self.visit_lines(node.params)
+            self.visit_lines(node.body)
+        emitter.line("}")
+        emitter.newline()
+
+    def visit_TypedFuncDef(self, node, func_name, type_env):
+        emitter = self.emitter
+        outer_type_env, self.type_env = self.type_env, type_env
+        params = []
+        param_decls = []
+        for param in node.params:
+            if isinstance(param, RecordDestructParam):
+                params.append(f"p{param.index} {self.go_type(param.parent_type)}")
+                param_decls.append(param)
+            else:
+                params.append(f"{snake_to_camel(param.name)} {self.go_type(param.ak_type)}")
+        params = ", ".join(params)
+        return_type = self.go_return_type(node.return_type)
+        if return_type:
+            emitter.line(f"func {func_name}({params}) {return_type} {{")
+        else:
+            emitter.line(f"func {func_name}({params}) {{")
+        with emitter.indented():
+            self.visit_lines(param_decls)
+            self.visit_lines(node.body)
+        emitter.line("}")
+        emitter.newline()
+        self.type_env = outer_type_env
+
+    def go_return_type(self, ak_type):
+        if isinstance(ak_type, types.EmptyTuple):
+            return ""
+        return self.go_type(ak_type)
+
+    def instance_type_env(self, func_def, args):
+        """
+        Bind the type parameters of func_def to the Go types of the call
+        arguments.  Parameters that cannot be bound stay interface{}.
+        """
+        type_params = sorted(type_param_names(func_def.ak_type))
+        if not type_params:
+            return {}
+        try:
+            type_mapper = TypeMapperVisitor()
+            for f_type, arg in zip(func_def.ak_type.param_types, args):
+                type_mapper.visit(f_type, arg.ak_type)
+            param_map = type_mapper.get_param_map()
+        except (AttributeError, TypeError):
+            param_map = {}
+        return {param: self.go_type(param_map[param]) if param in param_map else "interface{}"
+                for param in type_params}
+
+    def request_instance(self, func_def, type_env):
+        """
+        Return the Go name of func_def instantiated with type_env, queueing
+        the instance for generation the first time it is seen.
+        """
+        if self.instance_counts.get(func_def.name, 0) >= MAX_FUNC_INSTANCES or \
+                not self.binds_variant_fields(func_def, type_env):
+            type_env = {param: "interface{}" for param in type_env}
+        key = (func_def.name, tuple(sorted(type_env.items())))
+        if key in self.instances:
+            return self.instances[key]
+        instance_name = snake_to_camel(func_def.name)
+        bound_types = [go_type for _, go_type in key[1] if go_type != "interface{}"]
+        if bound_types:
+            suffix = "_".join(re.sub(r"\W+", "_", go_type.split(".")[-1]).strip("_") for _, go_type in key[1])
+            instance_name = f"{instance_name}_{suffix}"
+        self.instances[key] = instance_name
+        self.instance_counts[func_def.name] = self.instance_counts.get(func_def.name, 0) + 1
+        if type_env:
+            self.pending_instances.append((func_def, instance_name, type_env))
+        return instance_name
+
+    def binds_variant_fields(self, func_def, type_env):
+        """
+        Whether type_env binds the types of all the variant fields that
+        func_def destructures.  Fields typed by a parameter of some other
+        generic type stay interface{}, which only the interface{} instance
+        can return or pass on.
+        """
+        if func_def.name not in self.variant_field_params:
+            self.variant_field_params[func_def.name] = variant_field_type_params(func_def.body)
+        return self.variant_field_params[func_def.name] <= type_env.keys()
+
+    def func_value_adapter(self, func_def):
+        """
+        Wrap a typed function so it can be passed where a boxed
+        func(interface{}...) interface{} value is expected.
         """
-        return go_code
+        type_env = {param: "interface{}" for param in type_param_names(func_def.ak_type)}
+        instance_name = self.request_instance(func_def, type_env)
+        outer_type_env, self.type_env = self.type_env, type_env
+        params = ", ".join([f"p{i} interface{{}}" for i in range(len(func_def.ak_type.param_types))])
+        args = []
+        for i, param_type in enumerate(func_def.ak_type.param_types):
+            go_type = self.go_type(param_type)
+            args.append(f"p{i}" if go_type == "interface{}" else f"p{i}.({go_type})")
+        self.type_env = outer_type_env
+        call = f"{instance_name}({', '.join(args)})"
+        if isinstance(func_def.return_type, types.EmptyTuple):
+            return f"func({params}) interface{{}} {{ {call}; return nil }}"
+        return f"func({params}) interface{{}} {{ return {call} }}"
+
+    def visit_TypedFuncCall(self, node, func_def):
+        type_env = self.instance_type_env(func_def, node.args)
+        instance_name = self.request_instance(func_def, type_env)
+        self.emitter.write(f"{instance_name}(")
+        self.visit_separated(node.args)
+        self.emitter.write(")")
+        if isinstance(node.ak_type, types.EmptyTuple):
+            return
+        outer_type_env, self.type_env = self.type_env, type_env
+        instance_return_type = self.go_type(func_def.return_type)
+        self.type_env = outer_type_env
+        expected_type = self.go_type(node.ak_type)
+        if instance_return_type == "interface{}" and expected_type != "interface{}":
+            self.emitter.write(f".({expected_type})")
+
+    def visit_InlineBuiltinCall(self, node, inline_builtins, inline_imports):
+        """
+        Generate a call to a builtin that is implemented inline as a Go
+        function literal.  Omitted trailing arguments are passed as the zero
+        value of their type, which the builtins treat as "use the default".
+        """
+        func_name = node.func_name
+        params, result_type, body = inline_builtins[func_name.func_name]
+        if "types." in params + body:
+            self.imports.add('"github.com/aktoro-lang/types"')
+        self.imports.update(inline_imports.get(func_name.func_name, []))
+        emitter = self.emitter
+        if result_type:
+            emitter.line(f"func({params}) {result_type} {{")
+        else:
+            emitter.line(f"func({params}) {{")
+        with emitter.indented():
+            for line in body.rstrip("\n").split("\n"):
+                if line:
+                    emitter.line(line)
+        emitter.write("}(")
+        self.visit_separated(node.args)
+        for param_type in func_name.ak_type.param_types[len(node.args):]:
+            emitter.write(", ", '""' if param_type == types.PrimitiveType("String") else "0")
+        emitter.write(")")
+        if result_type == "interface{}":
+            emitter.write(f".({self.go_type(node.ak_type)})")
 
     def visit_FuncCall(self, node):
-        func_name = self.visit(node.func_name)
-        args = ", ".join([self.visit(arg) for arg in node.args])
-        return_cast = ""
+        if isinstance(node.func_name, PackageVarUsage) and node.func_name.package_name in INLINE_BUILTINS:
+            inline_builtins, inline_imports = INLINE_BUILTINS[node.func_name.package_name]
+            if node.func_name.func_name in inline_builtins:
+                self.visit_InlineBuiltinCall(node, inline_builtins, inline_imports)
+                return
+        if self.typed_signatures and isinstance(node.func_name, VarUsage) and node.func_name.name in self.func_defs:
+            self.visit_TypedFuncCall(node, self.func_defs[node.func_name.name])
+            return
+        self.visit(node.func_name)
+        self.emitter.write("(")
+        self.visit_separated(node.args)
+        self.emitter.write(")")
         if not isinstance(node.ak_type, types.EmptyTuple):
-            return_cast = f".({node.ak_type.go_code()})"
-        return f"{func_name}({args}){return_cast}"
+            self.emitter.write(f".({self.go_type(node.ak_type)})")
 
     def visit_ReturnStmt(self, node):
-        return f"return {self.visit(node.expr)}"
+        self.emitter.write("return ")
+        self.visit(node.expr)
 
     def visit_ReturnNil(self, node):
-        return "return nil"
+        if self.typed_signatures:
+            self.emitter.write("return")
+        else:
+            self.emitter.write("return nil")
 
     def visit_PrintStmt(self, node):
         self.imports.add('"github.com/aktoro-lang/fmt"')
-        exprs = ",".join([self.visit(expr) for expr in node.args])
-        return f"fmt.Println({exprs})"
+        self.emitter.write("fmt.Println(")
+        self.visit_separated(node.args)
+        self.emitter.write(")")
 
     def visit_PrintFunc(self, node):
         self.imports.add('"fmt"')
-        return "func (x interface{}) interface{} { fmt.Println(x); return nil}"
+        self.emitter.write("func (x interface{}) interface{} { fmt.Println(x); return nil}")
 
     def visit_ListIndexExpr(self, node):
-        return f"list.At({self.visit(node.var)},{self.visit(node.index_expr)}).({node.ak_type.go_code()})"
+        self.emitter.write("list.At(")
+        self.visit(node.var)
+        self.emitter.write(", ")
+        self.visit(node.index_expr)
+        self.emitter.write(f").({self.go_type(node.ak_type)})")
 
     def visit_ListRangeIndexExpr(self, node):
-        low = self.visit(node.index_expr.low) if node.index_expr.low else "0"
         if node.index_expr.high:
-            high = self.visit(node.index_expr.high)
-            return f"list.GetRange({self.visit(node.var)}, {low}, {high})"
+            self.emitter.write("list.GetRange(")
+            self.visit(node.var)
+            self.emitter.write(", ")
+            self.visit_or_default(node.index_expr.low, "0")
+            self.emitter.write(", ")
+            self.visit(node.index_expr.high)
         else:
-            return f"list.Drop({self.visit(node.var)}, {low})"
+            self.emitter.write("list.Drop(")
+            self.visit(node.var)
+            self.emitter.write(", ")
+            self.visit_or_default(node.index_expr.low, "0")
+        self.emitter.write(")")
 
     def visit_StringIndexExpr(self, node):
-        index_expr = self.visit(node.index_expr)
-        return f"{self.visit(node.var)}[{index_expr}:{index_expr}+ types.AkInt(1)]"
+        self.visit(node.var)
+        self.emitter.write("[")
+        self.visit(node.index_expr)
+        self.emitter.write(":")
+        self.visit(node.index_expr)
+        self.emitter.write(" + types.AkInt(1)]")
 
     def visit_StringRangeIndexExpr(self, node):
-        low = self.visit(node.index_expr.low) if node.index_expr.low else "0"
+        self.visit(node.var)
+        self.emitter.write("[")
+        self.visit_or_default(node.index_expr.low, "0")
+        self.emitter.write(":")
         if node.index_expr.high:
-            high = self.visit(node.index_expr.high)
-            return f"{self.visit(node.var)}[{low}:{high}])"
-        else:
-            return f"{self.visit(node.var)}[{low}:]"
+            self.visit(node.index_expr.high)
+        self.emitter.write("]")
 
     def visit_ListConsExpr(self, node):
-        cons_args_go_code = ",".join([self.visit(arg) for arg in node.cons_args])
-        return f"list.Cons({self.visit(node.var)}, {cons_args_go_code})"
+        self.emitter.write("list.Cons(")
+        self.visit(node.var)
+        self.emitter.write(", ")
+        self.visit_separated(node.cons_args)
+        self.emitter.write(")")
 
     def visit_DictIndexExpr(self, node):
-        return f"dict.Get({self.visit(node.var)}, {self.visit(node.index_expr)})"
+        """
+        A lookup asserted to the value type, so it can be used like any other
+        value of that type, e.g. in arithmetic.  dict.Get returns nil for a
+        missing key, so the assertion panics, like indexing a list out of
+        range does.  Values of a type parameter stay interface{} and a
+        missing key yields nil.
+        """
+        self.emitter.write(f"dict.Get{self.dict_key_kind(node.var.ak_type) or ''}(")
+        self.visit(node.var)
+        self.emitter.write(", ")
+        self.visit(node.index_expr)
+        self.emitter.write(")")
+        go_type = self.go_type(node.ak_type)
+        if go_type != "interface{}":
+            self.emitter.write(f".({go_type})")
 
     def visit_IfExpr(self, node):
-        test_expr = self.visit(node.test_expr)
-        if_body = "\n".join([self.visit(line) for line in node.if_body])
+        emitter = self.emitter
+        emitter.write("if ")
+        # conditions take native bools, so they need no conversion
+        self.visit_operand(node.test_expr)
+        emitter.line(" {")
+        with emitter.indented():
+            self.visit_lines(node.if_body)
         if node.else_body:
-            else_body = "\n".join([self.visit(line) for line in node.else_body])
-            else_stmt = f"""else {{
-            {else_body} 
-            }}"""
-        else:
-            else_stmt = ""
-        return f"""if {test_expr} {{
-            {if_body}
-        }} {else_stmt}
-        """
+            emitter.line("} else {")
+            with emitter.indented():
+                self.visit_lines(node.else_body)
+        emitter.write("}")
 
     def visit_MatchExpr(self, node):
+        emitter = self.emitter
+        emitter.write("switch ")
         if node.test_expr:
-            test_expr = self.visit(node.test_expr)
-        else:
-            test_expr = ""
-        case_stmts = ""
+            self.visit(node.test_expr)
+            emitter.write(" ")
+        emitter.line("{")
         for pattern in node.patterns:
-            case_body = "\n".join([self.visit(line) for line in pattern.body])
             if isinstance(pattern, Pattern):
+                emitter.write("case ")
                 if node.test_expr:
-                    case_stmt = f"\ncase {self.visit(pattern.test_expr)}:\n"
+                    self.visit(pattern.test_expr)
                 else:
-                    case_stmt = f"\ncase bool({self.visit(pattern.test_expr)}):\n"
+                    emitter.write("bool(")
+                    self.visit_operand(pattern.test_expr)
+                    emitter.write(")")
+                emitter.line(":")
+            else:
+                emitter.line("default:")
+            with emitter.indented():
+                self.visit_lines(pattern.body)
+        emitter.write("}")
+
+    def visit_Block(self, node):
+        emitter = self.emitter
+        emitter.line("{")
+        with emitter.indented():
+            self.visit_lines(node.statements)
+        emitter.write("}")
+
+    def visit_BlankAssign(self, node):
+        for i, name in enumerate(node.names):
+            if i:
+                self.emitter.newline()
+            self.emitter.write(f"_ = {snake_to_camel(name)}")
+
+    def visit_LetExpr(self, node):
+        """
+        An inlined call with arguments bound before its body, generated as a
+        function literal called in place so the bindings stay local.
+        """
+        emitter = self.emitter
+        outer_native_operands = self.native_operands
+        self.native_operands = False
+        emitter.line("func() interface{} {")
+        with emitter.indented():
+            for binding in node.bindings:
+                self.visit(binding)
+                emitter.newline()
+            emitter.write("return ")
+            self.visit(node.expr)
+            emitter.newline()
+        emitter.write(f"}}().({self.go_type(node.ak_type)})")
+        self.native_operands = outer_native_operands
+
+    def visit_ListPipeline(self, node):
+        """
+        A fused chain of list builtins, generated as a function literal that
+        walks the source list once and builds at most the final list.  The
+        elements stay boxed, as they would be for the builtins.
+        """
+        self.imports.add('"github.com/aktoro-lang/container/list"')
+        self.imports.add('"github.com/aktoro-lang/types"')
+        emitter = self.emitter
+        stages = node.stages
+        terminal = stages[-1].op if stages[-1].op not in PIPELINE_STAGE_OPS else None
+        emitter.line("func() interface{} {")
+        with emitter.indented():
+            # the source and stage arguments are evaluated once, in the
+            # order the unfused calls would evaluate them
+            emitter.write("list__ := ")
+            self.visit(node.source)
+            emitter.newline()
+            for i, stage in enumerate(stages):
+                for j, arg in enumerate(stage.args):
+                    emitter.write(f"arg{i}_{j}__ := ")
+                    self.visit(arg)
+                    emitter.newline()
+                if stage.op == "take":
+                    emitter.line(f"var taken{i}__ types.AkInt")
+                elif stage.op == "drop":
+                    emitter.line(f"var dropped{i}__ types.AkInt")
+                elif stage.op == "drop_while":
+                    emitter.line(f"dropping{i}__ := true")
+            if terminal is None:
+                emitter.line("out__ := []interface{}{}")
+            elif terminal == "reduce":
+                emitter.line(f"var acc__ interface{{}} = arg{len(stages) - 1}_0__")
+
+            emitter.line("for ; !bool(list.Empty(list__).(types.AkBool)); list__ = list.Rest(list__).(*list.List) {")
+            with emitter.indented():
+                emitter.line("elem__ := list.First(list__)")
+                for i, stage in enumerate(stages):
+                    self.pipeline_stage(i, stage)
+                if terminal is None:
+                    emitter.line("out__ = append(out__, elem__)")
+            emitter.line("}")
+
+            if terminal is None:
+                emitter.line("return list.New(out__...)")
+            elif terminal == "reduce":
+                emitter.line("return acc__")
+            elif terminal == "any":
+                emitter.line("return types.AkBool(false)")
+            elif terminal == "all":
+                emitter.line("return types.AkBool(true)")
             else:
-                case_stmt = "\ndefault:\n"
-            case_stmts += case_stmt + case_body
+                emitter.line("return nil")
+        emitter.write("}()")
+        if not isinstance(node.ak_type, types.EmptyTuple):
+            emitter.write(f".({self.go_type(node.ak_type)})")
+
+    def pipeline_stage(self, i, stage):
+        emitter = self.emitter
+        func = f"arg{i}_0__"
+        test = f"bool({func}(elem__).(types.AkBool))"
+        if stage.op == "map":
+            emitter.line(f"elem__ = {func}(elem__)")
+        elif stage.op == "filter":
+            self.pipeline_if(f"!{test}", "continue")
+        elif stage.op == "take":
+            self.pipeline_if(f"taken{i}__ >= {func}", "break")
+            emitter.line(f"taken{i}__++")
+        elif stage.op == "take_while":
+            self.pipeline_if(f"!{test}", "break")
+        elif stage.op == "drop":
+            self.pipeline_if(f"dropped{i}__ < {func}", f"dropped{i}__++", "continue")
+        elif stage.op == "drop_while":
+            emitter.line(f"if dropping{i}__ {{")
+            with emitter.indented():
+                self.pipeline_if(test, "continue")
+                emitter.line(f"dropping{i}__ = false")
+            emitter.line("}")
+        elif stage.op == "reduce":
+            emitter.line(f"acc__ = arg{i}_1__(acc__, elem__)")
+        elif stage.op == "any":
+            self.pipeline_if(test, "return types.AkBool(true)")
+        elif stage.op == "all":
+            self.pipeline_if(f"!{test}", "return types.AkBool(false)")
+        elif stage.op == "find":
+            self.pipeline_if(test, "return elem__")
+        elif stage.op == "each":
+            emitter.line(f"{func}(elem__)")
 
-        return f"switch {test_expr} {{{case_stmts}}}"
+    def pipeline_if(self, condition, *body):
+        emitter = self.emitter
+        emitter.line(f"if {condition} {{")
+        with emitter.indented():
+            for line in body:
+                emitter.line(line)
+        emitter.line("}")
 
     def visit_StringConcat(self, node):
-        return f"{self.visit(node.left)} + {self.visit(node.right)}"
+        self.visit(node.left)
+        self.emitter.write(" + ")
+        self.visit(node.right)
 
     def visit_RecordDestructDecl(self, node):
-        var_inits = "\n".join([self.visit_VarDeclNoInit(var_decl) for var_decl in node.var_decls.values()])
-        root_var_decl = self.visit(node.root_var)
+        emitter = self.emitter
+        for var_decl in node.var_decls.values():
+            self.visit_VarDeclNoInit(var_decl)
+            emitter.newline()
         root_name = node.root_var.name
-        var_assigns = "\n".join(f"{var} = {root_name}.{var}" for var in node.var_decls.keys())
-        res = f"""{var_inits}
-        {{
-        {root_var_decl}
-        {var_assigns}
-        }}
-        """
-        return res
+        emitter.line("{")
+        with emitter.indented():
+            self.visit(node.root_var)
+            emitter.newline()
+            for var in node.var_decls.keys():
+                emitter.line(f"{var} = {root_name}.{var}")
+        emitter.write("}")
 
     def visit_ListDestructDecl(self, node):
         self.imports.add('"github.com/aktoro-lang/container/list"')
-        var_inits = [self.visit_VarDeclNoInit(var_decl) for var_decl in node.var_decls]
+        emitter = self.emitter
+        var_decls = list(node.var_decls)
         if node.rest_decl:
-            var_inits.append(self.visit_VarDeclNoInit(node.rest_decl))
-        var_inits = "\n".join(var_inits)
-        root_var_decl = self.visit(node.root_var)
+            var_decls.append(node.rest_decl)
+        for var_decl in var_decls:
+            self.visit_VarDeclNoInit(var_decl)
+            emitter.newline()
         root_name = node.root_var.name
-        var_assigns = [f"{var.name} = list.At({root_name}, types.AkInt({i})).({var.ak_type.go_code()})" for i, var in
-                       enumerate(node.var_decls)]
-        if node.rest_decl:
-            var_assigns.append(
-                f"{node.rest_decl.name} = list.Drop({root_name}, types.AkInt({len(node.var_decls)})).({node.rest_decl.ak_type.go_code()})")
-        var_assigns = "\n".join(var_assigns)
-        res = f"""{var_inits}
-        {{
-        {root_var_decl}
-        {var_assigns}
-        }}
-        """
-        return res
+        emitter.line("{")
+        with emitter.indented():
+            self.visit(node.root_var)
+            emitter.newline()
+            for i, var in enumerate(node.var_decls):
+                emitter.line(f"{var.name} = list.At({root_name}, types.AkInt({i})).({self.go_type(var.ak_type)})")
+            if node.rest_decl:
+                rest_type = self.go_type(node.rest_decl.ak_type)
+                emitter.line(f"{node.rest_decl.name} = list.Drop({root_name}, "
+                             f"types.AkInt({len(node.var_decls)})).({rest_type})")
+        emitter.write("}")
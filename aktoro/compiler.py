@@ -1,25 +1,301 @@
 from pathlib import Path
 from lark import Lark
+import lark
 from aktoro.code_gen import CodeGenVisitor
 from aktoro.type_checker import TypeCheckVisitor
-from aktoro.parser import Parser, PipelineRewriter, VariantPatternRewriter
+from aktoro.parser import Parser
+from aktoro.optimizer import INLINE_BUDGET, node_count, optimize
+from collections import namedtuple
+import filecmp
+import hashlib
 import os
+import pickle
+import shutil
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
 
 current_dir = os.path.dirname(__file__)
 
 AK_GRAMMAR_FILENAME: str = Path(current_dir) / "aktoro.g"
 
-with open(AK_GRAMMAR_FILENAME) as f:
-    AK_GRAMMAR = Lark(f, parser="lalr", start="program")
+GrammarTiming = namedtuple("GrammarTiming", ["load_time", "build_time", "cached"])
+
+# phases of compile_ak, in the order they run
+PHASES = ("parse", "transform", "typecheck", "optimize", "codegen")
+
+PhaseRecord = namedtuple("PhaseRecord", ["phase", "start", "end", "nodes", "peak_memory"])
+
+_grammar = None
+_compiler_hash = None
+grammar_timing = None
+
+
+def cache_dir():
+    """
+    Directory holding the compiled grammar tables and generated Go code.
+    Defaults to the user cache dir and can be overridden with AKTORO_CACHE_DIR.
+    """
+    cache_dir = os.environ.get("AKTORO_CACHE_DIR")
+    if cache_dir:
+        return Path(cache_dir)
+    xdg_cache = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(xdg_cache) / "aktoro"
+
+
+def pgo_profile_filename(go_filename):
+    """
+    CPU profile of the program generated into go_filename, recorded by
+    aktoro.py run --cpuprofile and used by build --pgo.  Profiles live in the
+    cache dir, keyed by the absolute path of the generated file.
+    """
+    h = hashlib.sha256(os.path.abspath(go_filename).encode("utf-8"))
+    return cache_dir() / "pgo" / f"{h.hexdigest()[:32]}.pprof"
+
+
+def grammar_hash():
+    """
+    Hash of the grammar source and the Lark version, used to invalidate the
+    grammar cache whenever either one changes.
+    """
+    with open(AK_GRAMMAR_FILENAME, "rb") as f:
+        grammar_source = f.read()
+    h = hashlib.sha256(grammar_source)
+    h.update(lark.__version__.encode("utf-8"))
+    return h.hexdigest()
+
+
+def compiler_hash():
+    """
+    Hash of the compiler sources, grammar and Lark version.  Any change to the
+    compiler invalidates previously generated Go code.
+    """
+    global _compiler_hash
+    if _compiler_hash is None:
+        h = hashlib.sha256()
+        for filename in sorted(Path(current_dir).glob("*.py")):
+            h.update(filename.name.encode("utf-8"))
+            h.update(filename.read_bytes())
+        h.update(grammar_hash().encode("utf-8"))
+        _compiler_hash = h.hexdigest()
+    return _compiler_hash
+
+
+def _build_grammar():
+    with open(AK_GRAMMAR_FILENAME) as f:
+        return Lark(f, parser="lalr", start="program")
+
+
+def _read_cached_grammar(cache_filename):
+    with open(cache_filename, "rb") as f:
+        build_time = pickle.load(f)
+        grammar = Lark.load(f)
+    return grammar, build_time
+
+
+def _write_cached_grammar(cache_filename, grammar, build_time):
+    cache_filename.parent.mkdir(parents=True, exist_ok=True)
+    temp_filename = cache_filename.with_suffix(f".{os.getpid()}.tmp")
+    with open(temp_filename, "wb") as f:
+        pickle.dump(build_time, f)
+        grammar.save(f)
+    os.replace(temp_filename, cache_filename)
+
+
+def load_grammar():
+    """
+    Return the Aktoro LALR parser, building it on first use.  The parse tables
+    are cached on disk keyed by grammar_hash(), so only the first process
+    after a grammar or Lark change pays for table construction.
+    """
+    global _grammar, grammar_timing
+    if _grammar is not None:
+        return _grammar
+
+    start = time.perf_counter()
+    cache_filename = cache_dir() / f"grammar-{grammar_hash()}.pickle"
+    try:
+        _grammar, build_time = _read_cached_grammar(cache_filename)
+        grammar_timing = GrammarTiming(time.perf_counter() - start, build_time, True)
+        return _grammar
+    except (OSError, EOFError, AttributeError, pickle.UnpicklingError):
+        pass
+
+    _grammar = _build_grammar()
+    build_time = time.perf_counter() - start
+    grammar_timing = GrammarTiming(build_time, build_time, False)
+    try:
+        _write_cached_grammar(cache_filename, _grammar, build_time)
+    except (OSError, AttributeError, pickle.PicklingError):
+        pass
+    return _grammar
+
+
+class CompileObserver:
+    """
+    Instrumentation hooks of compile_ak.  phase_start is called before each
+    phase and phase_end after it, with the time.perf_counter() timestamps of
+    the phase, the number of nodes in the tree the phase produced, or for
+    codegen the tree it generated code from, and the peak memory in bytes.
+    """
+    # when set, the peak memory is the most Python allocated during the phase,
+    # traced with tracemalloc, which slows the phase down.  Otherwise it is
+    # the peak resident set size of the process so far, or None where it is
+    # not available.
+    trace_memory = False
+
+    def phase_start(self, phase):
+        pass
+
+    def phase_end(self, phase, start, end, nodes, peak_memory):
+        pass
+
+
+class PhaseTimings(CompileObserver):
+    """
+    Records the phases of every compile it observes.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.records = []
+
+    def phase_end(self, phase, start, end, nodes, peak_memory):
+        self.records.append(PhaseRecord(phase, start, end, nodes, peak_memory))
+
+    def totals(self):
+        """
+        Per phase, the number of times it ran, its total time and node count
+        and its highest peak memory.
+        """
+        totals = {}
+        for record in self.records:
+            calls, elapsed, nodes, peak_memory = totals.get(record.phase, (0, 0.0, 0, None))
+            if record.peak_memory is not None:
+                peak_memory = max(peak_memory or 0, record.peak_memory)
+            totals[record.phase] = (calls + 1, elapsed + record.end - record.start, nodes + record.nodes, peak_memory)
+        return totals
+
+    def report(self, out=sys.stderr):
+        totals = self.totals()
+        if not totals:
+            return
+        print(f"{'phase':<10}{'calls':>6}{'time':>11}{'nodes':>9}{'peak mem':>11}", file=out)
+        for phase in sorted(totals, key=lambda p: PHASES.index(p) if p in PHASES else len(PHASES)):
+            calls, elapsed, nodes, peak_memory = totals[phase]
+            peak = "-" if peak_memory is None else format_bytes(peak_memory)
+            print(f"{phase:<10}{calls:>6}{elapsed * 1000:>9.1f}ms{nodes:>9}{peak:>11}", file=out)
+
+
+def format_bytes(size):
+    if size < 2 ** 20:
+        return f"{size / 2 ** 10:.1f}KiB"
+    return f"{size / 2 ** 20:.1f}MiB"
+
+
+def count_nodes(tree):
+    if isinstance(tree, lark.Tree):
+        return sum(1 for _ in tree.iter_subtrees())
+    return node_count(tree)
+
+
+def peak_rss():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes everywhere but macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def run_phase(observer, phase, func, *args, counted=None):
+    """
+    Run func(*args) as the phase of a compile reported to observer, which may
+    be None.  The nodes counted are those of the result, or of counted.
+    """
+    if observer is None:
+        return func(*args)
+    trace_memory = observer.trace_memory and not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start()
+    observer.phase_start(phase)
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+        end = time.perf_counter()
+        peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else peak_rss()
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    observer.phase_end(phase, start, end, count_nodes(result if counted is None else counted), peak_memory)
+    return result
+
+
+def compile_ak(ak_source, out=None, typed_signatures=False, main_func="main", opt_level=1,
+               inline_budget=INLINE_BUDGET, package_name="main", observer=None, cpu_profile=None):
+    """
+    Compile Aktoro source to Go.  The Go code is streamed to the file like
+    object out when given, otherwise it is returned as a string.  observer,
+    a CompileObserver, is told about every phase of the compile.  When
+    cpu_profile is given the program writes a pprof CPU profile to it.
+    """
+    parse_tree = run_phase(observer, "parse", load_grammar().parse, ak_source)
+    ast = run_phase(observer, "transform", Parser().transform, parse_tree)
+    checked_ast = run_phase(observer, "typecheck", TypeCheckVisitor().visit, ast)
+    optimized_ast = run_phase(observer, "optimize", optimize, checked_ast, opt_level, inline_budget)
+    code_gen = CodeGenVisitor(out, typed_signatures=typed_signatures, main_func=main_func,
+                              package_name=package_name, cpu_profile=cpu_profile)
+    run_phase(observer, "codegen", code_gen.visit, optimized_ast, counted=optimized_ast)
+    if out is None:
+        return code_gen.emitter.getvalue()
+
+
+def compile_ak_cached(ak_source, go_filename, **options):
+    """
+    Compile ak_source into go_filename through a content addressed cache of
+    generated Go code keyed by the source, the compile options and
+    compiler_hash().  go_filename is only rewritten when its contents change.
+    Returns whether the code came from the cache.  With an observer the
+    cache is bypassed, so the observer sees every phase, and refreshed.
+    """
+    # the observer does not change the generated code
+    key_options = {name: value for name, value in options.items() if name != "observer"}
+    h = hashlib.sha256(ak_source.encode("utf-8"))
+    h.update(repr(sorted(key_options.items())).encode("utf-8"))
+    h.update(compiler_hash().encode("utf-8"))
+    cache_filename = cache_dir() / "go" / f"{h.hexdigest()}.go"
+    cached = options.get("observer") is None and cache_filename.exists()
+    if not cached:
+        try:
+            cache_filename.parent.mkdir(parents=True, exist_ok=True)
+            temp_filename = cache_filename.with_suffix(f".{os.getpid()}.tmp")
+            try:
+                with open(temp_filename, "w") as f:
+                    compile_ak(ak_source, out=f, **options)
+                os.replace(temp_filename, cache_filename)
+            finally:
+                if temp_filename.exists():
+                    temp_filename.unlink()
+        except OSError:
+            # the cache is not writable, compile straight to the output
+            with open(go_filename, "w") as f:
+                compile_ak(ak_source, out=f, **options)
+            return False
+
+    if not (os.path.exists(go_filename) and filecmp.cmp(cache_filename, go_filename, shallow=False)):
+        shutil.copyfile(cache_filename, go_filename)
+    return cached
 
 
-def compile_ak(ak_source):
-    parse_tree = AK_GRAMMAR.parse(ak_source)
-    parse_tree = PipelineRewriter().visit(parse_tree)
-    parse_tree = VariantPatternRewriter().visit(parse_tree)
-    ast = Parser().transform(parse_tree)
-    check = TypeCheckVisitor()
-    checked_ast = check.visit(ast)
-    code_gen = CodeGenVisitor()
-    go_code = code_gen.visit(checked_ast)
-    return go_code
+def compile_ak_file(ak_filename, go_filename, **options):
+    """
+    Compile the Aktoro file ak_filename into go_filename through the cache.
+    Runs in build worker processes, so it only takes picklable arguments.
+    """
+    with open(ak_filename) as ak:
+        ak_source = ak.read()
+    return compile_ak_cached(ak_source, go_filename, **options)
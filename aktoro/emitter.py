@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+
+
+class Emitter(object):
+    """
+    Writes generated code to a sink in a single pass.  The sink is either a
+    list collecting chunks or a file like object with a write method.
+
+    Indentation is tracked as a depth and written at the start of each line,
+    so nested constructs never re-indent code that was already generated.
+    Chunks passed to write() must not contain newlines, use newline() or
+    line() instead.
+    """
+
+    def __init__(self, sink=None, indent="\t"):
+        self.indent = indent
+        self.depth = 0
+        self.at_line_start = True
+        self._set_sink([] if sink is None else sink)
+
+    def _set_sink(self, sink):
+        self.sink = sink
+        self._write = sink.append if isinstance(sink, list) else sink.write
+
+    def write(self, *chunks):
+        if self.at_line_start:
+            if self.depth:
+                self._write(self.indent * self.depth)
+            self.at_line_start = False
+        for chunk in chunks:
+            self._write(chunk)
+
+    def newline(self):
+        self._write("\n")
+        self.at_line_start = True
+
+    def line(self, *chunks):
+        if chunks:
+            self.write(*chunks)
+        self.newline()
+
+    def write_chunks(self, chunks):
+        """
+        Copy already generated chunks, e.g. a section buffered with
+        redirect(), to the sink as they are.
+        """
+        for chunk in chunks:
+            self._write(chunk)
+        if chunks:
+            self.at_line_start = chunks[-1].endswith("\n")
+
+    @contextmanager
+    def indented(self):
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+
+    @contextmanager
+    def redirect(self, sink):
+        """
+        Temporarily write to another sink, starting a fresh line at depth 0.
+        """
+        saved = self.sink, self.depth, self.at_line_start
+        self._set_sink(sink)
+        self.depth = 0
+        self.at_line_start = True
+        try:
+            yield sink
+        finally:
+            sink, self.depth, self.at_line_start = saved
+            self._set_sink(sink)
+
+    def getvalue(self):
+        return "".join(self.sink)
@@ -0,0 +1,585 @@
+from collections import namedtuple
+from dataclasses import fields, is_dataclass
+from fractions import Fraction
+import math
+import operator
+import re
+from aktoro.ast import *
+from aktoro.builtins import PIPELINE_STAGE_OPS, PIPELINE_TERMINAL_OPS
+import aktoro.types as types
+from aktoro.code_gen import type_param_names
+from aktoro.visitor import NodeTransformer
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+# Go reads integer literals with a leading zero as octal, those are left alone
+DECIMAL_INT = re.compile(r"[+-]?(0|[1-9][0-9]*)")
+
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+Constant = namedtuple("Constant", ["type_name", "value"])
+
+# largest function body, in AST nodes, that is inlined at its call sites
+INLINE_BUDGET = 12
+
+# expressions an inlined function body may consist of, anything that
+# declares variables or branches keeps the function call
+INLINE_EXPR_CLASSES = (
+    VarUsage, PackageVarUsage, PrimitiveLiteral, FieldAccess, ParenExpr,
+    AddExpr, MultExpr, EqualityExpr, LogicalExpr, NotExpr, StringConcat,
+    FuncCall, PrintFunc, ListLiteral, ListIndexExpr, ListRangeIndexExpr, RangeIndex, ListConsExpr,
+    DictLiteral, KeyValue, DictIndexExpr, DictUpdate, RecordLiteral, RecordUpdate,
+    StringIndexExpr, StringRangeIndexExpr,
+)
+
+# expressions of an inlined body that have side effects of their own or may
+# skip evaluating an operand, substituting an argument with side effects
+# into such a body could reorder or drop its effects
+EFFECT_ORDER_CLASSES = (FuncCall, PrintFunc, LogicalExpr)
+
+# inlined bodies that are operator expressions are parenthesized
+OPERATOR_EXPR_CLASSES = (AddExpr, MultExpr, EqualityExpr, LogicalExpr, NotExpr, StringConcat)
+
+
+def constant(node):
+    """
+    Value of node if it is an Int, Float, Bool or String literal whose value
+    is known exactly, otherwise None.  Floats are kept as Fractions because
+    Go evaluates constant expressions exactly and only rounds the result.
+    """
+    while isinstance(node, ParenExpr):
+        node = node.expr
+    if not isinstance(node, PrimitiveLiteral):
+        return None
+    value, type_name = node.value, node.ak_type.name
+    if type_name == "Int" and DECIMAL_INT.fullmatch(value):
+        return Constant(type_name, int(value))
+    if type_name == "Float":
+        try:
+            return Constant(type_name, Fraction(value))
+        except ValueError:
+            return None
+    if type_name == "Bool":
+        return Constant(type_name, value == "true")
+    if type_name == "String" and value.startswith('"') and "\\" not in value:
+        return Constant(type_name, value[1:-1])
+    return None
+
+
+def literal(type_name, value):
+    """
+    Literal node for a folded value, or None if the value does not fit the
+    Go type.
+    """
+    if type_name == "Int":
+        if not INT64_MIN <= value <= INT64_MAX:
+            return None
+        text = str(value)
+    elif type_name == "Float":
+        try:
+            value = float(value)
+        except OverflowError:
+            return None
+        if math.isinf(value) or math.isnan(value):
+            return None
+        text = repr(value)
+    elif type_name == "Bool":
+        text = "true" if value else "false"
+    else:
+        text = f'"{value}"'
+    return PrimitiveLiteral(text, types.PrimitiveType(type_name))
+
+
+def go_int_div(a, b):
+    # Go truncates integer division towards zero
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def arithmetic(type_name, op, a, b):
+    """
+    a op b with Go semantics, or None if it cannot be folded.
+    """
+    if op == "+":
+        return a + b
+    if op == "-":
+        return a - b
+    if op == "*":
+        return a * b
+    if b == 0:
+        return None
+    if op == "/":
+        return go_int_div(a, b) if type_name == "Int" else a / b
+    if op == "%" and type_name == "Int":
+        return a - b * go_int_div(a, b)
+    return None
+
+
+def free_names(node):
+    """
+    Names of the variables node uses that are declared outside of it.
+    """
+    declared, used = set(), set()
+    collect_names(node, declared, used)
+    return used - declared
+
+
+def node_count(node):
+    if is_dataclass(node):
+        return 1 + sum(node_count(getattr(node, field.name)) for field in fields(node))
+    if isinstance(node, (list, tuple)):
+        return sum(node_count(value) for value in node)
+    if isinstance(node, dict):
+        return sum(node_count(value) for value in node.values())
+    return 0
+
+
+def inlinable_expr(node):
+    if is_dataclass(node):
+        return isinstance(node, INLINE_EXPR_CLASSES) and all(
+            inlinable_expr(getattr(node, field.name)) for field in fields(node))
+    if isinstance(node, (list, tuple)):
+        return all(inlinable_expr(value) for value in node)
+    if isinstance(node, dict):
+        return all(inlinable_expr(value) for value in node.values())
+    return True
+
+
+def substitute(node, args):
+    """
+    Copy of node with the variables named in args replaced by copies of
+    their argument expressions.  Types are shared, not copied.
+    """
+    if isinstance(node, VarUsage) and node.name in args:
+        return substitute(args[node.name], {})
+    if is_dataclass(node):
+        return node.__class__(*(substitute(getattr(node, field.name), args) for field in fields(node)))
+    if isinstance(node, list):
+        return [substitute(value, args) for value in node]
+    if isinstance(node, tuple):
+        return tuple(substitute(value, args) for value in node)
+    if isinstance(node, dict):
+        return {k: substitute(value, args) for k, value in node.items()}
+    return node
+
+
+def contains(node, classes):
+    if isinstance(node, classes):
+        return True
+    if is_dataclass(node):
+        return any(contains(getattr(node, field.name), classes) for field in fields(node))
+    if isinstance(node, (list, tuple)):
+        return any(contains(value, classes) for value in node)
+    if isinstance(node, dict):
+        return any(contains(value, classes) for value in node.values())
+    return False
+
+
+def usage_counts(node, counts):
+    if isinstance(node, VarUsage):
+        counts[node.name] = counts.get(node.name, 0) + 1
+    elif is_dataclass(node):
+        for field in fields(node):
+            usage_counts(getattr(node, field.name), counts)
+    elif isinstance(node, (list, tuple)):
+        for value in node:
+            usage_counts(value, counts)
+    elif isinstance(node, dict):
+        for value in node.values():
+            usage_counts(value, counts)
+    return counts
+
+
+def collect_names(node, declared, used):
+    if isinstance(node, (VarDecl, VarIfAssign, VarMatchAssign)):
+        declared.add(node.name)
+    elif isinstance(node, VarUsage):
+        used.add(node.name)
+    if is_dataclass(node):
+        for field in fields(node):
+            collect_names(getattr(node, field.name), declared, used)
+    elif isinstance(node, (list, tuple)):
+        for value in node:
+            collect_names(value, declared, used)
+    elif isinstance(node, dict):
+        for value in node.values():
+            collect_names(value, declared, used)
+
+
+class ConstantFolder(NodeTransformer):
+    """
+    Folds arithmetic, comparison, logical and string concat expressions with
+    literal operands, and removes if and match branches that can never run.
+
+    Go rejects local variables that are declared and never used, so when
+    removed code was the only user of a variable the remaining code keeps it
+    alive with a blank assignment.
+    """
+    node_classes = NODE_CLASSES
+
+    def __init__(self):
+        self.func_names = set()
+
+    def visit_Program(self, node):
+        self.func_names = {s.name for s in node.statements if isinstance(s, FuncDef)}
+        return self.generic_visit(node)
+
+    def unused_names(self, removed, kept):
+        """
+        Variables that only the removed code used, these are kept alive with
+        a blank assignment.
+        """
+        return sorted(free_names(removed) - free_names(kept) - self.func_names)
+
+    def block(self, statements, removed):
+        """
+        Replacement for a branching expression, the statements of the branch
+        that is taken in a Go block so their declarations stay local.
+        """
+        names = self.unused_names(removed, statements)
+        if names:
+            statements = [BlankAssign(names)] + list(statements)
+        if not statements:
+            return None
+        return Block(statements)
+
+    def visit_operator_chain(self, node):
+        node = self.generic_visit(node)
+        exprs = node.exprs
+        first = constant(exprs[0])
+        if first is None or first.type_name not in ("Int", "Float"):
+            return node
+        # only a constant prefix can be folded without reassociating
+        value, folded = first.value, 0
+        for i in range(1, len(exprs), 2):
+            operand = constant(exprs[i + 1])
+            if operand is None or operand.type_name != first.type_name:
+                break
+            result = arithmetic(first.type_name, exprs[i], value, operand.value)
+            if result is None:
+                break
+            value, folded = result, i + 1
+        folded_literal = literal(first.type_name, value) if folded else None
+        if folded_literal is None:
+            return node
+        if folded == len(exprs) - 1:
+            return folded_literal
+        node.exprs = [folded_literal] + exprs[folded + 1:]
+        return node
+
+    def visit_AddExpr(self, node):
+        return self.visit_operator_chain(node)
+
+    def visit_MultExpr(self, node):
+        return self.visit_operator_chain(node)
+
+    def visit_LogicalExpr(self, node):
+        node = self.generic_visit(node)
+        ops = set(node.exprs[1::2])
+        if len(ops) != 1:
+            return node
+        op = ops.pop()
+        values = [constant(e) for e in node.exprs[::2]]
+        if all(values):
+            result = values[0].value
+            for v in values[1:]:
+                result = (result and v.value) if op == "and" else (result or v.value)
+            return literal("Bool", result)
+        # true does not change an and chain, nor false an or chain
+        identity = op == "and"
+        operands = [e for e, v in zip(node.exprs[::2], values) if v is None or v.value != identity]
+        if len(operands) == 1:
+            return operands[0]
+        node.exprs = [operands[0]]
+        for operand in operands[1:]:
+            node.exprs += [op, operand]
+        return node
+
+    def visit_NotExpr(self, node):
+        node = self.generic_visit(node)
+        value = constant(node.expr)
+        if value and value.type_name == "Bool":
+            return literal("Bool", not value.value)
+        return node
+
+    def visit_ParenExpr(self, node):
+        node = self.generic_visit(node)
+        if isinstance(node.expr, PrimitiveLiteral):
+            return node.expr
+        return node
+
+    def visit_EqualityExpr(self, node):
+        node = self.generic_visit(node)
+        left, right = constant(node.left), constant(node.right)
+        if not left or not right or left.type_name != right.type_name:
+            return node
+        if left.type_name == "Bool" and node.op not in ("==", "!="):
+            return node
+        return literal("Bool", COMPARISONS[node.op](left.value, right.value))
+
+    def visit_StringConcat(self, node):
+        node = self.generic_visit(node)
+        left, right = node.left, node.right
+        if (isinstance(left, PrimitiveLiteral) and isinstance(right, PrimitiveLiteral)
+                and left.value.startswith('"') and right.value.startswith('"')):
+            # joining the quoted literals keeps their escapes intact
+            return PrimitiveLiteral(left.value[:-1] + right.value[1:], types.PrimitiveType("String"))
+        return node
+
+    def visit_IfExpr(self, node):
+        node = self.generic_visit(node)
+        test = constant(node.test_expr)
+        if not test or test.type_name != "Bool":
+            return node
+        if test.value:
+            return self.block(node.if_body, node.else_body)
+        return self.block(node.else_body or [], node.if_body)
+
+    def visit_MatchExpr(self, node):
+        node = self.generic_visit(node)
+        if node.test_expr is None:
+            return self.fold_guard_match(node)
+        if isinstance(node.test_expr, VariantTestExpr):
+            # every case of a type switch uses the switch variable
+            return node
+        return self.fold_value_match(node)
+
+    def fold_guard_match(self, node):
+        patterns = []
+        removed = []
+        for i, pattern in enumerate(node.patterns):
+            if isinstance(pattern, DefaultPattern):
+                patterns.append(pattern)
+                removed += node.patterns[i + 1:]
+                break
+            guard = constant(pattern.test_expr)
+            if guard and not guard.value:
+                removed.append(pattern)
+                continue
+            if guard:
+                patterns.append(DefaultPattern(pattern.body, pattern.ak_type))
+                removed += node.patterns[i + 1:]
+                break
+            patterns.append(pattern)
+        return self.match_or_block(node, patterns, removed, True)
+
+    def fold_value_match(self, node):
+        test = constant(node.test_expr)
+        patterns = []
+        removed = []
+        seen = set()
+        decided = test is not None
+        for i, pattern in enumerate(node.patterns):
+            if isinstance(pattern, DefaultPattern):
+                patterns.append(pattern)
+                removed += node.patterns[i + 1:]
+                break
+            value = constant(pattern.test_expr)
+            if value is None:
+                decided = False
+            elif value in seen or (decided and value != test):
+                # duplicate cases never match and Go rejects them
+                removed.append(pattern)
+                continue
+            else:
+                seen.add(value)
+            if decided and value == test:
+                patterns.append(DefaultPattern(pattern.body, pattern.ak_type))
+                removed += node.patterns[i + 1:]
+                break
+            patterns.append(pattern)
+        # the test is only dropped with the switch when it is a constant
+        return self.match_or_block(node, patterns, removed, test is not None)
+
+    def match_or_block(self, node, patterns, removed, test_removable):
+        if test_removable and (not patterns or isinstance(patterns[0], DefaultPattern)):
+            body = patterns[0].body if patterns else []
+            return self.block(body, [node.test_expr] + removed)
+        node.patterns = patterns
+        if removed:
+            names = self.unused_names(removed, patterns)
+            if names:
+                patterns[0].body = [BlankAssign(names)] + patterns[0].body
+        return node
+
+
+class Inliner(NodeTransformer):
+    """
+    Replaces calls to small functions by their body.  A function is inlined
+    when it is not generic, its body is a single returned expression that
+    neither declares variables nor branches, and the expression is at most
+    budget nodes.  Calls in inlined bodies are inlined in turn, except for
+    calls back into a function that is being expanded, so recursive
+    functions are kept as calls.
+
+    Variables and literals are substituted for their parameters.  Any other
+    argument may have side effects, so it is only substituted when it is the
+    only such argument, is used exactly once and the body has no calls or
+    short circuiting operators of its own.  Otherwise the arguments are
+    bound to temporaries before the body, in argument order, keeping the
+    order of their effects.  An argument that is dropped must be a literal.
+    """
+    node_classes = NODE_CLASSES
+
+    def __init__(self, budget=INLINE_BUDGET):
+        self.budget = budget
+        self.func_defs = {}
+        self.bodies = {}
+        self.expanding = set()
+        # variables declared in the function being visited, these shadow
+        # top level functions
+        self.scope_names = set()
+        # numbers the temporaries arguments are bound to, so nested
+        # expansions never shadow each other's
+        self.temps = 0
+
+    def visit_Program(self, node):
+        self.func_defs = {s.name: s for s in node.statements if isinstance(s, FuncDef)}
+        self.scope_names = set()
+        collect_names([s for s in node.statements if not isinstance(s, FuncDef)], self.scope_names, set())
+        return self.generic_visit(node)
+
+    def visit_FuncDef(self, node):
+        outer_scope_names = self.scope_names
+        self.scope_names = self.func_scope_names(node)
+        node = self.generic_visit(node)
+        self.scope_names = outer_scope_names
+        return node
+
+    @staticmethod
+    def func_scope_names(func_def):
+        names = set()
+        for param in func_def.params:
+            if isinstance(param, RecordDestructParam):
+                names.update(p.name for p in param.params)
+            else:
+                names.add(param.name)
+        collect_names(func_def.body, names, set())
+        return names
+
+    def inlined_body(self, func_def):
+        """
+        The returned expression of func_def with its own calls inlined, or
+        None if func_def is not inlined.
+        """
+        if func_def.name in self.bodies:
+            return self.bodies[func_def.name]
+        if func_def.name in self.expanding:
+            return None
+        body = func_def.body
+        if (len(body) != 1 or not isinstance(body[0], ReturnStmt)
+                or type_param_names(func_def.ak_type)
+                or not all(isinstance(param, ParamDecl) for param in func_def.params)
+                or not inlinable_expr(body[0].expr)
+                or node_count(body[0].expr) > self.budget):
+            self.bodies[func_def.name] = None
+            return None
+
+        self.expanding.add(func_def.name)
+        outer_scope_names = self.scope_names
+        self.scope_names = self.func_scope_names(func_def)
+        expr = self.visit(substitute(body[0].expr, {}))
+        self.scope_names = outer_scope_names
+        self.expanding.remove(func_def.name)
+        self.bodies[func_def.name] = expr
+        return expr
+
+    def visit_FuncCall(self, node):
+        node = self.generic_visit(node)
+        func_name = node.func_name
+        if not isinstance(func_name, VarUsage) or func_name.name in self.scope_names:
+            return node
+        func_def = self.func_defs.get(func_name.name)
+        if func_def is None or len(func_def.params) != len(node.args):
+            return node
+        expr = self.inlined_body(func_def)
+        if expr is None:
+            return node
+
+        param_names = [param.name for param in func_def.params]
+        counts = usage_counts(expr, {})
+        if (set(counts) - set(param_names)) & self.scope_names:
+            # the body refers to a top level function the caller shadows
+            return node
+        effectful = []
+        for name, arg in zip(param_names, node.args):
+            if isinstance(arg, PrimitiveLiteral):
+                continue
+            if counts.get(name, 0) == 0:
+                return node
+            if not isinstance(arg, VarUsage):
+                effectful.append(name)
+
+        args = dict(zip(param_names, node.args))
+        bindings = []
+        if len(effectful) > 1 or (effectful and (counts[effectful[0]] > 1 or contains(expr, EFFECT_ORDER_CLASSES))):
+            if isinstance(node.ak_type, types.EmptyTuple):
+                return node
+            for name in effectful:
+                temp = f"_inline{self.temps}_{name}"
+                self.temps += 1
+                bindings.append(VarDecl(temp, args[name], args[name].ak_type))
+                args[name] = VarUsage(temp, args[name].ak_type)
+
+        expr = substitute(expr, args)
+        if bindings:
+            return LetExpr(bindings, expr, node.ak_type)
+        if isinstance(expr, OPERATOR_EXPR_CLASSES):
+            expr = ParenExpr(expr, node.ak_type)
+        return expr
+
+
+class ListFusion(NodeTransformer):
+    """
+    Turns chains of list builtin calls, e.g. the nested calls a pipeline
+    like xs |> list.map(f) |> list.filter(p) |> list.reduce(0, g) becomes,
+    into a single ListPipeline that code generation emits as one loop
+    without intermediate lists.
+    """
+    node_classes = NODE_CLASSES
+
+    @staticmethod
+    def stage(node):
+        if (isinstance(node, FuncCall) and isinstance(node.func_name, PackageVarUsage)
+                and node.func_name.package_name == "list"
+                and node.func_name.func_name in PIPELINE_STAGE_OPS + PIPELINE_TERMINAL_OPS
+                and node.args):
+            return PipelineStage(node.func_name.func_name, node.args[1:])
+        return None
+
+    def visit_FuncCall(self, node):
+        node = self.generic_visit(node)
+        stage = self.stage(node)
+        if stage is None:
+            return node
+        source = node.args[0]
+        if isinstance(source, ListPipeline) and source.stages[-1].op in PIPELINE_STAGE_OPS:
+            source.stages.append(stage)
+            source.ak_type = node.ak_type
+            return source
+        source_stage = self.stage(source)
+        if source_stage is not None and source_stage.op in PIPELINE_STAGE_OPS:
+            return ListPipeline(source.args[0], [source_stage, stage], node.ak_type)
+        return node
+
+
+def optimize(program, opt_level=1, inline_budget=INLINE_BUDGET):
+    """
+    Run the AST optimization passes enabled at opt_level on program.
+    Inlining runs first so that the bodies it substitutes are folded, and
+    list fusion last so it sees the final calls.
+    """
+    if opt_level >= 1:
+        if inline_budget > 0:
+            program = Inliner(inline_budget).visit(program)
+        program = ConstantFolder().visit(program)
+        program = ListFusion().visit(program)
+    return program
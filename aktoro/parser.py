@@ -1,11 +1,9 @@
 from lark import Transformer
-from lark import Visitor
 import aktoro.ast as ast
 import aktoro.types as types
 import aktoro.builtins as builtins
 from aktoro.type_resolver import TypeMapperVisitor, TypeResolverVisitor
 from enum import Enum
-import copy
 from itertools import count
 
 
@@ -33,7 +31,10 @@ class SymbolTable(object):
             "Some": builtins.OptionType.constructors[0],
             "None": builtins.OptionType.constructors[1],
             "Ok": builtins.ResultType.constructors[0],
-            "Err": builtins.ResultType.constructors[1]
+            "Err": builtins.ResultType.constructors[1],
+            "Stream": types.StreamType(types.TypeParameter("a")),
+            "Actor": types.ActorType(types.TypeParameter("m")),
+            "Sender": types.SenderType()
         }, {}]
         self.field_table = {}
 
@@ -70,38 +71,41 @@ class SymbolTable(object):
         self.field_table[field_hash] = name
 
 
-class PipelineRewriter(Visitor):
-    def pipe_expr(self, tree):
-        prev = tree.children[0]
-        for i in range(1, len(tree.children)):
-            curr = tree.children[i]
-            arg_start = 1 if curr.data == 'func_call' else 2
-            curr.children.insert(arg_start, prev)
-            prev = curr
-        tree.data = prev.data
-        tree.children = prev.children
-
-    def pipe_record_expr(self, tree):
-        self.pipe_expr(tree)
-
-
-class VariantPatternRewriter(Visitor):
-    def pattern(self, tree):
-        test_expr, pattern_body = tree.children
-        if test_expr.data == "variant_literal":
-            test_expr.data = "variant_pattern"
-            for i in range(1, len(test_expr.children)):
-                param = test_expr.children[i]
-                if param == "_":
-                    continue
-                if param.data == "var_usage":
-                    param.data = "variant_param_decl"
-                    param.children.insert(0, test_expr.children[0])
-                    param.children.insert(1, i - 1)
-                pattern_body.children.insert(0, param)
-            test_expr.children = test_expr.children[:1]
-        tree.children[0] = test_expr
-        tree.children[1] = pattern_body
+def rewrite_pipe_expr(tree):
+    """
+    Rewrite `x |> f(y) |> g()` into the nested calls `g(f(x, y))`.
+    """
+    prev = tree.children[0]
+    for i in range(1, len(tree.children)):
+        curr = tree.children[i]
+        arg_start = 1 if curr.data == 'func_call' else 2
+        curr.children.insert(arg_start, prev)
+        prev = curr
+    tree.data = prev.data
+    tree.children = prev.children
+
+
+def rewrite_variant_pattern(tree):
+    """
+    Rewrite a variant literal used as a match pattern into a variant_pattern,
+    turning its variable arguments into declarations at the start of the
+    pattern body.
+    """
+    test_expr, pattern_body = tree.children
+    if test_expr.data == "variant_literal":
+        test_expr.data = "variant_pattern"
+        for i in range(1, len(test_expr.children)):
+            param = test_expr.children[i]
+            if param == "_":
+                continue
+            if param.data == "var_usage":
+                param.data = "variant_param_decl"
+                param.children.insert(0, test_expr.children[0])
+                param.children.insert(1, i - 1)
+            pattern_body.children.insert(0, param)
+        test_expr.children = test_expr.children[:1]
+    tree.children[0] = test_expr
+    tree.children[1] = pattern_body
 
 
 def parse_var_decl(name, expr):
@@ -123,16 +127,33 @@ def resolve_variant_param_decls(patterns, test_expr):
     for pattern in patterns:
         for i, stmt in enumerate(pattern.body):
             if isinstance(stmt, ast.VariantParamDecl):
-                expr = ast.FieldAccess(test_expr, f"P{stmt.index}", stmt.ak_type)
+                expr = ast.VariantFieldAccess(test_expr, stmt.index, stmt.field_type, stmt.ak_type)
                 pattern.body[i] = ast.VarDecl(stmt.name, expr, stmt.ak_type)
 
     return patterns
 
 
 class Parser(Transformer):
+    # rewrites applied to a subtree before its children are transformed, so
+    # the parse tree is turned into an AST in a single walk
+    tree_rewriters = {
+        "pipe_expr": rewrite_pipe_expr,
+        "pipe_record_expr": rewrite_pipe_expr,
+        "pattern": rewrite_variant_pattern,
+    }
+
     def __init__(self):
         self.symbol_table = SymbolTable()
         self.imports = []
+        # types of the values tested by the enclosing match expressions,
+        # innermost last
+        self.match_test_types = []
+
+    def _transform_tree(self, tree):
+        rewrite = self.tree_rewriters.get(tree.data)
+        if rewrite:
+            rewrite(tree)
+        return super()._transform_tree(tree)
 
     def program(self, args):
         args = list(filter(None, args))
@@ -349,13 +370,21 @@ class Parser(Transformer):
         name = args[0]
         constructor = self.symbol_table.get(name)
         ak_type = constructor.variant_type
-        return ast.VariantPattern(str(name), ak_type)
+        return ast.VariantPattern(constructor.name, ak_type)
 
     def variant_param_decl(self, args):
         constructor_name, index, var_name = args
         constructor = self.symbol_table.get(constructor_name)
-        param_type = constructor.params[index]
-        decl = ast.VariantParamDecl(var_name, index, param_type)
+        field_type = constructor.params[index]
+        # bind the type parameters of the variant to the type arguments of
+        # the matched value, so destructuring a Box Int field gives an Int
+        test_type = self.match_test_types[-1] if self.match_test_types else None
+        param_type = field_type
+        if isinstance(test_type, types.VariantType) and test_type.name == constructor.variant_type.name:
+            type_resolver = TypeResolverVisitor(
+                {param.param: arg for param, arg in zip(constructor.variant_type.type_params, test_type.type_params)})
+            param_type = type_resolver.visit(field_type)
+        decl = ast.VariantParamDecl(var_name, index, field_type, param_type)
         self.symbol_table.add(var_name, decl)
         return decl
 
@@ -395,9 +424,8 @@ class Parser(Transformer):
         if arg_params:
             arg_params = [self.type_usage([param]) for param in arg_params]
 
-        symbol_entry = self.symbol_table.get(type_name)
-        ak_type = copy.deepcopy(symbol_entry)
-        if not symbol_entry or not isinstance(symbol_entry, types.AkType):
+        ak_type = self.symbol_table.get(type_name)
+        if not ak_type or not isinstance(ak_type, types.AkType):
             if type_name == type_name.lower():
                 return types.TypeParameter(type_name)
 
@@ -408,7 +436,6 @@ class Parser(Transformer):
             type_resolver = TypeResolverVisitor(
                 {param.param: arg for param, arg in zip(type_params, arg_params)})
             ak_type = type_resolver.visit(ak_type)
-            ak_type.type_params = arg_params
         return ak_type
 
     def paren_type(self, args):
@@ -515,7 +542,7 @@ class Parser(Transformer):
 
     def func_call(self, args):
         func, *arg_exprs = args
-        func_type = resolve_func_type(copy.deepcopy(func.ak_type), arg_exprs)
+        func_type = resolve_func_type(func.ak_type, arg_exprs)
         return ast.FuncCall(func, arg_exprs, func_type.return_type)
 
     def builtin_func_call(self, args):
@@ -560,6 +587,7 @@ class Parser(Transformer):
     def match_expr(self, args):
         if len(args) == 2:
             test_expr, patterns = args
+            self.match_test_types.pop()
             if isinstance(test_expr.ak_type, types.VariantType):
                 var_name = "_v"
                 patterns = resolve_variant_param_decls(patterns, ast.VarUsage(var_name, test_expr.ak_type))
@@ -570,6 +598,7 @@ class Parser(Transformer):
             return ast.MatchExpr(None, patterns, patterns[0].ak_type)
 
     def test_expr(self, args):
+        self.match_test_types.append(args[0].ak_type)
         return args[0]
 
     def match_patterns(self, args):
@@ -611,7 +640,4 @@ def resolve_func_type(func_type, args):
         type_mapper.visit(f_type, a_type)
     param_map = type_mapper.get_param_map()
     type_resolver = TypeResolverVisitor(param_map)
-    for f_type in func_type.param_types:
-        type_resolver.visit(f_type)
-    func_type.return_type = type_resolver.visit(func_type.return_type)
-    return func_type
+    return type_resolver.visit(func_type)
@@ -1,26 +1,28 @@
-class TypeMapperVisitor():
+import aktoro.types as types
+from aktoro.visitor import NodeVisitor
+
+
+class TypeMapperVisitor(NodeVisitor):
+    node_classes = types.TYPE_CLASSES
 
     def __init__(self):
         self.param_map = {}
 
-    def visit(self, node, arg_type):
-        '''
-        Execute a method of the form visit_NodeName(node) where
-        NodeName is the name of the class of a particular node.
-        '''
-        if node:
-            method = 'visit_' + node.__class__.__name__
-            visitor = getattr(self, method)
-            return visitor(node, arg_type)
-        else:
-            return None
-
     def get_param_map(self):
         return self.param_map
 
     def visit_ListType(self, node, arg_type):
         self.visit(node.elem_type, arg_type.elem_type)
 
+    def visit_StreamType(self, node, arg_type):
+        self.visit(node.elem_type, arg_type.elem_type)
+
+    def visit_ActorType(self, node, arg_type):
+        self.visit(node.msg_type, arg_type.msg_type)
+
+    def visit_SenderType(self, node, arg_type):
+        pass
+
     def visit_PrimitiveType(self, node, arg_type):
         pass
 
@@ -52,60 +54,62 @@ class TypeMapperVisitor():
             self.visit(n_param, a_param)
 
 
-class TypeResolverVisitor():
+class TypeResolverVisitor(NodeVisitor):
+    """
+    Substitutes type parameters using param_map.  Substitution is pure: a new
+    type is returned and nodes without any substituted parameters are shared
+    with the input.
+    """
+
+    node_classes = types.TYPE_CLASSES
 
     def __init__(self, param_map):
         self.param_map = param_map
 
-    def visit(self, node):
-        '''
-        Execute a method of the form visit_NodeName(node) where
-        NodeName is the name of the class of a particular node.
-        '''
-        if node:
-            method = 'visit_' + node.__class__.__name__
-            visitor = getattr(self, method)
-            return visitor(node)
-        else:
-            return None
-
     def visit_ListType(self, node):
-        node.elem_type = self.visit(node.elem_type)
+        return types.ListType(self.visit(node.elem_type))
+
+    def visit_StreamType(self, node):
+        return types.StreamType(self.visit(node.elem_type))
+
+    def visit_ActorType(self, node):
+        return types.ActorType(self.visit(node.msg_type))
+
+    def visit_SenderType(self, node):
         return node
 
     def visit_PrimitiveType(self, node):
         return node
 
     def visit_DictType(self, node):
-        node.key_type = self.visit(node.key_type)
-        node.val_type = self.visit(node.val_type)
-        return node
+        return types.DictType(self.visit(node.key_type), self.visit(node.val_type))
 
     def visit_RecordType(self, node):
-        for field_name, ak_type in node.fields.items():
-            node.fields[field_name] = self.visit(ak_type)
-        return node
+        fields = {field_name: self.visit(ak_type) for field_name, ak_type in node.fields.items()}
+        type_params = [self.visit(param) for param in node.type_params]
+        if all(fields[name] is node.fields[name] for name in fields) and \
+                all(new is old for new, old in zip(type_params, node.type_params)):
+            return node
+        return types.RecordType(node.name, type_params, fields)
 
     def visit_FuncType(self, node):
-        for i, param in enumerate(node.param_types):
-            node.param_types[i] = self.visit(param)
-        node.return_type = self.visit(node.return_type)
-        return node
+        param_types = [self.visit(param) for param in node.param_types]
+        return types.FuncType(param_types, self.visit(node.return_type))
 
     def visit_TypeParameter(self, node):
-        type_param = self.param_map[node.param]
-        return type_param
+        return self.param_map.get(node.param, node)
 
     def visit_EmptyTuple(self, node):
         return node
 
     def visit_VariantType(self, node):
-
-        for i, constructor in enumerate(node.constructors):
-            node.constructors[i] = self.visit(constructor)
-        return node
+        # constructors are shared with the generic declaration, only the
+        # type arguments of the instance are substituted
+        type_params = [self.visit(param) for param in node.type_params]
+        if all(new is old for new, old in zip(type_params, node.type_params)):
+            return node
+        return types.VariantType(node.name, type_params, node.constructors)
 
     def visit_VariantConstructor(self, node):
-        for i, param in enumerate(node.params):
-            node.params[i] = self.visit(param)
-        return node
+        params = [self.visit(param) for param in node.params]
+        return types.VariantConstructor(node.name, params, node.variant_type)
@@ -1,5 +1,6 @@
 from enum import Enum
-from abc import ABC, abstractmethod
+from abc import ABC, ABCMeta, abstractmethod
+import weakref
 
 
 class TypeKind(Enum):
@@ -9,6 +10,7 @@ class TypeKind(Enum):
 
 
 class AkType(ABC):
+    __slots__ = ("name", "__weakref__")
 
     def __init__(self, name):
         self.name = name
@@ -18,11 +20,34 @@ class AkType(ABC):
         pass
 
 
+class InternedTypeMeta(ABCMeta):
+    """
+    Metaclass hash-consing type instances.  Constructing a type with the same
+    arguments as a live instance returns that instance, so structurally equal
+    types are shared and instantiating a generic type only allocates the
+    nodes that actually change.  Interned types must never be mutated.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        cls._instances = weakref.WeakValueDictionary()
+
+    def __call__(cls, *args):
+        key = tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args)
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = super().__call__(*args)
+            cls._instances[key] = instance
+        return instance
+
+
 class ParameterizedType(ABC):
-    pass
+    __slots__ = ()
 
 
-class ListType(AkType):
+class ListType(AkType, metaclass=InternedTypeMeta):
+    __slots__ = ("elem_type",)
+
     def __init__(self, elem_type):
         super().__init__("list")
         self.elem_type = elem_type
@@ -36,7 +61,84 @@ class ListType(AkType):
         return "*list.List"
 
 
-class PrimitiveType(AkType):
+class StreamType(AkType, ParameterizedType, metaclass=InternedTypeMeta):
+    """
+    Lazy sequence of elem_type values, generated as a pull based Go iterator
+    returning the next value and whether there was one.
+    """
+    __slots__ = ("elem_type",)
+
+    def __init__(self, elem_type):
+        super().__init__("Stream")
+        self.elem_type = elem_type
+
+    @property
+    def type_params(self):
+        return [self.elem_type]
+
+    def __str__(self):
+        return "Stream {}".format(self.elem_type)
+
+    __repr__ = __str__
+
+    def go_code(self):
+        return "func() (interface{}, bool)"
+
+
+# Go types of the actor runtime, which is generated inline by code_gen.  An
+# actor is a goroutine folding the messages of its mailbox channel into its
+# state, each message carries the reply channel of actor.ask or nil.  The
+# counters are updated atomically, started is in Unix nanoseconds.
+ACTOR_ENVELOPE_GO_TYPE = "struct { msg interface{}; reply chan interface{} }"
+ACTOR_GO_TYPE = (f"*struct {{ mailbox chan {ACTOR_ENVELOPE_GO_TYPE}; policy string; "
+                 "dropped, processed, batches, started int64 }")
+
+
+class ActorType(AkType, ParameterizedType, metaclass=InternedTypeMeta):
+    """
+    Handle of a running actor accepting msg_type messages.
+    """
+    __slots__ = ("msg_type",)
+
+    def __init__(self, msg_type):
+        super().__init__("Actor")
+        self.msg_type = msg_type
+
+    @property
+    def type_params(self):
+        return [self.msg_type]
+
+    def __str__(self):
+        return "Actor {}".format(self.msg_type)
+
+    __repr__ = __str__
+
+    def go_code(self):
+        return ACTOR_GO_TYPE
+
+
+class SenderType(AkType, metaclass=InternedTypeMeta):
+    """
+    Where an actor's reply to the message it is handling goes, nothing unless
+    the message was sent with actor.ask.
+    """
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__("Sender")
+
+    def __str__(self):
+        return "Sender"
+
+    __repr__ = __str__
+
+    def go_code(self):
+        return "chan interface{}"
+
+
+class PrimitiveType(AkType, metaclass=InternedTypeMeta):
+    __slots__ = ()
+
     # map primitive aktoro types to their golang equivalents
     primitive_types = {
         "Int": "types.AkInt",
@@ -58,7 +160,9 @@ class PrimitiveType(AkType):
             return self.primitive_types[self.name]
 
 
-class DictType(AkType):
+class DictType(AkType, metaclass=InternedTypeMeta):
+    __slots__ = ("key_type", "val_type")
+
     def __init__(self, key_type, val_type):
         super().__init__("Dict")
         self.key_type = key_type
@@ -74,6 +178,8 @@ class DictType(AkType):
 
 
 class RecordType(AkType, ParameterizedType):
+    __slots__ = ("type_params", "fields")
+
     def __init__(self, name, type_params, fields):
         super().__init__(name)
         self.type_params = type_params
@@ -88,10 +194,12 @@ class RecordType(AkType, ParameterizedType):
         return f"{self.name} {' '.join([str(param) for param in self.type_params])}"
 
 
-class FuncType(AkType):
+class FuncType(AkType, metaclass=InternedTypeMeta):
+    __slots__ = ("param_types", "return_type")
+
     def __init__(self, param_types, return_type):
         super().__init__("fn")
-        self.param_types = param_types
+        self.param_types = tuple(param_types)
         self.return_type = return_type
 
     def __str__(self):
@@ -106,6 +214,8 @@ class FuncType(AkType):
 
 
 class VariantType(AkType, ParameterizedType):
+    __slots__ = ("type_params", "constructors")
+
     def __init__(self, name, type_params, constructors):
         super().__init__("VariantType")
         self.name = name
@@ -122,6 +232,8 @@ class VariantType(AkType, ParameterizedType):
 
 
 class VariantConstructor:
+    __slots__ = ("name", "params", "variant_type")
+
     def __init__(self, name, params, variant_type):
         self.name = name
         if not isinstance(params, list):
@@ -135,7 +247,9 @@ class VariantConstructor:
     __repr__ = __str__
 
 
-class TypeParameter(AkType):
+class TypeParameter(AkType, metaclass=InternedTypeMeta):
+    __slots__ = ("param",)
+
     def __init__(self, param):
         super().__init__("TypeParameter")
         self.param = param
@@ -149,7 +263,9 @@ class TypeParameter(AkType):
         return "interface{}"
 
 
-class EmptyTuple(AkType):
+class EmptyTuple(AkType, metaclass=InternedTypeMeta):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__("empty")
 
@@ -160,3 +276,7 @@ class EmptyTuple(AkType):
 
     def go_code(self):
         return "interface{}"
+
+
+TYPE_CLASSES = (ListType, StreamType, ActorType, SenderType, PrimitiveType, DictType, RecordType,
+                FuncType, VariantType, VariantConstructor, TypeParameter, EmptyTuple)
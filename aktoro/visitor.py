@@ -0,0 +1,64 @@
+from dataclasses import fields
+
+
+class NodeVisitor(object):
+    """
+    Base class for visitors that dispatch on the class of the visited node.
+
+    Subclasses list the classes they visit in node_classes and implement a
+    method of the form visit_NodeName(node, *args) for each of them.  The
+    class-to-method table is built once when the subclass is defined, which
+    fails with a TypeError if any handler is missing, unless the subclass
+    defines generic_visit(node, *args) to handle the remaining classes.
+    """
+    node_classes = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        dispatch = {}
+        missing = []
+        generic_visit = getattr(cls, 'generic_visit', None)
+        for node_class in cls.node_classes:
+            method = getattr(cls, 'visit_' + node_class.__name__, generic_visit)
+            if method is None:
+                missing.append(node_class.__name__)
+            dispatch[node_class] = method
+        if missing:
+            raise TypeError(f"{cls.__name__} is missing visitors for {', '.join(missing)}")
+        cls.dispatch = dispatch
+
+    def visit(self, node, *args):
+        if node:
+            try:
+                method = self.dispatch[node.__class__]
+            except KeyError:
+                raise TypeError(f"{self.__class__.__name__} cannot visit {node.__class__.__name__}") from None
+            return method(self, node, *args)
+        else:
+            return None
+
+
+class NodeTransformer(NodeVisitor):
+    """
+    Base class for passes that rewrite dataclass nodes.  Each visit returns
+    the node that replaces the visited one.  Nodes without a visit_NodeName
+    method are kept and have their children, including those held in lists,
+    tuples and dicts, replaced in place.
+    """
+
+    def generic_visit(self, node, *args):
+        for field in fields(node):
+            value = getattr(node, field.name)
+            setattr(node, field.name, self.transform(value, *args))
+        return node
+
+    def transform(self, value, *args):
+        if value.__class__ in self.dispatch:
+            return self.visit(value, *args)
+        if isinstance(value, list):
+            return [self.transform(v, *args) for v in value]
+        if isinstance(value, tuple):
+            return tuple(self.transform(v, *args) for v in value)
+        if isinstance(value, dict):
+            return {k: self.transform(v, *args) for k, v in value.items()}
+        return value
@@ -0,0 +1,108 @@
+"""
+Measure actor message throughput with one message per reducer call
+(actor.start) against batched delivery (actor.start_batch).  The program
+sends a run of messages to a counter actor and reports the messages per
+second and the number of mailbox runs the actor handled them in.
+
+Usage: python bench/actor_throughput.py [num_messages] [batch_size]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from aktoro.compiler import compile_ak
+
+
+COUNTER_REDUCER = """\
+counter_reducer : (Int, Message, Sender) -> Int
+counter_reducer (total, m, sender) -> {
+    next = match m {
+        Add num => total + num,
+        GetCount => {
+            actor.reply(sender, total)
+            total
+        }
+    }
+    next
+}
+"""
+
+BATCH_REDUCER = """\
+batch_reducer : (Int, [Message], [Sender]) -> Int
+batch_reducer (total, msgs, senders) -> {
+    next = match {
+        list.empty(msgs) => total,
+        _ => batch_reducer(counter_reducer(total, list.first(msgs), list.first(senders)),
+                           list.rest(msgs), list.rest(senders))
+    }
+    next
+}
+"""
+
+
+def actor_program(num_messages, reducers, start):
+    return f"""\
+type Message = Add Int | GetCount
+
+{reducers}
+send_all : (Actor Message, Int) -> Int
+send_all (counter, n) -> {{
+    sent = match {{
+        n == 0 => 0,
+        _ => {{
+            actor.send(counter, Add 1)
+            send_all(counter, n - 1) + 1
+        }}
+    }}
+    sent
+}}
+
+counter = {start}
+print(send_all(counter, {num_messages}))
+match actor.ask(counter, GetCount, 600000) {{
+    Ok total => print(total),
+    Err e => print(e)
+}}
+print(actor.throughput(counter), actor.batches(counter))
+"""
+
+
+def run(source, temp_dir, name):
+    bench_dir = os.path.dirname(os.path.abspath(__file__))
+    go_filename = os.path.join(bench_dir, f"{name}_aktoro_generated.go")
+    binary = os.path.join(temp_dir, name)
+    with open(go_filename, "w") as go_file:
+        compile_ak(source, out=go_file)
+    try:
+        subprocess.check_call(["go", "build", "-o", binary, go_filename], cwd=bench_dir)
+    finally:
+        os.remove(go_filename)
+    sent, total, stats = subprocess.check_output([binary]).decode("utf-8").splitlines()
+    if sent != total:
+        sys.exit(f"{name}: sent {sent} messages but the actor counted {total}")
+    throughput, batches = stats.split()
+    return float(throughput), int(batches)
+
+
+def main():
+    num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    variants = [
+        ("single", COUNTER_REDUCER, "actor.start(0, counter_reducer, 1024)"),
+        ("batch", COUNTER_REDUCER + "\n" + BATCH_REDUCER,
+         f"actor.start_batch(0, batch_reducer, {batch_size}, 1024)"),
+    ]
+    print(f"{num_messages} messages, batch size {batch_size}")
+    print(f"{'reducer':<8}{'msgs/s':>14}{'runs':>10}{'msgs/run':>10}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, reducers, start in variants:
+            source = actor_program(num_messages, reducers, start)
+            throughput, batches = run(source, temp_dir, f"actor_{name}")
+            print(f"{name:<8}{throughput:>14.0f}{batches:>10}{num_messages / max(batches, 1):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Measure how much memory the AST and type nodes of a large synthetic program
+from bench/synthetic.py take, comparing the slotted node classes against the
+same nodes stored as plain objects with a per-instance __dict__.
+
+Usage: python bench/ast_memory.py [num_functions]
+"""
+import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from aktoro.compiler import load_grammar
+from aktoro.parser import Parser
+import aktoro.types as types
+from synthetic import synthetic_program
+
+
+def slot_names(cls):
+    names = []
+    for klass in cls.__mro__:
+        for name in getattr(klass, "__slots__", ()):
+            if name not in ("__weakref__", "__dict__") and name not in names:
+                names.append(name)
+    return names
+
+
+def children(node):
+    for name in slot_names(type(node)):
+        value = getattr(node, name, None)
+        if isinstance(value, dict):
+            yield from value.values()
+        elif isinstance(value, (list, tuple)):
+            yield from value
+        else:
+            yield value
+
+
+def is_node(obj):
+    return type(obj).__module__ in ("aktoro.ast", "aktoro.types") and slot_names(type(obj))
+
+
+def walk(root):
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen or not is_node(node):
+            continue
+        seen.add(id(node))
+        yield node
+        stack.extend(children(node))
+
+
+_plain_classes = {}
+
+
+def dict_backed_size(node):
+    """
+    Size of node stored as an object with a __dict__, i.e. without __slots__.
+    """
+    cls = type(node)
+    if cls not in _plain_classes:
+        _plain_classes[cls] = type(cls.__name__, (), {})
+    plain = _plain_classes[cls]()
+    for name in slot_names(cls):
+        setattr(plain, name, getattr(node, name, None))
+    return sys.getsizeof(plain) + sys.getsizeof(plain.__dict__)
+
+
+def main():
+    num_functions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    source = synthetic_program(num_functions)
+    parse_tree = load_grammar().parse(source)
+    ast = Parser().transform(parse_tree)
+
+    counts = defaultdict(int)
+    slotted = defaultdict(int)
+    dict_backed = defaultdict(int)
+    for node in walk(ast):
+        kind = "type" if isinstance(node, (types.AkType, types.VariantConstructor)) else "ast"
+        counts[kind] += 1
+        slotted[kind] += sys.getsizeof(node)
+        dict_backed[kind] += dict_backed_size(node)
+
+    print(f"{num_functions} functions, {len(source.splitlines())} lines")
+    print(f"{'kind':<6}{'nodes':>10}{'dict B/node':>14}{'slots B/node':>14}{'saved':>8}")
+    for kind in sorted(counts):
+        before = dict_backed[kind] / counts[kind]
+        after = slotted[kind] / counts[kind]
+        print(f"{kind:<6}{counts[kind]:>10}{before:>14.1f}{after:>14.1f}{1 - after / before:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Measure how compile time and memory grow with program size, to catch phases
+that scale superlinearly.  Synthetic programs of increasing size are
+compiled phase by phase, once for the best time of each phase and once with
+tracemalloc for its peak memory.  The growth exponent k fitted to
+time ~ N**k is printed for every phase, k well above 1 is superlinear.
+
+Plots time and memory against N with matplotlib when it is installed,
+otherwise prints the per function cost as bars, which stay flat for linear
+phases and grow for superlinear ones.
+
+Usage: python bench/compile_scaling.py [--repeat R] [--depth D] [--plot out.png] [--csv out.csv] [sizes...]
+"""
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from aktoro.compiler import PHASES, PhaseTimings, compile_ak, format_bytes, load_grammar
+from synthetic import synthetic_program
+
+SIZES = (25, 50, 100, 200, 400)
+
+# growth exponents above this are reported as superlinear, leaving some slack
+# for noise and for the allocator
+SUPERLINEAR = 1.2
+
+# phases that never take longer or use more than this are left out of the
+# growth exponents, their measurements are noise
+TIME_FLOOR = 0.002
+MEMORY_FLOOR = 64 * 2 ** 10
+
+BAR_WIDTH = 50
+
+
+def compile_timed(source, repeat):
+    """
+    Best time of every phase over repeat compiles.
+    """
+    best = {}
+    for _ in range(repeat):
+        timings = PhaseTimings()
+        compile_ak(source, observer=timings)
+        for phase, (_, elapsed, _, _) in timings.totals().items():
+            best[phase] = min(best.get(phase, elapsed), elapsed)
+    return best
+
+
+def compile_traced(source):
+    """
+    Node count and tracemalloc peak of every phase.
+    """
+    timings = PhaseTimings(trace_memory=True)
+    compile_ak(source, observer=timings)
+    return {phase: (nodes, peak_memory) for phase, (_, _, nodes, peak_memory) in timings.totals().items()}
+
+
+def measure(sizes, repeat, depth, out=sys.stderr):
+    rows = []
+    for size in sizes:
+        source = synthetic_program(size, depth=depth)
+        start = time.perf_counter()
+        times = compile_timed(source, repeat)
+        traced = compile_traced(source)
+        row = {"functions": size, "lines": len(source.splitlines())}
+        for phase in PHASES:
+            row[f"{phase}_time"] = times[phase]
+            row[f"{phase}_nodes"], row[f"{phase}_memory"] = traced[phase]
+        row["total_time"] = sum(times[phase] for phase in PHASES)
+        row["peak_memory"] = max(row[f"{phase}_memory"] for phase in PHASES)
+        rows.append(row)
+        print(f"{size} functions, {row['lines']} lines in {time.perf_counter() - start:.1f}s", file=out)
+    return rows
+
+
+def growth_exponent(sizes, values):
+    """
+    Least squares slope of log(value) against log(size).
+    """
+    points = [(math.log(size), math.log(value)) for size, value in zip(sizes, values) if value > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def print_table(rows, out=sys.stdout):
+    columns = [f"{phase}_time" for phase in PHASES] + ["total_time", "peak_memory"]
+    print(f"{'N':>6}{'lines':>8}" + "".join(f"{column.replace('_time', ''):>13}" for column in columns), file=out)
+    for row in rows:
+        cells = [f"{row[column] * 1000:.1f}ms" for column in columns[:-1]] + [format_bytes(row["peak_memory"])]
+        print(f"{row['functions']:>6}{row['lines']:>8}" + "".join(f"{cell:>13}" for cell in cells), file=out)
+
+
+def print_growth(rows, out=sys.stdout):
+    """
+    Print the growth exponent of the time and memory of every phase.
+    """
+    sizes = [row["functions"] for row in rows]
+    print(f"\ngrowth exponent k of time ~ N**k, over {SUPERLINEAR} is superlinear", file=out)
+    for metric in [f"{phase}_time" for phase in PHASES] + [f"{phase}_memory" for phase in PHASES] + ["total_time"]:
+        values = [row[metric] for row in rows]
+        if max(values) < (TIME_FLOOR if metric.endswith("_time") else MEMORY_FLOOR):
+            continue
+        k = growth_exponent(sizes, values)
+        if k is None:
+            continue
+        print(f"{metric:<18}{k:>6.2f}{'  SUPERLINEAR' if k > SUPERLINEAR else ''}", file=out)
+
+
+def print_bars(rows, out=sys.stdout):
+    """
+    Text fallback for the plot: the compile time and memory per function of
+    every size.
+    """
+    for metric, unit in (("total_time", "us"), ("peak_memory", "KiB")):
+        scale = 1e6 if unit == "us" else 1 / 2 ** 10
+        per_function = [row[metric] * scale / row["functions"] for row in rows]
+        longest = max(per_function)
+        print(f"\n{metric} per function", file=out)
+        for row, value in zip(rows, per_function):
+            bar = "#" * max(1, round(value / longest * BAR_WIDTH))
+            print(f"{row['functions']:>6} {bar:<{BAR_WIDTH}} {value:.1f}{unit}", file=out)
+
+
+def plot(rows, filename):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    sizes = [row["functions"] for row in rows]
+    fig, (time_axes, memory_axes) = plt.subplots(1, 2, figsize=(12, 5))
+    for phase in PHASES:
+        time_axes.plot(sizes, [row[f"{phase}_time"] for row in rows], marker="o", label=phase)
+        memory_axes.plot(sizes, [row[f"{phase}_memory"] / 2 ** 20 for row in rows], marker="o", label=phase)
+    time_axes.plot(sizes, [row["total_time"] for row in rows], marker="o", linestyle="--", label="total")
+    # a linear reference through the first total, superlinear phases bend away from it
+    time_axes.plot(sizes, [rows[0]["total_time"] * size / sizes[0] for size in sizes], color="grey",
+                   linestyle=":", label="linear")
+    for axes, label in ((time_axes, "compile time (s)"), (memory_axes, "peak traced memory (MiB)")):
+        axes.set_xscale("log")
+        axes.set_yscale("log")
+        axes.set_xlabel("functions")
+        axes.set_ylabel(label)
+        axes.legend()
+    fig.tight_layout()
+    fig.savefig(filename)
+
+
+def save_csv(rows, filename):
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("sizes", nargs="*", type=int, default=SIZES,
+                            help="numbers of functions of the synthetic programs")
+    arg_parser.add_argument("--repeat", type=int, default=2, help="compiles per size, the best time is kept")
+    arg_parser.add_argument("--depth", type=int, default=6, help="nesting depth of match and if expressions")
+    arg_parser.add_argument("--plot", metavar="OUT.png", help="plot time and memory against N with matplotlib")
+    arg_parser.add_argument("--csv", metavar="OUT.csv", help="write the measurements as CSV")
+    args = arg_parser.parse_args()
+
+    load_grammar()
+    rows = measure(sorted(args.sizes), args.repeat, args.depth)
+    print_table(rows)
+    print_growth(rows)
+    if args.csv:
+        save_csv(rows, args.csv)
+    if args.plot:
+        try:
+            plot(rows, args.plot)
+        except ImportError:
+            print(f"\nmatplotlib is not installed, not writing {args.plot}", file=sys.stderr)
+            print_bars(rows)
+    else:
+        print_bars(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Measure how list.pmap and list.preduce scale with the number of cores.  A
+CPU bound program is compiled once and run with GOMAXPROCS set to each core
+count, the parallel builtins default to one worker per GOMAXPROCS.
+
+Usage: python bench/parallel_scaling.py [num_elements] [repeats]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from aktoro.compiler import compile_ak
+
+CORES = (1, 2, 4, 8)
+
+
+def parallel_program(num_elements):
+    seeds = ", ".join(str(i) for i in range(num_elements))
+    return f"""\
+collatz : (Int, Int) -> Int
+collatz (n, steps) -> {{
+    result = match {{
+        n == 1 => steps,
+        n % 2 == 0 => collatz(n / 2, steps + 1),
+        _ => collatz(3 * n + 1, steps + 1)
+    }}
+    result
+}}
+
+work : Int -> Int
+work seed -> collatz(seed * 7919 + 1000001, 0) + collatz(seed * 104729 + 1, 0)
+
+add : (Int, Int) -> Int
+add (a, b) -> a + b
+
+seeds = [{seeds}]
+print(seeds |> list.pmap(work) |> list.preduce(0, add))
+"""
+
+
+def build(num_elements, binary):
+    bench_dir = os.path.dirname(os.path.abspath(__file__))
+    go_filename = os.path.join(bench_dir, "parallel_scaling_aktoro_generated.go")
+    with open(go_filename, "w") as go_file:
+        compile_ak(parallel_program(num_elements), out=go_file)
+    try:
+        subprocess.check_call(["go", "build", "-o", binary, go_filename], cwd=bench_dir)
+    finally:
+        os.remove(go_filename)
+
+
+def best_time(binary, cores, repeats):
+    env = dict(os.environ, GOMAXPROCS=str(cores))
+    best = None
+    output = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.check_output([binary], env=env)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output.decode("utf-8").strip()
+
+
+def main():
+    num_elements = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with tempfile.TemporaryDirectory() as temp_dir:
+        binary = os.path.join(temp_dir, "parallel_scaling")
+        build(num_elements, binary)
+
+        print(f"{num_elements} elements, best of {repeats} runs, {os.cpu_count()} cpus available")
+        print(f"{'cores':>6}{'seconds':>10}{'speedup':>10}")
+        baseline = None
+        results = set()
+        for cores in CORES:
+            elapsed, output = best_time(binary, cores, repeats)
+            results.add(output)
+            baseline = baseline or elapsed
+            print(f"{cores:>6}{elapsed:>10.3f}{baseline / elapsed:>9.2f}x")
+        if len(results) != 1:
+            sys.exit(f"results differ between core counts: {sorted(results)}")
+
+
+if __name__ == "__main__":
+    main()
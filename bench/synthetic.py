@@ -0,0 +1,143 @@
+"""
+Generate large synthetic Aktoro programs to benchmark how the compiler scales.
+
+A program has num_functions groups of functions over num_types record and
+variant types.  Between them they use every construct of the grammar: type
+parameters, destructuring, list, dict and record literals and updates,
+indexing and slicing, string concatenation, streams, match expressions with
+and without a test nested depth levels deep, if expressions and |> pipelines
+of pipeline_length stages.  Programs compile and run, so the generated Go can
+be built too.
+
+Usage: python bench/synthetic.py num_functions [num_types] [depth] [pipeline_length] > program.ak
+"""
+import sys
+
+
+def type_decls(j):
+    return f"""\
+type Rec{j} = {{
+    id: Int,
+    name: String,
+    score: Float,
+    flag: Bool,
+    tags: [String],
+    meta: %{{String => Int}},
+    rank{j}: Int
+}}
+
+type Shape{j} a = Circle{j} Int | Box{j} Int Int | Label{j} a | Empty{j}
+"""
+
+
+def nested_expr(i, depth):
+    """
+    An Int expression over base and r nesting match and if expressions
+    depth levels deep, one branch of each level nesting the next one in a
+    block.
+    """
+    if depth == 0:
+        return f"base + {i % 7}"
+    inner = f"""{{
+    v{depth} = {indent(nested_expr(i, depth - 1))}
+    v{depth}
+}}"""
+    if depth % 3 == 0:
+        return f"""if base > {depth * 10} {indent(inner, 0)} else {{
+    base - {depth}
+}}"""
+    if depth % 3 == 1:
+        return f"""match {{
+    base % {depth + 1} == 0 and r.flag => {indent(inner)},
+    base > {depth * 100} or not r.flag => base * 2,
+    _ => base + {depth}
+}}"""
+    return f"""match base % 3 {{
+    0 => {indent(inner)},
+    1 => base - 1,
+    _ => base
+}}"""
+
+
+def indent(code, levels=1):
+    return code.replace("\n", "\n" + "    " * levels)
+
+
+def function_group(i, j, depth, pipeline_length):
+    stages = [f"list.map(inc{i})", f"list.filter(keep{i})", f"list.map(twice{i})"]
+    pipeline = " |> ".join(["xs"] + [stages[k % len(stages)] for k in range(pipeline_length)]
+                           + [f"list.reduce(0, add{i})"])
+    return f"""\
+inc{i} : Int -> Int
+inc{i} x -> x + {i % 5 + 1}
+
+twice{i} : Int -> Int
+twice{i} x -> x * 2
+
+keep{i} : Int -> Bool
+keep{i} x -> x % {i % 3 + 2} != 0
+
+add{i} : (Int, Int) -> Int
+add{i} (a, b) -> a + b
+
+score{i} : (Rec{j}, Int) -> Int
+score{i} (r, x) -> {{
+    base = r.id + x * {i % 11 + 1}
+    result = {indent(nested_expr(i, depth))}
+    result
+}}
+
+area{i} : Shape{j} Int -> Int
+area{i} s -> {{
+    a = match s {{
+        Circle{j} radius => radius * radius * 3,
+        Box{j} w h => w * h,
+        Empty{j} => 0,
+        _ => 1
+    }}
+    a
+}}
+
+pipe{i} : [Int] -> Int
+pipe{i} xs -> {pipeline}
+
+name_of{i} : Rec{j} -> String
+name_of{i} {{name}} -> name
+
+bump{i} : (Rec{j}, Int) -> Rec{j}
+bump{i} (r, n) -> {{
+    updated = {{r | id: r.id + n + r.rank{j}, score: r.score * 2.0, flag: not r.flag}}
+    updated
+}}
+
+r{i} = {{id: {i}, name: "r{i}", score: {i}.5, flag: true, tags: ["a", "b{i}"], meta: %{{"k" => {i}}}, rank{j}: {i % 10}}}
+b{i} = bump{i}(r{i}, {i % 4})
+m{i} = %{{b{i}.name => {i}, "x" => 2}}
+n{i} = %{{m{i} | "y" => 3, "x" => 4}}
+xs{i} = [1, 2, 3, {i}]
+ys{i} = [0 | xs{i}]
+[h{i}, t{i} | rest{i}] = ys{i}
+s{i} = "s" <> name_of{i}(b{i})
+q{i} = stream.range(0, {i % 9 + 3}) |> stream.map(inc{i}) |> stream.to_list()
+print(score{i}(b{i}, h{i} + t{i}), area{i}(Box{j} 2 {i % 6}), area{i}(Label{j} {i}), pipe{i}(ys{i}))
+print(n{i}["y"], xs{i}[1], rest{i}[1..2], s{i}[0..2], b{i}.tags[1], r{i}.meta["k"], q{i})
+"""
+
+
+def synthetic_program(num_functions, num_types=None, depth=6, pipeline_length=4):
+    if num_types is None:
+        num_types = max(1, num_functions // 10)
+    parts = [type_decls(j) for j in range(num_types)]
+    parts += [function_group(i, i % num_types, depth, pipeline_length) for i in range(num_functions)]
+    return "\n".join(parts)
+
+
+def main():
+    args = [int(arg) for arg in sys.argv[1:]]
+    if not args:
+        raise SystemExit(__doc__.strip().splitlines()[-1])
+    sys.stdout.write(synthetic_program(*args))
+
+
+if __name__ == "__main__":
+    main()
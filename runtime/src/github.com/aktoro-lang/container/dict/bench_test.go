@@ -0,0 +1,131 @@
+package dict
+
+import (
+	"fmt"
+	"testing"
+
+	"github.com/aktoro-lang/types"
+)
+
+// Compares the HAMT dict against copying a Go map on every update, run with
+// go test -bench . -benchmem
+
+var benchSizes = []int{1000, 100000, 10000000}
+
+// sink keeps the compiler from optimizing away the benchmarked calls
+var sink interface{}
+
+var benchMaps = map[int]map[interface{}]interface{}{}
+var benchDicts = map[int]Dict{}
+
+// benchMap and benchDict return the map and dict of the first n ints to
+// themselves, building each size once and only when a benchmark using it
+// runs.
+func benchMap(b *testing.B, n int) map[interface{}]interface{} {
+	m, ok := benchMaps[n]
+	if !ok {
+		m = make(map[interface{}]interface{}, n)
+		for i := 0; i < n; i++ {
+			m[types.AkInt(i)] = types.AkInt(i)
+		}
+		benchMaps[n] = m
+	}
+	b.ResetTimer()
+	return m
+}
+
+func benchDict(b *testing.B, n int) Dict {
+	d, ok := benchDicts[n]
+	if !ok {
+		kvs := make([]KeyValue, n)
+		for i := range kvs {
+			kvs[i] = NewKeyValue(types.AkInt(i), types.AkInt(i))
+		}
+		d = New(kvs...)
+		benchDicts[n] = d
+	}
+	b.ResetTimer()
+	return d
+}
+
+// copyPut is %{m | k => v} for a copy on write map.
+func copyPut(m map[interface{}]interface{}, k, v interface{}) map[interface{}]interface{} {
+	c := make(map[interface{}]interface{}, len(m)+1)
+	for k, v := range m {
+		c[k] = v
+	}
+	c[k] = v
+	return c
+}
+
+func BenchmarkPut(b *testing.B) {
+	for _, n := range benchSizes {
+		n := n
+		b.Run(fmt.Sprintf("copy/%d", n), func(b *testing.B) {
+			m := benchMap(b, n)
+			for i := 0; i < b.N; i++ {
+				sink = copyPut(m, types.AkInt(i%n), types.AkInt(-i))
+			}
+		})
+		b.Run(fmt.Sprintf("persistent/%d", n), func(b *testing.B) {
+			d := benchDict(b, n)
+			for i := 0; i < b.N; i++ {
+				sink = Put(d, NewKeyValue(types.AkInt(i%n), types.AkInt(-i)))
+			}
+		})
+	}
+}
+
+func BenchmarkGet(b *testing.B) {
+	for _, n := range benchSizes {
+		n := n
+		b.Run(fmt.Sprintf("copy/%d", n), func(b *testing.B) {
+			m := benchMap(b, n)
+			for i := 0; i < b.N; i++ {
+				sink = m[types.AkInt(i%n)]
+			}
+		})
+		b.Run(fmt.Sprintf("persistent/%d", n), func(b *testing.B) {
+			d := benchDict(b, n)
+			for i := 0; i < b.N; i++ {
+				sink = Get(d, types.AkInt(i%n))
+			}
+		})
+		b.Run(fmt.Sprintf("int/%d", n), func(b *testing.B) {
+			d := benchDict(b, n)
+			for i := 0; i < b.N; i++ {
+				sink = GetInt(d, types.AkInt(i%n))
+			}
+		})
+	}
+}
+
+// BenchmarkGetString compares string key lookups in a native map, through
+// Get and through GetString.
+func BenchmarkGetString(b *testing.B) {
+	const n = 100000
+	keys := make([]types.AkString, n)
+	m := make(map[types.AkString]interface{}, n)
+	kvs := make([]KeyValue, n)
+	for i := range keys {
+		keys[i] = types.AkString(fmt.Sprintf("key-%d", i))
+		m[keys[i]] = types.AkInt(i)
+		kvs[i] = NewStringKeyValue(keys[i], types.AkInt(i))
+	}
+	d := New(kvs...)
+	b.Run("map", func(b *testing.B) {
+		for i := 0; i < b.N; i++ {
+			sink = m[keys[i%n]]
+		}
+	})
+	b.Run("generic", func(b *testing.B) {
+		for i := 0; i < b.N; i++ {
+			sink = Get(d, keys[i%n])
+		}
+	})
+	b.Run("string", func(b *testing.B) {
+		for i := 0; i < b.N; i++ {
+			sink = GetString(d, keys[i%n])
+		}
+	})
+}
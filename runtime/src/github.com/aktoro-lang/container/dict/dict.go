@@ -0,0 +1,239 @@
+// Package dict implements Aktoro's immutable dicts as hash array mapped
+// tries, so %{d | k => v} is O(log32 n) and shares everything but the path
+// to k with d.
+package dict
+
+import (
+	"bytes"
+	"fmt"
+	"math"
+	"sort"
+
+	"github.com/aktoro-lang/types"
+)
+
+// KeyValue carries the hash of its key, so the constructors specialized for
+// a key type can hash it without the type switch of NewKeyValue.
+type KeyValue struct {
+	K, V   interface{}
+	hash   uint32
+	hashed bool
+}
+
+// Hasher is implemented by keys with a structural hash, the compiler
+// generates it for records and variants used as dict keys.  Keys with equal
+// values must have equal hashes.
+type Hasher interface {
+	AkHash() uint32
+}
+
+// Dict is a value, the zero Dict is empty.
+type Dict struct {
+	root *hamtNode
+	size int
+}
+
+func NewKeyValue(k, v interface{}) KeyValue {
+	return KeyValue{k, v, Hash(k), true}
+}
+
+func NewIntKeyValue(k types.AkInt, v interface{}) KeyValue {
+	return KeyValue{k, v, HashInt(k), true}
+}
+
+func NewStringKeyValue(k types.AkString, v interface{}) KeyValue {
+	return KeyValue{k, v, HashString(k), true}
+}
+
+func NewBoolKeyValue(k types.AkBool, v interface{}) KeyValue {
+	return KeyValue{k, v, HashBool(k), true}
+}
+
+func New(kvs ...KeyValue) Dict {
+	return Put(Dict{}, kvs...)
+}
+
+// Put returns d with the key values of kvs added, later keys replacing
+// earlier ones.
+func Put(d Dict, kvs ...KeyValue) Dict {
+	owner := &edit{}
+	for _, kv := range kvs {
+		if !kv.hashed {
+			kv.hash = Hash(kv.K)
+		}
+		root, added := d.root.put(0, &entry{kv.hash, kv.K, kv.V}, owner)
+		d.root = root
+		if added {
+			d.size++
+		}
+	}
+	return d
+}
+
+// Get returns the value of k in d, or nil if d has no key k.
+func Get(d Dict, k interface{}) interface{} {
+	e, c := d.root.find(Hash(k))
+	if e != nil && e.key == k {
+		return e.val
+	}
+	if c != nil {
+		for _, e := range c.entries {
+			if e.key == k {
+				return e.val
+			}
+		}
+	}
+	return nil
+}
+
+// GetInt, GetString and GetBool are Get for dicts with keys of one
+// primitive type.  They hash k natively and compare it without going
+// through the equality of its interface value.
+
+func GetInt(d Dict, k types.AkInt) interface{} {
+	e, c := d.root.find(HashInt(k))
+	if e != nil && e.key == k {
+		return e.val
+	}
+	if c != nil {
+		for _, e := range c.entries {
+			if e.key == k {
+				return e.val
+			}
+		}
+	}
+	return nil
+}
+
+func GetString(d Dict, k types.AkString) interface{} {
+	e, c := d.root.find(HashString(k))
+	if e != nil && e.key == k {
+		return e.val
+	}
+	if c != nil {
+		for _, e := range c.entries {
+			if e.key == k {
+				return e.val
+			}
+		}
+	}
+	return nil
+}
+
+func GetBool(d Dict, k types.AkBool) interface{} {
+	e, c := d.root.find(HashBool(k))
+	if e != nil && e.key == k {
+		return e.val
+	}
+	if c != nil {
+		for _, e := range c.entries {
+			if e.key == k {
+				return e.val
+			}
+		}
+	}
+	return nil
+}
+
+func (d Dict) String() string {
+	entries := make([]*entry, 0, d.size)
+	d.root.each(func(e *entry) {
+		entries = append(entries, e)
+	})
+	sort.Slice(entries, func(i, j int) bool {
+		return keyLess(entries[i].key, entries[j].key)
+	})
+	var b bytes.Buffer
+	b.WriteString("%{")
+	for i, e := range entries {
+		if i > 0 {
+			b.WriteString(", ")
+		}
+		fmt.Fprintf(&b, "%v => %v", e.key, e.val)
+	}
+	b.WriteString("}")
+	return b.String()
+}
+
+// keyLess orders keys for printing, primitive keys by value and any other
+// keys by their printed form.
+func keyLess(a, b interface{}) bool {
+	switch a := a.(type) {
+	case types.AkInt:
+		if b, ok := b.(types.AkInt); ok {
+			return a < b
+		}
+	case types.AkFloat:
+		if b, ok := b.(types.AkFloat); ok {
+			return a < b
+		}
+	case types.AkString:
+		if b, ok := b.(types.AkString); ok {
+			return a < b
+		}
+	}
+	return fmt.Sprint(a) < fmt.Sprint(b)
+}
+
+// Hash is the hash of any key.  Records and variants without an AkHash
+// method are hashed by their printed form.
+func Hash(k interface{}) uint32 {
+	switch k := k.(type) {
+	case types.AkInt:
+		return HashInt(k)
+	case types.AkString:
+		return HashString(k)
+	case types.AkBool:
+		return HashBool(k)
+	case types.AkFloat:
+		if k == 0 {
+			// -0 == 0
+			return hashUint64(0)
+		}
+		return hashUint64(math.Float64bits(float64(k)))
+	case Hasher:
+		return k.AkHash()
+	}
+	return hashString(fmt.Sprintf("%T%v", k, k))
+}
+
+func HashInt(k types.AkInt) uint32 {
+	return hashUint64(uint64(k))
+}
+
+func HashString(k types.AkString) uint32 {
+	return hashString(string(k))
+}
+
+func HashBool(k types.AkBool) uint32 {
+	if k {
+		return hashUint64(1)
+	}
+	return hashUint64(0)
+}
+
+// HashCombine mixes the hash x of a field into the hash h of the fields
+// before it.
+func HashCombine(h, x uint32) uint32 {
+	return h ^ (x + 0x9e3779b9 + h<<6 + h>>2)
+}
+
+// hashUint64 mixes all bits of x into the 32 bits of the hash.
+func hashUint64(x uint64) uint32 {
+	x ^= x >> 33
+	x *= 0xff51afd7ed558ccd
+	x ^= x >> 33
+	x *= 0xc4ceb9fe1a85ec53
+	x ^= x >> 33
+	return uint32(x)
+}
+
+// hashString is 32 bit FNV-1a.
+func hashString(s string) uint32 {
+	h := uint32(2166136261)
+	for i := 0; i < len(s); i++ {
+		h ^= uint32(s[i])
+		h *= 16777619
+	}
+	return h
+}
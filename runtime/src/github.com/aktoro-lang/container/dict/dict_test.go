@@ -0,0 +1,133 @@
+package dict
+
+import (
+	"fmt"
+	"testing"
+
+	"github.com/aktoro-lang/types"
+)
+
+func TestPutAndGetAgainstMap(t *testing.T) {
+	model := map[interface{}]interface{}{}
+	d := New()
+	for i := 0; i < 20000; i++ {
+		k := types.AkInt(i * 7919 % 5003)
+		d = Put(d, NewKeyValue(k, types.AkInt(i)))
+		model[k] = types.AkInt(i)
+	}
+	if d.size != len(model) {
+		t.Fatalf("size = %d, want %d", d.size, len(model))
+	}
+	for k, v := range model {
+		if got := Get(d, k); got != v {
+			t.Fatalf("Get(%v) = %v, want %v", k, got, v)
+		}
+	}
+	if got := Get(d, types.AkInt(-1)); got != nil {
+		t.Fatalf("Get of a missing key = %v", got)
+	}
+}
+
+func TestPutSharesStructure(t *testing.T) {
+	d := New(NewKeyValue(types.AkString("two"), types.AkInt(2)))
+	e := Put(d, NewKeyValue(types.AkString("three"), types.AkInt(3)))
+	f := Put(e, NewKeyValue(types.AkString("two"), types.AkInt(22)))
+	g := Put(f, NewKeyValue(types.AkString("four"), types.AkInt(4)), NewKeyValue(types.AkString("two"), types.AkInt(0)))
+	if got := fmt.Sprint(d, e, f, g); got != "%{two => 2} %{three => 3, two => 2} %{three => 3, two => 22} "+
+		"%{four => 4, three => 3, two => 0}" {
+		t.Fatalf("got %s", got)
+	}
+}
+
+type record struct {
+	Name types.AkString
+	Age  types.AkInt
+}
+
+func TestStructuralKeys(t *testing.T) {
+	d := New(NewKeyValue(record{"a", 1}, types.AkBool(true)), NewKeyValue(types.AkFloat(0.5), types.AkInt(1)))
+	if Get(d, record{"a", 1}) != types.AkBool(true) || Get(d, record{"a", 2}) != nil {
+		t.Fatalf("record keys: %v", d)
+	}
+	if Get(d, types.AkFloat(0.5)) != types.AkInt(1) {
+		t.Fatalf("float keys: %v", d)
+	}
+}
+
+// collidingKey hashes to a fixed value, to build collisions on purpose.
+type collidingKey struct {
+	name string
+	hash uint32
+}
+
+func (k collidingKey) AkHash() uint32 {
+	return k.hash
+}
+
+func TestCollisions(t *testing.T) {
+	a, b := collidingKey{"a", 7}, collidingKey{"b", 7}
+	// same five low bits as a and b, so it lands in the slot of their collision
+	c := collidingKey{"c", 7 | 1<<hashBits}
+	d := New(NewKeyValue(a, types.AkInt(1)), NewKeyValue(b, types.AkInt(2)))
+	e := Put(d, NewKeyValue(c, types.AkInt(3)), NewKeyValue(b, types.AkInt(22)))
+	if Get(d, a) != types.AkInt(1) || Get(d, b) != types.AkInt(2) || Get(d, c) != nil || d.size != 2 {
+		t.Fatalf("d = %v", d)
+	}
+	if Get(e, a) != types.AkInt(1) || Get(e, b) != types.AkInt(22) || Get(e, c) != types.AkInt(3) || e.size != 3 {
+		t.Fatalf("e = %v", e)
+	}
+	if Get(e, collidingKey{"d", 7}) != nil {
+		t.Fatal("found a missing colliding key")
+	}
+}
+
+// Keys with a different hash in the slot of a collision used to be added to
+// the collision, where lookups by their hash never find them.
+func TestPutNextToCollision(t *testing.T) {
+	a, b := collidingKey{"a", 7}, collidingKey{"b", 7}
+	others := []collidingKey{
+		{"c", 7 | 1<<hashBits},
+		{"d", 7 | 2<<hashBits},
+		{"e", 7 | 1<<(2*hashBits)},
+		// collides with c one level down
+		{"f", 7 | 1<<hashBits},
+	}
+	d := New(NewKeyValue(a, types.AkInt(1)), NewKeyValue(b, types.AkInt(2)))
+	for i, k := range others {
+		d = Put(d, NewKeyValue(k, types.AkInt(i+3)))
+	}
+	if d.size != 2+len(others) {
+		t.Fatalf("size = %d, want %d", d.size, 2+len(others))
+	}
+	if Get(d, a) != types.AkInt(1) || Get(d, b) != types.AkInt(2) {
+		t.Fatalf("collision lost its keys: %v", d)
+	}
+	for i, k := range others {
+		if got := Get(d, k); got != types.AkInt(i+3) {
+			t.Fatalf("Get(%v) = %v, want %d", k, got, i+3)
+		}
+	}
+	count := 0
+	d.root.each(func(*entry) { count++ })
+	if count != d.size {
+		t.Fatalf("each visited %d entries, want %d", count, d.size)
+	}
+}
+
+func TestSpecializedKeys(t *testing.T) {
+	d := New(NewIntKeyValue(1, types.AkString("one")), NewKeyValue(types.AkInt(2), types.AkString("two")))
+	if GetInt(d, 1) != types.AkString("one") || GetInt(d, 2) != types.AkString("two") || GetInt(d, 3) != nil {
+		t.Fatalf("int keys: %v", d)
+	}
+	if Get(d, types.AkInt(1)) != types.AkString("one") {
+		t.Fatalf("generic lookup of a specialized key: %v", d)
+	}
+	s := Put(New(), NewStringKeyValue("a", types.AkInt(1)), KeyValue{K: types.AkString("b"), V: types.AkInt(2)})
+	if GetString(s, "a") != types.AkInt(1) || GetString(s, "b") != types.AkInt(2) || GetString(s, "") != nil {
+		t.Fatalf("string keys: %v", s)
+	}
+	b := New(NewBoolKeyValue(true, types.AkInt(1)))
+	if GetBool(b, true) != types.AkInt(1) || GetBool(b, false) != nil {
+		t.Fatalf("bool keys: %v", b)
+	}
+}
@@ -0,0 +1,159 @@
+package dict
+
+import "math/bits"
+
+// A hash array mapped trie.  Each level indexes five bits of the key hash,
+// and a node only stores the slots present in its bitmap.  Inserting copies
+// the nodes on the path to the key, the rest of the trie is shared with the
+// dict it was derived from.
+
+const (
+	hashBits = 5
+	hashMask = 1<<hashBits - 1
+)
+
+type entry struct {
+	hash     uint32
+	key, val interface{}
+}
+
+// hamtNode slots hold an *entry, a *hamtNode for the next five bits or a
+// *collision once all bits of the hash are used up.  Nodes reachable from
+// a Dict are never modified, except by the Put call that created them.
+type hamtNode struct {
+	bitmap uint32
+	slots  []interface{}
+	owner  *edit
+}
+
+// edit identifies one Put call, nodes it created are updated in place by
+// its later key values instead of being copied again.
+type edit struct {
+	_ byte
+}
+
+// collision holds the entries of distinct keys with equal hashes.
+type collision struct {
+	hash    uint32
+	entries []*entry
+}
+
+// editable is whether n was created by the Put call owner.
+func (n *hamtNode) editable(owner *edit) bool {
+	return owner != nil && n.owner == owner
+}
+
+func slotBit(hash uint32, shift uint) uint32 {
+	return 1 << ((hash >> shift) & hashMask)
+}
+
+func (n *hamtNode) position(bit uint32) int {
+	return bits.OnesCount32(n.bitmap & (bit - 1))
+}
+
+// find returns the entry stored for hash, or the collision holding all the
+// entries with hash, or neither.  Callers compare the keys themselves, which
+// lets the key type specific lookups compare native values.
+func (n *hamtNode) find(hash uint32) (*entry, *collision) {
+	for shift := uint(0); n != nil; shift += hashBits {
+		bit := slotBit(hash, shift)
+		if n.bitmap&bit == 0 {
+			return nil, nil
+		}
+		switch slot := n.slots[n.position(bit)].(type) {
+		case *entry:
+			if slot.hash == hash {
+				return slot, nil
+			}
+			return nil, nil
+		case *collision:
+			if slot.hash == hash {
+				return nil, slot
+			}
+			return nil, nil
+		case *hamtNode:
+			n = slot
+		}
+	}
+	return nil, nil
+}
+
+// put returns the node with e added or replacing the entry of its key, and
+// whether the key is new.
+func (n *hamtNode) put(shift uint, e *entry, owner *edit) (*hamtNode, bool) {
+	if n == nil {
+		return &hamtNode{slotBit(e.hash, shift), []interface{}{e}, owner}, true
+	}
+	bit := slotBit(e.hash, shift)
+	pos := n.position(bit)
+	if n.bitmap&bit == 0 {
+		if !n.editable(owner) {
+			n = &hamtNode{n.bitmap, append(make([]interface{}, 0, len(n.slots)+1), n.slots...), owner}
+		}
+		n.slots = append(n.slots, nil)
+		copy(n.slots[pos+1:], n.slots[pos:])
+		n.slots[pos] = e
+		n.bitmap |= bit
+		return n, true
+	}
+
+	var slot interface{}
+	added := true
+	switch old := n.slots[pos].(type) {
+	case *entry:
+		switch {
+		case old.hash == e.hash && old.key == e.key:
+			slot, added = e, false
+		case old.hash == e.hash:
+			slot = &collision{e.hash, []*entry{old, e}}
+		default:
+			child, _ := (*hamtNode)(nil).put(shift+hashBits, old, owner)
+			slot, _ = child.put(shift+hashBits, e, owner)
+		}
+	case *collision:
+		if old.hash == e.hash {
+			slot, added = old.put(e)
+		} else {
+			child := &hamtNode{slotBit(old.hash, shift+hashBits), []interface{}{old}, owner}
+			slot, _ = child.put(shift+hashBits, e, owner)
+		}
+	case *hamtNode:
+		slot, added = old.put(shift+hashBits, e, owner)
+	}
+	if !n.editable(owner) {
+		n = &hamtNode{n.bitmap, append([]interface{}{}, n.slots...), owner}
+	}
+	n.slots[pos] = slot
+	return n, added
+}
+
+func (c *collision) put(e *entry) (*collision, bool) {
+	entries := make([]*entry, len(c.entries), len(c.entries)+1)
+	copy(entries, c.entries)
+	for i, old := range entries {
+		if old.key == e.key {
+			entries[i] = e
+			return &collision{c.hash, entries}, false
+		}
+	}
+	return &collision{c.hash, append(entries, e)}, true
+}
+
+// each calls f with every entry in trie order.
+func (n *hamtNode) each(f func(e *entry)) {
+	if n == nil {
+		return
+	}
+	for _, slot := range n.slots {
+		switch slot := slot.(type) {
+		case *entry:
+			f(slot)
+		case *collision:
+			for _, e := range slot.entries {
+				f(e)
+			}
+		case *hamtNode:
+			slot.each(f)
+		}
+	}
+}
@@ -0,0 +1,92 @@
+package list
+
+import (
+	"fmt"
+	"testing"
+
+	"github.com/aktoro-lang/types"
+)
+
+// Compares the persistent list against copying a slice on every update,
+// run with go test -bench . -benchmem
+
+var benchSizes = []int{1000, 100000, 10000000}
+
+// sink keeps the compiler from optimizing away the benchmarked calls
+var sink interface{}
+
+var benchSlices = map[int][]interface{}{}
+var benchLists = map[int]*List{}
+
+// benchList returns the first n ints as a slice and a list, building each
+// size once and only when a benchmark using it runs.
+func benchList(b *testing.B, n int) ([]interface{}, *List) {
+	if _, ok := benchLists[n]; !ok {
+		benchSlices[n] = ints(n)
+		benchLists[n] = New(benchSlices[n]...)
+	}
+	b.ResetTimer()
+	return benchSlices[n], benchLists[n]
+}
+
+// copyCons is [x | xs] for a copy on write slice.
+func copyCons(xs []interface{}, x interface{}) []interface{} {
+	ys := make([]interface{}, len(xs)+1)
+	ys[0] = x
+	copy(ys[1:], xs)
+	return ys
+}
+
+func BenchmarkCons(b *testing.B) {
+	for _, n := range benchSizes {
+		n := n
+		b.Run(fmt.Sprintf("copy/%d", n), func(b *testing.B) {
+			xs, _ := benchList(b, n)
+			for i := 0; i < b.N; i++ {
+				sink = copyCons(xs, types.AkInt(i))
+			}
+		})
+		b.Run(fmt.Sprintf("persistent/%d", n), func(b *testing.B) {
+			_, l := benchList(b, n)
+			for i := 0; i < b.N; i++ {
+				sink = Cons(l, types.AkInt(i))
+			}
+		})
+	}
+}
+
+func BenchmarkRest(b *testing.B) {
+	for _, n := range benchSizes {
+		n := n
+		b.Run(fmt.Sprintf("copy/%d", n), func(b *testing.B) {
+			xs, _ := benchList(b, n)
+			for i := 0; i < b.N; i++ {
+				sink = append([]interface{}{}, xs[1:]...)
+			}
+		})
+		b.Run(fmt.Sprintf("persistent/%d", n), func(b *testing.B) {
+			_, l := benchList(b, n)
+			for i := 0; i < b.N; i++ {
+				sink = Rest(l)
+			}
+		})
+	}
+}
+
+func BenchmarkAt(b *testing.B) {
+	for _, n := range benchSizes {
+		n := n
+		b.Run(fmt.Sprintf("copy/%d", n), func(b *testing.B) {
+			xs, _ := benchList(b, n)
+			for i := 0; i < b.N; i++ {
+				sink = xs[i%n]
+			}
+		})
+		b.Run(fmt.Sprintf("persistent/%d", n), func(b *testing.B) {
+			_, l := benchList(b, n)
+			for i := 0; i < b.N; i++ {
+				sink = At(l, types.AkInt(i%n))
+			}
+		})
+	}
+}
@@ -0,0 +1,264 @@
+// Package list implements Aktoro's immutable lists as views of a persistent
+// vector.  The elements are stored in reverse, the head of the list is the
+// last element of its view, so [x | xs], list.first and list.rest are
+// O(log32 n) and share all of xs.  Slicing and dropping only narrow the view.
+package list
+
+import (
+	"bytes"
+	"fmt"
+
+	"github.com/aktoro-lang/types"
+)
+
+// List is the view vec[off:off+size] read backwards.
+type List struct {
+	vec  vector
+	off  int
+	size int
+}
+
+var empty = &List{}
+
+// index is the position in the vector of the element at index i.
+func (l *List) index(i int) int {
+	return l.off + l.size - 1 - i
+}
+
+func (l *List) get(i int) interface{} {
+	return l.vec.get(l.index(i))
+}
+
+// each calls f with the elements in list order until it returns false,
+// looking up each leaf once.
+func (l *List) each(f func(i int, x interface{}) bool) {
+	i := 0
+	for top := l.off + l.size - 1; top >= l.off; {
+		leaf := l.vec.leaf(top)
+		bottom := top &^ mask
+		if bottom < l.off {
+			bottom = l.off
+		}
+		for j := top; j >= bottom; j-- {
+			if !f(i, leaf[j&mask]) {
+				return
+			}
+			i++
+		}
+		top = bottom - 1
+	}
+}
+
+// slice returns the elements from index lo up to hi as a view sharing l.
+func (l *List) slice(lo, hi int) *List {
+	if lo < 0 {
+		lo = 0
+	}
+	if hi > l.size {
+		hi = l.size
+	}
+	if lo >= hi {
+		return empty
+	}
+	return &List{l.vec, l.off + l.size - hi, hi - lo}
+}
+
+// push returns l with x in front.  The slot past the view may be used by
+// another list sharing the vector, so it is set by copying its path.
+func (l *List) push(x interface{}) *List {
+	return &List{l.vec.set(l.off+l.size, x, false), l.off, l.size + 1}
+}
+
+// fromSlice builds a list of xs in order, filling a new vector in place.
+func fromSlice(xs []interface{}) *List {
+	if len(xs) == 0 {
+		return empty
+	}
+	var vec vector
+	for i := len(xs) - 1; i >= 0; i-- {
+		vec = vec.set(len(xs)-1-i, xs[i], true)
+	}
+	return &List{vec, 0, len(xs)}
+}
+
+func (l *List) toSlice() []interface{} {
+	xs := make([]interface{}, 0, l.size)
+	l.each(func(i int, x interface{}) bool {
+		xs = append(xs, x)
+		return true
+	})
+	return xs
+}
+
+func (l *List) String() string {
+	var b bytes.Buffer
+	b.WriteString("[")
+	l.each(func(i int, x interface{}) bool {
+		if i > 0 {
+			b.WriteString(", ")
+		}
+		fmt.Fprint(&b, x)
+		return true
+	})
+	b.WriteString("]")
+	return b.String()
+}
+
+// New returns the list of xs.
+func New(xs ...interface{}) *List {
+	return fromSlice(xs)
+}
+
+// Cons returns the list of xs followed by the elements of l, [xs... | l].
+func Cons(l *List, xs ...interface{}) *List {
+	for i := len(xs) - 1; i >= 0; i-- {
+		l = l.push(xs[i])
+	}
+	return l
+}
+
+// GetRange returns the elements of l from index lo up to hi, l[lo..hi].
+func GetRange(l *List, lo, hi types.AkInt) *List {
+	return l.slice(int(lo), int(hi))
+}
+
+func At(l *List, i types.AkInt) interface{} {
+	if i < 0 || int(i) >= l.size {
+		panic(fmt.Sprintf("list index %d out of range for length %d", i, l.size))
+	}
+	return l.get(int(i))
+}
+
+func Length(l *List) interface{} {
+	return types.AkInt(l.size)
+}
+
+func Empty(l *List) interface{} {
+	return types.AkBool(l.size == 0)
+}
+
+func First(l *List) interface{} {
+	return At(l, 0)
+}
+
+func Rest(l *List) interface{} {
+	return l.slice(1, l.size)
+}
+
+func Take(l *List, n types.AkInt) interface{} {
+	return l.slice(0, int(n))
+}
+
+func Drop(l *List, n types.AkInt) interface{} {
+	return l.slice(int(n), l.size)
+}
+
+func TakeWhile(l *List, f func(interface{}) interface{}) interface{} {
+	n := l.size
+	l.each(func(i int, x interface{}) bool {
+		if !bool(f(x).(types.AkBool)) {
+			n = i
+			return false
+		}
+		return true
+	})
+	return l.slice(0, n)
+}
+
+func DropWhile(l *List, f func(interface{}) interface{}) interface{} {
+	n := l.size
+	l.each(func(i int, x interface{}) bool {
+		if !bool(f(x).(types.AkBool)) {
+			n = i
+			return false
+		}
+		return true
+	})
+	return l.slice(n, l.size)
+}
+
+func Reverse(l *List) interface{} {
+	xs := l.toSlice()
+	for i, j := 0, len(xs)-1; i < j; i, j = i+1, j-1 {
+		xs[i], xs[j] = xs[j], xs[i]
+	}
+	return fromSlice(xs)
+}
+
+func Map(l *List, f func(interface{}) interface{}) interface{} {
+	xs := make([]interface{}, 0, l.size)
+	l.each(func(i int, x interface{}) bool {
+		xs = append(xs, f(x))
+		return true
+	})
+	return fromSlice(xs)
+}
+
+func Filter(l *List, f func(interface{}) interface{}) interface{} {
+	xs := []interface{}{}
+	l.each(func(i int, x interface{}) bool {
+		if bool(f(x).(types.AkBool)) {
+			xs = append(xs, x)
+		}
+		return true
+	})
+	return fromSlice(xs)
+}
+
+func Reduce(l *List, acc interface{}, f func(interface{}, interface{}) interface{}) interface{} {
+	l.each(func(i int, x interface{}) bool {
+		acc = f(acc, x)
+		return true
+	})
+	return acc
+}
+
+func Each(l *List, f func(interface{}) interface{}) interface{} {
+	l.each(func(i int, x interface{}) bool {
+		f(x)
+		return true
+	})
+	return nil
+}
+
+func All(l *List, f func(interface{}) interface{}) interface{} {
+	all := true
+	l.each(func(i int, x interface{}) bool {
+		all = bool(f(x).(types.AkBool))
+		return all
+	})
+	return types.AkBool(all)
+}
+
+func Any(l *List, f func(interface{}) interface{}) interface{} {
+	any := false
+	l.each(func(i int, x interface{}) bool {
+		any = bool(f(x).(types.AkBool))
+		return !any
+	})
+	return types.AkBool(any)
+}
+
+func Find(l *List, f func(interface{}) interface{}) interface{} {
+	var found interface{}
+	l.each(func(i int, x interface{}) bool {
+		if bool(f(x).(types.AkBool)) {
+			found = x
+			return false
+		}
+		return true
+	})
+	return found
+}
+
+func FindIndex(l *List, f func(interface{}) interface{}) interface{} {
+	index := -1
+	l.each(func(i int, x interface{}) bool {
+		if bool(f(x).(types.AkBool)) {
+			index = i
+			return false
+		}
+		return true
+	})
+	return types.AkInt(index)
+}
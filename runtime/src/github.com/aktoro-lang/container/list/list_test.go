@@ -0,0 +1,98 @@
+package list
+
+import (
+	"fmt"
+	"reflect"
+	"testing"
+
+	"github.com/aktoro-lang/types"
+)
+
+func ints(n int) []interface{} {
+	xs := make([]interface{}, n)
+	for i := range xs {
+		xs[i] = types.AkInt(i)
+	}
+	return xs
+}
+
+func TestNewAndAt(t *testing.T) {
+	for _, n := range []int{0, 1, 31, 32, 33, 1024, 1025, 40000} {
+		xs := ints(n)
+		l := New(xs...)
+		if got := Length(l); got != types.AkInt(n) {
+			t.Fatalf("Length = %v, want %d", got, n)
+		}
+		for i := range xs {
+			if got := At(l, types.AkInt(i)); got != xs[i] {
+				t.Fatalf("n=%d: At(%d) = %v", n, i, got)
+			}
+		}
+		if n > 0 && !reflect.DeepEqual(l.toSlice(), xs) {
+			t.Fatalf("n=%d: toSlice mismatch", n)
+		}
+	}
+}
+
+func TestConsSharesTail(t *testing.T) {
+	tail := New(ints(100)...)
+	a := Cons(tail, types.AkInt(-1))
+	b := Cons(tail, types.AkInt(-2), types.AkInt(-3))
+	if At(a, 0) != types.AkInt(-1) || At(b, 0) != types.AkInt(-2) || At(b, 1) != types.AkInt(-3) {
+		t.Fatalf("heads: a=%v b=%v", a, b)
+	}
+	if At(a, 1) != types.AkInt(0) || At(b, 2) != types.AkInt(0) || Length(b) != types.AkInt(102) {
+		t.Fatalf("tails: a=%v b=%v", a, b)
+	}
+	if Length(tail) != types.AkInt(100) || At(tail, 0) != types.AkInt(0) {
+		t.Fatalf("tail changed: %v", tail)
+	}
+}
+
+func TestConsAfterSlicing(t *testing.T) {
+	l := New(ints(70)...)
+	rest := Rest(l).(*List)
+	a := Cons(rest, types.AkInt(100))
+	b := Cons(rest, types.AkInt(200))
+	if At(a, 0) != types.AkInt(100) || At(b, 0) != types.AkInt(200) || At(l, 0) != types.AkInt(0) {
+		t.Fatalf("a=%v b=%v l=%v", a, b, l)
+	}
+	mid := GetRange(l, 10, 20)
+	c := Cons(mid, types.AkInt(-1))
+	if c.String() != "[-1, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19]" {
+		t.Fatalf("c = %v", c)
+	}
+	if At(l, 9) != types.AkInt(9) {
+		t.Fatalf("l changed: %v", l)
+	}
+}
+
+func TestBuiltins(t *testing.T) {
+	l := New(ints(10)...)
+	double := func(x interface{}) interface{} { return x.(types.AkInt) * 2 }
+	even := func(x interface{}) interface{} { return types.AkBool(x.(types.AkInt)%2 == 0) }
+	small := func(x interface{}) interface{} { return types.AkBool(x.(types.AkInt) < 3) }
+	add := func(a, b interface{}) interface{} { return a.(types.AkInt) + b.(types.AkInt) }
+	cases := []struct {
+		got  interface{}
+		want string
+	}{
+		{Map(l, double), "[0, 2, 4, 6, 8, 10, 12, 14, 16, 18]"},
+		{Filter(l, even), "[0, 2, 4, 6, 8]"},
+		{Reverse(Take(l, 3).(*List)), "[2, 1, 0]"},
+		{Drop(l, 8), "[8, 9]"},
+		{TakeWhile(l, small), "[0, 1, 2]"},
+		{DropWhile(l, small), "[3, 4, 5, 6, 7, 8, 9]"},
+		{Reduce(l, types.AkInt(0), add), "45"},
+		{Any(l, small), "true"},
+		{All(l, small), "false"},
+		{FindIndex(l, even), "0"},
+		{Sort(New(types.AkInt(3), types.AkInt(1), types.AkInt(2))), "[1, 2, 3]"},
+		{Rest(New()), "[]"},
+	}
+	for i, c := range cases {
+		if got := fmt.Sprint(c.got); got != c.want {
+			t.Errorf("case %d: got %s, want %s", i, got, c.want)
+		}
+	}
+}
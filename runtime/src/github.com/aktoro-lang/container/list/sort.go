@@ -0,0 +1,39 @@
+package list
+
+import (
+	"fmt"
+	"sort"
+
+	"github.com/aktoro-lang/types"
+)
+
+// less orders values of Aktoro's primitive types.
+func less(a, b interface{}) bool {
+	switch a := a.(type) {
+	case types.AkInt:
+		return a < b.(types.AkInt)
+	case types.AkFloat:
+		return a < b.(types.AkFloat)
+	case types.AkString:
+		return a < b.(types.AkString)
+	case types.AkBool:
+		return !bool(a) && bool(b.(types.AkBool))
+	}
+	panic(fmt.Sprintf("list.sort: values of type %T are not ordered, use list.sort_by", a))
+}
+
+func Sort(l *List) interface{} {
+	xs := l.toSlice()
+	sort.SliceStable(xs, func(i, j int) bool {
+		return less(xs[i], xs[j])
+	})
+	return fromSlice(xs)
+}
+
+func SortBy(l *List, f func(interface{}, interface{}) interface{}) interface{} {
+	xs := l.toSlice()
+	sort.SliceStable(xs, func(i, j int) bool {
+		return bool(f(xs[i], xs[j]).(types.AkBool))
+	})
+	return fromSlice(xs)
+}
@@ -0,0 +1,79 @@
+package list
+
+// A persistent vector: a 32-way trie of fixed size nodes indexed by the bits
+// of the element index, five bits per level.  Setting an element copies only
+// the nodes on the path from the root to its leaf, every other node is
+// shared with the vector it was derived from.
+
+const (
+	bits  = 5
+	width = 1 << bits
+	mask  = width - 1
+)
+
+// node is a trie node.  Leaves hold elements, inner nodes hold *node
+// children.  Nodes reachable from a List are never modified.
+type node [width]interface{}
+
+// vector is the trie root with the shift of its top level, it can hold
+// width << shift elements.
+type vector struct {
+	root  *node
+	shift uint
+}
+
+func (v vector) capacity() int {
+	if v.root == nil {
+		return 0
+	}
+	return width << v.shift
+}
+
+// leaf returns the leaf holding the element at index i.
+func (v vector) leaf(i int) *node {
+	n := v.root
+	for level := v.shift; level > 0; level -= bits {
+		n = n[(i>>level)&mask].(*node)
+	}
+	return n
+}
+
+func (v vector) get(i int) interface{} {
+	return v.leaf(i)[i&mask]
+}
+
+// set returns the vector with the element at index i set to x, growing the
+// trie by a level when i is past its capacity.  With edit the nodes are
+// updated in place, which is only allowed while building a new vector that
+// nothing else refers to yet.
+func (v vector) set(i int, x interface{}, edit bool) vector {
+	if v.root == nil {
+		v.root = &node{}
+	}
+	for i >= v.capacity() {
+		root := &node{}
+		root[0] = v.root
+		v = vector{root, v.shift + bits}
+	}
+	v.root = setNode(v.root, v.shift, i, x, edit)
+	return v
+}
+
+func setNode(n *node, level uint, i int, x interface{}, edit bool) *node {
+	if !edit {
+		copied := *n
+		n = &copied
+	}
+	if level == 0 {
+		n[i&mask] = x
+		return n
+	}
+	slot := (i >> level) & mask
+	child, _ := n[slot].(*node)
+	if child == nil {
+		child = &node{}
+		edit = true
+	}
+	n[slot] = setNode(child, level-bits, i, x, edit)
+	return n
+}
@@ -1,36 +1,237 @@
+"""
+Golden tests: every */*.ak program is compiled, built and run, and its output
+is compared with the correct.txt next to it.  Every program is also compiled
+with -O0, so the optimizer must not change what a program prints, and with
+--typed, so typed signatures and monomorphized instances must not either.
+
+The programs are compiled in parallel worker processes, each into a Go
+package of its own, and linked into a single test binary whose argument
+selects the case to run, so the suite pays for one go build instead of a go
+run per case.  The cases then run concurrently, each in its own process.
+
+Generated files live in a fresh temporary directory, so concurrent runs of
+the suite cannot collide.  Set AKTORO_TEST_JOBS to limit the number of
+compile workers and concurrently running cases.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from aktoro.compiler import compile_ak
+from aktoro.bench import compare
+from aktoro.compiler import compile_ak, load_grammar
+import io
 import os
+import re
 import subprocess
-import glob
+import sys
+import tempfile
+import time
 import unittest
 
+TEST_DIR = Path(__file__).resolve().parent
+
+# exported so the test binary main can call it
+CASE_MAIN_FUNC = "Main"
+
+
+@dataclass
+class Case:
+    name: str
+    ak_filename: Path
+    # Go package the case is generated into, a directory of the workspace
+    package: str
+    opt_level: int = 1
+    typed_signatures: bool = False
+    compile_time: float = 0.0
+    run_time: float = 0.0
+    output: str = ""
+    error: str = ""
+
+
+def go(args, cwd):
+    return subprocess.run(["go", *args], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+
+class Workspace:
+    """
+    Temporary directory holding the test binary main and a package per case.
+    In module mode it has to be inside the module of the test directory, so
+    the generated code resolves the runtime packages like go run in the test
+    directory did.  In GOPATH mode the main imports the cases as local
+    packages.
+    """
+
+    def __init__(self):
+        go_mod = go(["env", "GOMOD"], TEST_DIR).stdout.decode("utf-8").strip()
+        if go_mod and go_mod != os.devnull:
+            module_root = Path(go_mod).parent
+            # go ignores directories starting with _ in package patterns
+            self.temp_dir = tempfile.TemporaryDirectory(prefix="_aktoro_tests_", dir=module_root)
+            module = go(["list", "-m"], TEST_DIR).stdout.decode("utf-8").strip()
+            relative = Path(self.temp_dir.name).relative_to(module_root).as_posix()
+            self.import_prefix = f"{module}/{relative}/"
+        else:
+            self.temp_dir = tempfile.TemporaryDirectory(prefix="aktoro_tests_")
+            self.import_prefix = "./"
+        self.path = Path(self.temp_dir.name)
+        self.binary = self.path / "aktoro_tests"
+
+    def go_filename(self, case):
+        return self.path / case.package / f"{case.package}_aktoro_generated.go"
+
+    def build(self, cases):
+        """
+        Build the test binary running the given cases, returning go build's
+        output when it fails.
+        """
+        source = "package main\n\nimport (\n\t\"os\"\n\n"
+        source += "".join(f"\t\"{self.import_prefix}{case.package}\"\n" for case in cases)
+        source += ")\n\nvar cases = map[string]func(){\n"
+        source += "".join(f"\t\"{case.name}\": {case.package}.{CASE_MAIN_FUNC},\n" for case in cases)
+        source += "}\n\nfunc main() {\n\tcases[os.Args[1]]()\n}\n"
+        (self.path / "main.go").write_text(source)
+        go_build = go(["build", "-o", str(self.binary), "."], self.path)
+        if go_build.returncode != 0:
+            return go_build.stdout.decode("utf-8")
+        return None
+
+    def build_case(self, case):
+        return go(["build", f"./{case.package}"], self.path)
+
+    def cleanup(self):
+        self.temp_dir.cleanup()
+
+
+def compile_case(ak_filename, go_filename, package, opt_level, typed_signatures):
+    """
+    Compile one test program into its package, returning the time it took.
+    Runs in worker processes, so it only takes picklable arguments.
+    """
+    start = time.perf_counter()
+    with open(ak_filename) as ak:
+        program = ak.read()
+    os.makedirs(os.path.dirname(go_filename))
+    with open(go_filename, "w") as go_file:
+        compile_ak(program, out=go_file, main_func=CASE_MAIN_FUNC, package_name=package, opt_level=opt_level,
+                   typed_signatures=typed_signatures)
+    return time.perf_counter() - start
+
+
+def run_case(workspace, case):
+    start = time.perf_counter()
+    program = subprocess.run([str(workspace.binary), case.name], cwd=TEST_DIR,
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    case.run_time = time.perf_counter() - start
+    case.output = program.stdout.decode("utf-8")
+    if program.returncode != 0:
+        case.error = f"exited with status {program.returncode}:\n{case.output}"
+
+
+def run_cases(workspace, cases, jobs=None):
+    """
+    Compile all cases in parallel, link them into one binary and run them
+    concurrently.  Returns the build time.  Cases that fail record their
+    error instead of stopping the others.
+    """
+    with ProcessPoolExecutor(max_workers=jobs, initializer=load_grammar) as pool:
+        futures = [pool.submit(compile_case, case.ak_filename, workspace.go_filename(case), case.package,
+                               case.opt_level, case.typed_signatures) for case in cases]
+        for case, future in zip(cases, futures):
+            try:
+                case.compile_time = future.result()
+            except Exception as e:
+                case.error = f"compile failed: {type(e).__name__}: {e}"
+
+    start = time.perf_counter()
+    compiled = [case for case in cases if not case.error]
+    build_error = workspace.build(compiled)
+    if build_error:
+        # build the cases on their own to blame the broken ones, and link the
+        # test binary from the rest
+        for case in compiled:
+            go_build = workspace.build_case(case)
+            if go_build.returncode != 0:
+                case.error = f"go build failed:\n{go_build.stdout.decode('utf-8')}"
+        compiled = [case for case in compiled if not case.error]
+        build_error = workspace.build(compiled)
+        if build_error:
+            for case in compiled:
+                case.error = f"go build of the test binary failed:\n{build_error}"
+            compiled = []
+    build_time = time.perf_counter() - start
+
+    # the threads only wait on the case processes
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        list(pool.map(lambda case: run_case(workspace, case), compiled))
+    return build_time
+
+
+def report(cases, build_time, wall_time, out=sys.stderr):
+    width = max(len(case.name) for case in cases)
+    print(f"\n{'case':<{width}}  {'compile':>9}  {'run':>9}", file=out)
+    for case in cases:
+        print(f"{case.name:<{width}}  {case.compile_time * 1000:7.1f}ms  {case.run_time * 1000:7.1f}ms"
+              f"{'  FAILED' if case.error else ''}", file=out)
+    print(f"{len(cases)} cases in {wall_time:.2f}s, test binary built in {build_time:.2f}s", file=out)
+
 
 class TestAktoro(unittest.TestCase):
-    @staticmethod
-    def run_file(filename):
-        with open(filename) as ak:
-            program = ak.read()
-
-        generated = compile_ak(program)
-        input_filename_no_extension = filename.split(".ak", 1)[0]
-        temp_go_filename = f"{input_filename_no_extension}_aktoro_generated.go"
-        with open(temp_go_filename, "w") as go_file:
-            go_file.write(generated)
-        output = subprocess.check_output(f"go run {temp_go_filename}", shell=True)
-        output = output.decode("utf-8")
-        os.remove(temp_go_filename)
-        return output
+    @classmethod
+    def setUpClass(cls):
+        cls.workspace = Workspace()
+        cls.cases = []
+        for ak_filename in sorted(TEST_DIR.glob("*/*.ak")):
+            relative = ak_filename.relative_to(TEST_DIR).with_suffix("")
+            package = "case_" + re.sub(r"\W+", "_", "_".join(relative.parts))
+            cls.cases.append(Case(relative.as_posix(), ak_filename, package))
+            cls.cases.append(Case(f"{relative.as_posix()} -O0", ak_filename, f"{package}_O0", opt_level=0))
+            cls.cases.append(Case(f"{relative.as_posix()} --typed", ak_filename, f"{package}_typed",
+                                  typed_signatures=True))
+        jobs = int(os.environ["AKTORO_TEST_JOBS"]) if "AKTORO_TEST_JOBS" in os.environ else None
+        start = time.perf_counter()
+        build_time = run_cases(cls.workspace, cls.cases, jobs)
+        report(cls.cases, build_time, time.perf_counter() - start)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.workspace.cleanup()
 
     def test(self):
-        test_ak_files = glob.glob("*/*.ak")
-        for filename in test_ak_files:
-            result = self.run_file(filename)
-            test_path = Path(filename)
-            expected_file = test_path.parent / "correct.txt"
-            with open(expected_file, "r") as e:
-                expected = e.read()
-            self.assertEqual(result.strip(), expected.strip())
+        for case in self.cases:
+            with self.subTest(case=case.name):
+                if case.error:
+                    self.fail(case.error)
+                expected = (case.ak_filename.parent / "correct.txt").read_text()
+                self.assertEqual(case.output.strip(), expected.strip())
+
+
+# top level variables named like those of the CPU profile prologue
+CPU_PROFILE_PROGRAM = """\
+err = 1
+profile = 2
+profile_err = 3
+print(err + profile + profile_err)
+"""
+
+
+class TestCpuProfile(unittest.TestCase):
+    def test_profile_written(self):
+        workspace = Workspace()
+        self.addCleanup(workspace.cleanup)
+        profile = workspace.path / "cpu.pprof"
+        (workspace.path / "main.go").write_text(compile_ak(CPU_PROFILE_PROGRAM, cpu_profile=profile))
+        go_run = go(["run", "."], workspace.path)
+        self.assertEqual(go_run.returncode, 0, go_run.stdout.decode("utf-8"))
+        self.assertEqual(go_run.stdout.decode("utf-8").strip(), "6")
+        self.assertGreater(profile.stat().st_size, 0)
+
+
+class TestBenchCompare(unittest.TestCase):
+    def test_regression_from_zero(self):
+        baseline = {"programs": {"fold": {"allocs_per_op": 0}}}
+        results = {"programs": {"fold": {"allocs_per_op": 5}}}
+        out = io.StringIO()
+        self.assertEqual(compare(baseline, results, out=out), 1)
+        self.assertEqual(out.getvalue(), "REGRESSION fold allocs_per_op: 0 -> 5\n")
 
 
 if __name__ == '__main__':